@@ -1,8 +1,22 @@
 import re
+import copy
 import json
+from abc import ABC, abstractmethod
+from typing import Optional, Callable
+from serialization import get_codec
+from file_storage import RecordFile, JsonLinesFile, locked
+from db_pool import ConnectionPool
+from pagination import encode_token, decode_token, keyset_clause
+from filter_index import FilteredIds, iter_pages
+from text_index import NGramIndex, normalize
+from cache import LRUCache
 
 
 class Client:
+    # Регулярные выражения валидаторов компилируются один раз
+    PASSPORT_RE = re.compile(r"\d{10}")
+    CONTACT_NUMBER_RE = re.compile(r"\+?\d{10,15}")
+
     def __init__(self, client_id: int, full_name: str, passport_data: str, contact_number: str, address: str):
         self.__client_id = client_id
         self.__full_name = self.validate_full_name(full_name)
@@ -10,6 +24,17 @@ class Client:
         self.__contact_number = self.validate_contact_number(contact_number)
         self.__address = self.validate_address(address)
 
+    @classmethod
+    def from_trusted(cls, data: dict):
+        #Создание из записи собственного хранилища без повторной валидации (данные проверены при записи)
+        client = cls.__new__(cls)
+        client.__client_id = data["client_id"]
+        client.__full_name = data["full_name"]
+        client.__passport_data = data["passport_data"]
+        client.__contact_number = data["contact_number"]
+        client.__address = data["address"]
+        return client
+
     @classmethod
     def from_json(cls, json_str: str):
         #Альтернативный конструктор для создания объекта из JSON
@@ -61,13 +86,13 @@ class Client:
 
     @staticmethod
     def validate_passport_data(passport_data: str) -> str:
-        if re.fullmatch(r"\d{10}", passport_data):
+        if Client.PASSPORT_RE.fullmatch(passport_data):
             return passport_data
         raise ValueError(f"Invalid passport data: {passport_data}")
 
     @staticmethod
     def validate_contact_number(contact_number: str) -> str:
-        if re.fullmatch(r"^\+?\d{10,15}$", contact_number):
+        if Client.CONTACT_NUMBER_RE.fullmatch(contact_number):
             return contact_number
         raise ValueError(f"Invalid contact number: {contact_number}")
 
@@ -94,18 +119,81 @@ class Client:
 class ClientShort:
     """Краткая информация о клиенте"""
     def __init__(self, client: Client):
-        self.__client = client 
+        self.__client = client
+        self.__row = None
+        self.__client_id = client.get_client_id()
+        self.__full_name = client.get_full_name()
+        self.__contact_number = client.get_contact_number()
+
+    @classmethod
+    def from_row(cls, row: dict):
+        #Создание прямо из записи хранилища; полный Client создается только при обращении к get_client
+        short = cls.__new__(cls)
+        short.__client = None
+        short.__row = row
+        short.__client_id = row["client_id"]
+        short.__full_name = row["full_name"]
+        short.__contact_number = row["contact_number"]
+        return short
+
+    def get_client(self) -> Client:
+        if self.__client is None:
+            self.__client = Client.from_trusted(self.__row)
+        return self.__client
+
+    def copy(self):
+        #Копия для отдачи из кэша: полный Client (если уже создан) тоже копируется, его сеттеры не меняют кэш
+        short = copy.copy(self)
+        if self.__client is not None:
+            short.__client = copy.copy(self.__client)
+        return short
+
+    def get_client_id(self):
+        return self.__client_id
 
     def get_full_name(self):
-        return self.__client.get_full_name()
+        return self.__full_name
 
     def get_contact_number(self):
-        return self.__client.get_contact_number()
+        return self.__contact_number
 
     def full_string(self):
         return f"ClientShort({self.get_full_name()}, {self.get_contact_number()})"
 
 
+# Вторичные индексы клиентов в памяти: уникальный паспорт -> client_id, телефон -> client_id,
+# триграммный индекс ФИО (подстрока, для коротких запросов - начало слова)
+class ClientIndex:
+    def __init__(self):
+        self.passport = {}
+        self.contact = {}
+        self.names = NGramIndex()
+
+    def build(self, items):
+        self.passport.clear()
+        self.contact.clear()
+        self.names.clear()
+        for item in items:
+            self.add(item)
+
+    def add(self, item: dict):
+        client_id = item['client_id']
+        self.passport[item['passport_data']] = client_id
+        self.contact.setdefault(item['contact_number'], set()).add(client_id)
+        self.names.add(client_id, item['full_name'])
+
+    def remove(self, item: dict):
+        client_id = item['client_id']
+        if self.passport.get(item['passport_data']) == client_id:
+            del self.passport[item['passport_data']]
+        ids = self.contact.get(item['contact_number'])
+        if ids is not None:
+            ids.discard(client_id)
+            if not ids:
+                del self.contact[item['contact_number']]
+        self.names.remove(client_id)
+
+
 class ClientRepository(ABC):
     @abstractmethod
     def read_all(self):  # Получаем полный список клиентов
@@ -143,35 +231,116 @@ class ClientRepository(ABC):
     def get_count(self): # Подсчет кол-ва клиентов (возвращает количество клиентов)
         pass
 
+    # Пакетные операции. По умолчанию - цикл по одиночным, хранилища переопределяют их одной записью/транзакцией
+    def add_clients(self, clients: list) -> list: # Возвращает список новых client_id
+        return [self.add_client(client) for client in clients]
+
+    def update_clients(self, clients: dict): # clients: {client_id: updated_client}
+        for client_id, updated_client in clients.items():
+            self.update_client(client_id, updated_client)
+
+    def delete_clients(self, client_ids):
+        for client_id in client_ids:
+            self.delete_client(client_id)
+
+    # Поиск по вторичным ключам. По умолчанию - полный проход по read_all, хранилища переопределяют его индексами/SQL
+    def get_by_passport(self, passport_data: str) -> Optional[Client]: # Паспорт уникален
+        for item in self.read_all():
+            if item['passport_data'] == passport_data:
+                return Client.from_trusted(item)
+        return None
+
+    def get_by_contact_number(self, contact_number: str) -> list[Client]:
+        return [Client.from_trusted(item) for item in self.read_all() if item['contact_number'] == contact_number]
+
+    def search_by_name(self, query: str, limit: int = None) -> list[ClientShort]: # Подстрока ФИО без учета регистра
+        query = normalize(query)
+        found = [ClientShort.from_row(item) for item in self.read_all() if query in normalize(item['full_name'])]
+        return found[:limit] if limit is not None else found
+
+    def registered_passports(self, passports) -> set: # Какие из паспортов уже есть в хранилище
+        passports = set(passports)
+        return {item['passport_data'] for item in self.read_all() if item['passport_data'] in passports}
+
+# Формат файла задает кодек (имя из serialization.CODECS или объект Codec): "json", "json-compact", "yaml", "msgpack"...
 class ClientRepJson(ClientRepository):
-    def __init__(self, file_path: str):
+    STORAGE = RecordFile
+
+    def __init__(self, file_path: str, journal: bool = False, compact_threshold: int = 1000, codec='json'):
         self.file_path = file_path
-        
-# Чтение JSON-файла. Если файл пустой или его нету, возвращает пустой список 
+        self.codec = get_codec(codec)
+        # Файл, журнал (file_path.journal), снимок в памяти + индекс client_id -> запись и блокировка писателя
+        self.storage = self.STORAGE(file_path, self.codec, 'client_id', journal, compact_threshold)
+        self.journal = self.storage.journal
+        self.snapshot = self.storage.snapshot
+        self.lock = self.storage.lock
+        # Вторичные индексы строятся при первом поиске и дальше поддерживаются при записи через репозиторий
+        self.client_index = ClientIndex()
+        self.index_version = None
+
+# Чтение всех клиентов из снимка (копии записей, их можно изменять)
     def read_all(self) -> list:
-        try:
-            with open(self.file_path, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return self.storage.read_all()
             
-# Запись списка клиентов в JSON-файл( с отступами)
+# Запись списка клиентов во временный файл и атомарная подмена старого, снимок обновляется без повторного чтения
     def write_all(self, data: list):
-        with open(self.file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        self.storage.write_all(data)
+
+# Уплотнение: текущее состояние записывается в основной файл, журнал очищается
+    def compact(self):
+        self.storage.compact()
+
+# Актуальные вторичные индексы. Если снимок перечитан целиком (файл изменили снаружи или вызвали write_all),
+# индексы перестраиваются
+    def indexes(self) -> ClientIndex:
+        records = self.snapshot.get()
+        if self.index_version != self.snapshot.version:
+            self.client_index.build(records)
+            self.index_version = self.snapshot.version
+        return self.client_index
+
+# Применение собственной записи к индексам, если они были актуальны до нее (без перестроения)
+    def reindex(self, was_current: bool, removed: list, added: list):
+        if not was_current:
+            return
+        for item in removed:
+            self.client_index.remove(item)
+        for item in added:
+            self.client_index.add(item)
+        self.index_version = self.snapshot.version
+
+# Паспорт уникален: ValueError, если он повторяется в пакете или принадлежит клиенту вне пакета
+    def check_passports(self, items: list):
+        owners = {}
+        for item in items:
+            if owners.setdefault(item['passport_data'], item['client_id']) != item['client_id']:
+                raise ValueError(f"Passport {item['passport_data']} already registered")
+        changing = {item['client_id'] for item in items}
+        index = self.indexes().passport
+        for passport, client_id in owners.items():
+            owner = index.get(passport)
+            if owner is not None and owner != client_id and owner not in changing:
+                raise ValueError(f"Passport {passport} already registered")
+
+# Поля клиента для записи в файл (без client_id)
+    @staticmethod
+    def client_fields(client: Client) -> dict:
+        return {
+            'full_name': client.get_full_name(),
+            'passport_data': client.get_passport_data(),
+            'contact_number': client.get_contact_number(),
+            'address': client.get_address()
+        }
             
 #Чтение данных. Ищет клиента по client_id, если нашел, возвращает объект, иначе возвращает None
     def get_by_id(self, client_id: int) -> Optional[Client]:
-        data = self.read_all()
-        for item in data:
-            if item['client_id'] == client_id:
-                return Client(**item)
-        return None
+        item = self.snapshot.find(client_id)
+        return Client.from_trusted(item) if item else None
         
 # Возвращает список клиентов. Берется k записей, начиная с n*k
     def get_k_n_short_list(self, k: int, n: int) -> list[ClientShort]:
-        data = self.read_all()[n*k : (n+1)*k]
-        return [ClientShort(Client(**item)) for item in data]
+        data = self.storage.page(n*k, k)
+        return [ClientShort.from_row(dict(item)) for item in data]
         
 # Сортирует по field. Возвращает отсортированный список
     def sort_by_field(self, field: str) -> list:
@@ -179,141 +348,341 @@ class ClientRepJson(ClientRepository):
         return sorted(data, key=lambda x: x.get(field, ""))
         
 # Определение нового client_id, который будет на 1 больше максимального. Добавляет клиента и записывает обратно
-    def add_client(self, client: Client):
-        data = self.read_all()
-        new_id = max([c['client_id'] for c in data], default=0) + 1
-        data.append({
-            'client_id': new_id,
-            'full_name': client.get_full_name(),
-            'passport_data': client.get_passport_data(),
-            'contact_number': client.get_contact_number(),
-            'address': client.get_address()
-        })
-        self.write_all(data)
+    def add_client(self, client: Client) -> int:
+        return self.add_clients([client])[0]
         
 # Обновляет информацию о клиенте, если он найден. Записывает обновленные данные
     def update_client(self, client_id: int, updated_client: Client):
-        data = self.read_all()
-        for item in data:
-            if item['client_id'] == client_id:
-                item.update({
-                    'full_name': updated_client.get_full_name(),
-                    'passport_data': updated_client.get_passport_data(),
-                    'contact_number': updated_client.get_contact_number(),
-                    'address': updated_client.get_address()
-                })
-                self.write_all(data)
-                return
-        raise ValueError(f"Client {client_id} not found")
+        self.update_clients({client_id: updated_client})
         
 # Удаление клиента. Записывает обновленный список
     def delete_client(self, client_id: int):
-        data = [c for c in self.read_all() if c['client_id'] != client_id]
-        self.write_all(data)
+        self.delete_clients([client_id])
+
+# Пакетное добавление: одно чтение-изменение-запись файла (или одна дозапись журнала) на весь пакет
+    @locked
+    def add_clients(self, clients: list) -> list:
+        next_id = self.snapshot.next_key()
+        items = [dict(client_id=next_id + i, **self.client_fields(client)) for i, client in enumerate(clients)]
+        self.check_passports(items)
+        self.storage.put(*items)
+        self.reindex(True, [], items)
+        return [item['client_id'] for item in items]
+
+# Пакетное обновление. Если хоть одного клиента нет, ничего не записывается
+    @locked
+    def update_clients(self, clients: dict):
+        missing = [client_id for client_id in clients if self.snapshot.find(client_id) is None]
+        if missing:
+            raise ValueError(f"Client {missing[0]} not found")
+        old = [dict(self.snapshot.find(client_id)) for client_id in clients]
+        items = {client_id: dict(self.snapshot.find(client_id), **self.client_fields(updated_client))
+                 for client_id, updated_client in clients.items()}
+        self.check_passports(list(items.values()))
+        self.storage.put(*items.values())
+        self.reindex(True, old, list(items.values()))
+
+    @locked
+    def delete_clients(self, client_ids):
+        client_ids = {client_id for client_id in client_ids if self.snapshot.find(client_id) is not None}
+        was_indexed = self.index_version == self.snapshot.version
+        old = [dict(self.snapshot.find(client_id)) for client_id in client_ids]
+        self.storage.delete(*client_ids)
+        self.reindex(was_indexed, old, [])
         
 # Возвращает количество клиентов
     def get_count(self) -> int:
-        return len(self.read_all())
-# Данный Класс наследуется от ClientRepJson, но тут заменяются методы: "read_all" и "write_all", чтобы можно было работать с YAML.
+        return self.snapshot.count()
+
+# Поиск по вторичным индексам (без прохода по всем клиентам)
+    def get_by_passport(self, passport_data: str) -> Optional[Client]:
+        client_id = self.indexes().passport.get(passport_data)
+        return Client.from_trusted(self.snapshot.index[client_id]) if client_id is not None else None
+
+    def get_by_contact_number(self, contact_number: str) -> list[Client]:
+        client_ids = sorted(self.indexes().contact.get(contact_number, ()))
+        return [Client.from_trusted(self.snapshot.index[client_id]) for client_id in client_ids]
+
+# Поиск по ФИО: подстрока (запрос короче 3 символов - начало слова), сначала совпадения с начала ФИО
+    def search_by_name(self, query: str, limit: int = None) -> list[ClientShort]:
+        client_ids = self.indexes().names.search(query, limit)
+        return [ClientShort.from_row(dict(self.snapshot.index[client_id])) for client_id in client_ids]
+
+    def registered_passports(self, passports) -> set:
+        index = self.indexes().passport
+        return {passport for passport in passports if passport in index}
+# Данный Класс наследуется от ClientRepJson и отличается только кодеком по умолчанию, чтобы можно было работать с YAML.
 class ClientRepYaml(ClientRepJson):
-# Аналогично с JSON
-    def read_all(self) -> list:
-        try:
-            with open(self.file_path, 'r') as f:
-                return yaml.safe_load(f) or []
-        except (FileNotFoundError, yaml.YAMLError):
-            return []
-
-# Аналогично с JSON
-    def write_all(self, data: list):
-        with open(self.file_path, 'w') as f:
-            yaml.dump(data, f)
-
-# Класс подключения к Базе данных, используется паттерн Одиночка (гарантирует что будет ТОЛЬКО одно подключение к БД)
-class DatabaseConnection:
-    
-    _instance = None # Статическая переменная, которая будет хранить единственный экземпляр класса
-
-# Метод отвечает за создание экземпляра класса, в нем реализована проверка Если cls._instance == None, создаем объект и устанавливаем соединение с MySQL, если же объект уже существует, просто вернет его.
-    def __new__(cls):
-        if not cls._instance:
-            cls._instance = super().__new__(cls) # super - функция, которая позволяет вызвать метоы родительского класса
-            cls._instance.connection = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="password",
-                database="car_rental"
-            )
-        return cls._instance
-    
-    def get_connection(self):
-        return self.connection
-
+# Аналогично с JSON, по умолчанию кодек YAML (с C-ускорением libyaml, если оно есть)
+    def __init__(self, file_path: str, journal: bool = False, compact_threshold: int = 1000, codec='yaml'):
+        super().__init__(file_path, journal, compact_threshold, codec)
+
+# JSON Lines: по клиенту на строку + боковой индекс смещений (file_path.idx).
+# Если снимок в памяти устарел, страница читается с диска seek'ом и разбираются только k записей
+class ClientRepJsonl(ClientRepJson):
+    STORAGE = JsonLinesFile
+
+    def __init__(self, file_path: str, journal: bool = False, compact_threshold: int = 1000):
+        super().__init__(file_path, journal, compact_threshold, 'jsonl')
+
+# Параметры подключения к MySQL по умолчанию
+DB_CONFIG = {"host": "localhost", "user": "root", "password": "password", "database": "car_rental"}
+
+# Пул соединений с MySQL (вместо единственного соединения-Одиночки на весь процесс)
+def mysql_pool(db_config: dict = DB_CONFIG, **pool_options) -> ConnectionPool:
+    def connect():
+        import mysql.connector
+        return mysql.connector.connect(**db_config)
+    return ConnectionPool(connect, **pool_options)
+
+# Поиск по ФИО идет по таблице суффиксов нормализованного ФИО (поддерживается при каждой записи через репозиторий):
+#     CREATE TABLE client_name_suffixes (
+#         client_id INT NOT NULL, position SMALLINT NOT NULL, word_start BOOLEAN NOT NULL,
+#         suffix VARCHAR(255) COLLATE utf8mb4_bin NOT NULL,
+#         PRIMARY KEY (client_id, position), INDEX (suffix))
+# Подстрока ФИО - это начало одного из суффиксов, поэтому suffix LIKE 'запрос%' идет по индексу (suffix).
+# Для уже заполненной таблицы clients таблицу суффиксов строит rebuild_name_index()
 class ClientRepDB(ClientRepository):
+    COLUMNS = ('client_id', 'full_name', 'passport_data', 'contact_number', 'address')
+    NAME_SUFFIX_LENGTH = 255
     
-#Подключение к базе, через DatabaseConnection
-    def __init__(self):
-        self.db = DatabaseConnection().get_connection()
+#Подключение к базе через пул: каждый метод берет соединение и возвращает его, поэтому репозиторий можно использовать из разных потоков
+    def __init__(self, pool: ConnectionPool = None):
+        self.pool = pool or mysql_pool()
 
 # Выполняет SQL-запрос SELECT * FROM clients WHERE client_id = %s, если найден, создает Client
     def get_by_id(self, client_id: int) -> Optional[Client]:
-        cursor = self.db.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM clients WHERE client_id = %s", (client_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        return Client(**result) if result else None
+        with self.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM clients WHERE client_id = %s", (client_id,))
+            result = cursor.fetchone()
+            cursor.close()
+        return Client.from_trusted(result) if result else None
         
-# Запрашивает k записей с OFFSET n*k
+# Запрашивает k записей с OFFSET n*k (ORDER BY нужен, иначе состав страниц не определен)
     def get_k_n_short_list(self, k: int, n: int) -> list[ClientShort]:
-        cursor = self.db.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM clients LIMIT %s OFFSET %s", (k, n*k))
-        results = cursor.fetchall()
-        cursor.close()
-        return [ClientShort(Client(**item)) for item in results]
-
-# Выполняет INSERT INTO clients (Добавление клиента)
-    def add_client(self, client: Client):
-        cursor = self.db.cursor()
-        cursor.execute(
-            """INSERT INTO clients 
-            (full_name, passport_data, contact_number, address) 
-            VALUES (%s, %s, %s, %s)""",
-            (client.get_full_name(), client.get_passport_data(),
-             client.get_contact_number(), client.get_address())
-        )
-        self.db.commit()
-        cursor.close()
+        with self.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM clients ORDER BY client_id LIMIT %s OFFSET %s", (k, n*k))
+            results = cursor.fetchall()
+            cursor.close()
+        return [ClientShort.from_row(item) for item in results]
+
+# Страница по ключу вместо OFFSET: возвращает (клиенты, токен следующей страницы или None).
+# Для сортировки по полю нужен индекс (поле, client_id)
+    def get_page(self, k: int, token: str = None, sort_column: str = 'client_id',
+                 descending: bool = False) -> tuple[list[ClientShort], Optional[str]]:
+        if sort_column not in self.COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort_column}")
+        after = decode_token(token, sort_column, descending) if token else None
+        where, params, order_by = keyset_clause(sort_column, 'client_id', descending, after, row_compare=False)
+        query = "SELECT * FROM clients"
+        if where:
+            query += f" WHERE {where}"
+        query += f" ORDER BY {order_by} LIMIT %s"
+        with self.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute(query, params + [k])
+            results = cursor.fetchall()
+            cursor.close()
+        next_token = None
+        if len(results) == k:
+            next_token = encode_token(sort_column, descending, results[-1][sort_column], results[-1]['client_id'])
+        return [ClientShort.from_row(item) for item in results], next_token
+
+# Выполняет INSERT INTO clients (Добавление клиента), возвращает новый client_id. Паспорт должен быть новым
+    def add_client(self, client: Client) -> int:
+        if self.registered_passports([client.get_passport_data()]):
+            raise ValueError(f"Passport {client.get_passport_data()} already registered")
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(
+                """INSERT INTO clients 
+                (full_name, passport_data, contact_number, address) 
+                VALUES (%s, %s, %s, %s)""",
+                (client.get_full_name(), client.get_passport_data(),
+                 client.get_contact_number(), client.get_address())
+            )
+            client_id = cursor.lastrowid
+            self.index_names(cursor, {client_id: client.get_full_name()})
+            db.commit()
+            cursor.close()
+        return client_id
 
 # Выполняет UPDATE clients SET ... WHERE client_id = %s
     def update_client(self, client_id: int, updated_client: Client):
-        cursor = self.db.cursor()
-        cursor.execute(
-            """UPDATE clients SET 
-            full_name = %s, passport_data = %s, 
-            contact_number = %s, address = %s 
-            WHERE client_id = %s""",
-            (updated_client.get_full_name(), updated_client.get_passport_data(),
-             updated_client.get_contact_number(), updated_client.get_address(),
-             client_id)
-        )
-        self.db.commit()
-        cursor.close()
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(
+                """UPDATE clients SET 
+                full_name = %s, passport_data = %s, 
+                contact_number = %s, address = %s 
+                WHERE client_id = %s""",
+                (updated_client.get_full_name(), updated_client.get_passport_data(),
+                 updated_client.get_contact_number(), updated_client.get_address(),
+                 client_id)
+            )
+            self.unindex_names(cursor, [client_id])
+            self.index_names(cursor, {client_id: updated_client.get_full_name()})
+            db.commit()
+            cursor.close()
         
 # Выполняет DELETE FROM clients WHERE client_id = %s
     def delete_client(self, client_id: int):
-        cursor = self.db.cursor()
-        cursor.execute("DELETE FROM clients WHERE client_id = %s", (client_id,))
-        self.db.commit()
-        cursor.close()
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute("DELETE FROM clients WHERE client_id = %s", (client_id,))
+            self.unindex_names(cursor, [client_id])
+            db.commit()
+            cursor.close()
+
+# Пакетная вставка: executemany для INSERT склеивается драйвером в один многострочный INSERT, одна транзакция.
+# AUTO_INCREMENT не обязан выдать пакету подряд идущие id (параллельные вставки, innodb_autoinc_lock_mode=2),
+# поэтому настоящие id читаются обратно по уникальному паспорту в той же транзакции
+# (при ошибке транзакция откатывается пулом при возврате соединения)
+    def add_clients(self, clients: list) -> list:
+        if not clients:
+            return []
+        passports = [client.get_passport_data() for client in clients]
+        duplicates = self.registered_passports(passports)
+        if not duplicates and len(set(passports)) < len(passports):
+            duplicates = {passport for passport in passports if passports.count(passport) > 1}
+        if duplicates:
+            raise ValueError(f"Passport {min(duplicates)} already registered")
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.executemany(
+                """INSERT INTO clients 
+                (full_name, passport_data, contact_number, address) 
+                VALUES (%s, %s, %s, %s)""",
+                [(client.get_full_name(), client.get_passport_data(),
+                  client.get_contact_number(), client.get_address()) for client in clients]
+            )
+            cursor.execute(
+                f"SELECT client_id, passport_data FROM clients WHERE passport_data IN ({', '.join(['%s'] * len(passports))})",
+                passports)
+            client_ids = dict((passport, client_id) for client_id, passport in cursor.fetchall())
+            self.index_names(cursor, {client_ids[client.get_passport_data()]: client.get_full_name() for client in clients})
+            db.commit()
+            cursor.close()
+        return [client_ids[passport] for passport in passports]
+
+# Пакетное обновление в одной транзакции
+    def update_clients(self, clients: dict):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.executemany(
+                """UPDATE clients SET 
+                full_name = %s, passport_data = %s, 
+                contact_number = %s, address = %s 
+                WHERE client_id = %s""",
+                [(updated_client.get_full_name(), updated_client.get_passport_data(),
+                  updated_client.get_contact_number(), updated_client.get_address(),
+                  client_id) for client_id, updated_client in clients.items()]
+            )
+            self.unindex_names(cursor, list(clients))
+            self.index_names(cursor, {client_id: updated_client.get_full_name()
+                                      for client_id, updated_client in clients.items()})
+            db.commit()
+            cursor.close()
+
+# Пакетное удаление одним DELETE ... WHERE client_id IN (...)
+    def delete_clients(self, client_ids):
+        client_ids = list(client_ids)
+        if not client_ids:
+            return
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(f"DELETE FROM clients WHERE client_id IN ({', '.join(['%s'] * len(client_ids))})", client_ids)
+            self.unindex_names(cursor, client_ids)
+            db.commit()
+            cursor.close()
 
 # Выполняет SELECT COUNT(*) FROM clients (Возврат кол-ва клиентов)
     def get_count(self) -> int:
-        cursor = self.db.cursor()
-        cursor.execute("SELECT COUNT(*) FROM clients")
-        count = cursor.fetchone()[0]
-        cursor.close()
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT COUNT(*) FROM clients")
+            count = cursor.fetchone()[0]
+            cursor.close()
         return count
 
+# Строки таблицы суффиксов: (client_id, позиция, с начала слова?, суффикс нормализованного ФИО).
+# Суффиксы с пробела не нужны: нормализованный запрос с пробела не начинается
+    @classmethod
+    def name_suffixes(cls, client_id: int, full_name: str) -> list:
+        text = normalize(full_name)
+        return [(client_id, i, i == 0 or text[i - 1] == ' ', text[i:i + cls.NAME_SUFFIX_LENGTH])
+                for i in range(len(text)) if text[i] != ' ']
+
+# Запись суффиксов ФИО клиентов {client_id: full_name} в той же транзакции, что и изменение clients
+    def index_names(self, cursor, names: dict):
+        rows = [row for client_id, full_name in names.items() for row in self.name_suffixes(client_id, full_name)]
+        if rows:
+            cursor.executemany(
+                "INSERT INTO client_name_suffixes (client_id, position, word_start, suffix) VALUES (%s, %s, %s, %s)",
+                rows)
+
+    def unindex_names(self, cursor, client_ids: list):
+        cursor.execute(
+            f"DELETE FROM client_name_suffixes WHERE client_id IN ({', '.join(['%s'] * len(client_ids))})", client_ids)
+
+# Заполнение таблицы суффиксов по уже существующим клиентам (после миграции или загрузки данных в обход репозитория)
+    def rebuild_name_index(self):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT client_id, full_name FROM clients")
+            names = dict(cursor.fetchall())
+            cursor.execute("DELETE FROM client_name_suffixes")
+            self.index_names(cursor, names)
+            db.commit()
+            cursor.close()
+
+# Поиск по вторичным ключам запросами к БД. Нужны индексы:
+# UNIQUE (passport_data), INDEX (contact_number) и таблица client_name_suffixes
+    def select(self, query: str, params) -> list:
+        with self.pool.connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+            cursor.close()
+        return results
+
+    def get_by_passport(self, passport_data: str) -> Optional[Client]:
+        results = self.select("SELECT * FROM clients WHERE passport_data = %s", (passport_data,))
+        return Client.from_trusted(results[0]) if results else None
+
+    def get_by_contact_number(self, contact_number: str) -> list[Client]:
+        results = self.select("SELECT * FROM clients WHERE contact_number = %s ORDER BY client_id", (contact_number,))
+        return [Client.from_trusted(item) for item in results]
+
+# Поиск по ФИО с той же семантикой, что у файловых хранилищ (NGramIndex): подстрока без учета регистра,
+# запрос короче 3 символов - начало слова. Сначала совпадения с начала ФИО, затем с начала слова, затем по client_id
+    def search_by_name(self, query: str, limit: int = None) -> list[ClientShort]:
+        query = normalize(query)[:self.NAME_SUFFIX_LENGTH]
+        if not query:
+            return []
+        escaped = query.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+        sql = """SELECT c.*, MIN(CASE WHEN s.position = 0 THEN 0 WHEN s.word_start THEN 1 ELSE 2 END) AS name_rank
+                 FROM client_name_suffixes s JOIN clients c ON c.client_id = s.client_id
+                 WHERE s.suffix LIKE %s ESCAPE '!'"""
+        if len(query) < 3:
+            sql += " AND s.word_start"
+        sql += " GROUP BY c.client_id ORDER BY name_rank, c.client_id"
+        params = [escaped + '%']
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return [ClientShort.from_row(item) for item in self.select(sql, params)]
+
+    def registered_passports(self, passports) -> set:
+        passports = list(set(passports))
+        if not passports:
+            return set()
+        results = self.select(
+            f"SELECT passport_data FROM clients WHERE passport_data IN ({', '.join(['%s'] * len(passports))})", passports)
+        return {item['passport_data'] for item in results}
+
 
 class ClientDBAdapter(ClientRepDB): # Адаптер для ClientRepDB, который запрещает read_all() и write_all(), так как БД использует SQL-запросы
     def read_all(self):
@@ -325,6 +694,8 @@ class ClientDBAdapter(ClientRepDB): # Адаптер для ClientRepDB, кот
     def sort_by_field(self, field: str):
         raise NotImplementedError("Use SQL ORDER BY instead")
 
+# Количество клиентов, прошедших фильтр, материализовано: множество их client_id строится один раз
+# и обновляется при записи через декоратор. Если хранилище меняли в обход декоратора, вызовите refresh()
 class FilterSortDecorator(ClientRepository):
     def __init__(self, repository: ClientRepository, 
                  filter_func: Callable = None, 
@@ -332,6 +703,7 @@ class FilterSortDecorator(ClientRepository):
         self.repository = repository
         self.filter_func = filter_func
         self.sort_key = sort_key
+        self.matching = FilteredIds(filter_func, lambda c: c.get_client_id()) if filter_func else None
 # Данные методы реализуют паттерн "Декоратор", для того чтобы реализовать фильтрацию и сортировку у ClientRepository
     def get_k_n_short_list(self, k: int, n: int) -> list[ClientShort]:
         data = self.repository.get_k_n_short_list(k, n) # Получаем
@@ -341,12 +713,209 @@ class FilterSortDecorator(ClientRepository):
             data.sort(key=self.sort_key) # Сортируем данные
         return data # Возвращаем результат
         
-        # Метод возвращает количество клиентов, учитывая фильтрацию
+        # Метод возвращает количество клиентов, учитывая фильтрацию (множество строится при первом вызове)
     def get_count(self) -> int:
-        if self.filter_func:
-            return len(list(filter(self.filter_func, 
-                                self.repository.get_k_n_short_list(1000, 0))))
-        return self.repository.get_count()
+        if self.matching is None:
+            return self.repository.get_count()
+        if not self.matching.is_built():
+            self.matching.build(iter_pages(self.repository.get_k_n_short_list))
+        return len(self.matching)
+
+    def refresh(self):
+        if self.matching:
+            self.matching.reset()
+
+    def read_all(self):
+        return self.repository.read_all()
+
+    def write_all(self, data):
+        self.repository.write_all(data)
+        self.refresh()
+
+    def get_by_id(self, client_id):
+        return self.repository.get_by_id(client_id)
+
+    def sort_by_field(self, field: str):
+        return self.repository.sort_by_field(field)
+
+# Запись через декоратор: после нее пересчитывается принадлежность фильтру только измененных клиентов
+    def add_client(self, client: Client):
+        client_id = self.repository.add_client(client)
+        self.clients_changed([client_id])
+        return client_id
+
+    def update_client(self, client_id, updated_client: Client):
+        self.repository.update_client(client_id, updated_client)
+        self.clients_changed([client_id])
+
+    def delete_client(self, client_id):
+        self.repository.delete_client(client_id)
+        self.clients_deleted([client_id])
+
+    def add_clients(self, clients: list) -> list:
+        client_ids = self.repository.add_clients(clients)
+        self.clients_changed(client_ids)
+        return client_ids
+
+    def update_clients(self, clients: dict):
+        self.repository.update_clients(clients)
+        self.clients_changed(list(clients))
+
+    def delete_clients(self, client_ids):
+        client_ids = list(client_ids)
+        self.repository.delete_clients(client_ids)
+        self.clients_deleted(client_ids)
+
+    def clients_changed(self, client_ids):
+        if not self.matching or not self.matching.is_built():
+            return
+        for client_id in client_ids:
+            if client_id is None:  # хранилище не вернуло id - пересчитаем целиком при следующем get_count
+                self.matching.reset()
+                return
+            client = self.repository.get_by_id(client_id)
+            self.matching.record_changed(client_id, ClientShort(client) if client else None)
+
+    def clients_deleted(self, client_ids):
+        if self.matching:
+            for client_id in client_ids:
+                self.matching.record_changed(client_id, None)
+
+# Поиск по вторичным ключам идет индексами/SQL обернутого хранилища (а не проходом по read_all базового класса),
+# в результат попадают только клиенты, прошедшие фильтр. filter_func получает ClientShort, как и в страницах
+    def matches(self, client) -> bool:
+        if not self.filter_func:
+            return True
+        return self.filter_func(client if isinstance(client, ClientShort) else ClientShort(client))
+
+    def get_by_passport(self, passport_data: str) -> Optional[Client]:
+        client = self.repository.get_by_passport(passport_data)
+        return client if client is not None and self.matches(client) else None
+
+    def get_by_contact_number(self, contact_number: str) -> list[Client]:
+        return [client for client in self.repository.get_by_contact_number(contact_number) if self.matches(client)]
+
+    def search_by_name(self, query: str, limit: int = None) -> list[ClientShort]:
+        if not self.filter_func:
+            return self.repository.search_by_name(query, limit)
+        found = [client for client in self.repository.search_by_name(query) if self.matches(client)]
+        return found[:limit] if limit is not None else found
+
+# Паспорт уникален во всем хранилище, поэтому проверка занятых паспортов не фильтруется
+    def registered_passports(self, passports) -> set:
+        return self.repository.registered_passports(passports)
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+# Кэширующий декоратор (read-through) для любого ClientRepository: get_by_id, страницы, количество
+# и поиск по паспорту, телефону и ФИО берутся из LRU-кэша (max_size записей, ttl секунд или без ограничения по времени).
+# Запись через декоратор сбрасывает только затронутое: изменение клиента - его запись, страницы с ним и результаты поиска,
+# добавление/удаление - еще и все страницы и количество. Изменения в обход декоратора видны после ttl или refresh()
+class CachedClientRepository(ClientRepository):
+    def __init__(self, repository: ClientRepository, max_size: int = 1024, ttl: float = None):
+        self.repository = repository
+        self.cache = LRUCache(max_size, ttl)
+
+# Client изменяем через сеттеры, поэтому из кэша отдается копия
+    def get_by_id(self, client_id):
+        client = self.cache.get_or_load(('id', client_id), lambda: self.repository.get_by_id(client_id))
+        return copy.copy(client) if client is not None else None
+
+# ClientShort.get_client отдает изменяемый Client, поэтому из кэша отдаются копии
+    def get_k_n_short_list(self, k: int, n: int) -> list[ClientShort]:
+        return [short.copy() for short in
+                self.cache.get_or_load(('page', k, n), lambda: self.repository.get_k_n_short_list(k, n))]
+
+    def get_count(self) -> int:
+        return self.cache.get_or_load(('count',), self.repository.get_count)
+
+    def read_all(self):
+        return self.repository.read_all()
+
+    def write_all(self, data):
+        self.repository.write_all(data)
+        self.cache.clear()
+
+    def sort_by_field(self, field: str):
+        return self.repository.sort_by_field(field)
+
+    def add_client(self, client: Client):
+        client_id = self.repository.add_client(client)
+        self.clients_moved([client_id])
+        return client_id
+
+    def update_client(self, client_id, updated_client: Client):
+        self.repository.update_client(client_id, updated_client)
+        self.clients_updated([client_id])
+
+    def delete_client(self, client_id):
+        self.repository.delete_client(client_id)
+        self.clients_moved([client_id])
+
+    def add_clients(self, clients: list) -> list:
+        client_ids = self.repository.add_clients(clients)
+        self.clients_moved(client_ids)
+        return client_ids
+
+    def update_clients(self, clients: dict):
+        self.repository.update_clients(clients)
+        self.clients_updated(list(clients))
+
+    def delete_clients(self, client_ids):
+        client_ids = list(client_ids)
+        self.repository.delete_clients(client_ids)
+        self.clients_moved(client_ids)
+
+# Поиск по вторичным ключам идет индексами/SQL обернутого хранилища (а не проходом по read_all базового класса)
+    def get_by_passport(self, passport_data: str) -> Optional[Client]:
+        client = self.cache.get_or_load(('passport', passport_data),
+                                        lambda: self.repository.get_by_passport(passport_data))
+        return copy.copy(client) if client is not None else None
+
+    def get_by_contact_number(self, contact_number: str) -> list[Client]:
+        clients = self.cache.get_or_load(('contact', contact_number),
+                                         lambda: self.repository.get_by_contact_number(contact_number))
+        return [copy.copy(client) for client in clients]
+
+    def search_by_name(self, query: str, limit: int = None) -> list[ClientShort]:
+        return [short.copy() for short in
+                self.cache.get_or_load(('search', query, limit), lambda: self.repository.search_by_name(query, limit))]
+
+# Набор проверяемых паспортов каждый раз свой, поэтому без кэша
+    def registered_passports(self, passports) -> set:
+        return self.repository.registered_passports(passports)
+
+    def get_page(self, k: int, token: str = None, sort_column: str = 'client_id', descending: bool = False):
+        return self.repository.get_page(k, token, sort_column, descending)
+
+# Изменение клиентов сбрасывает их записи, страницы с ними, поиск по паспорту, который им принадлежал или еще не был
+# найден (паспорт мог смениться), и весь поиск по телефону и ФИО (могли смениться и они)
+    def clients_updated(self, client_ids):
+        client_ids = set(client_ids)
+
+        def affected(key, value):
+            if key[0] == 'id':
+                return key[1] in client_ids
+            if key[0] == 'page':
+                return any(c.get_client_id() in client_ids for c in value)
+            if key[0] == 'passport':
+                return value is None or value.get_client_id() in client_ids
+            return key[0] in ('contact', 'search')
+        self.cache.invalidate_where(affected)
+
+    def clients_moved(self, client_ids):
+        client_ids = set(client_ids)
+        if None in client_ids:  # хранилище не вернуло id
+            self.cache.clear()
+            return
+        self.cache.invalidate_where(lambda key, value: key[0] != 'id' or key[1] in client_ids)
+
+    def refresh(self):
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
 
     def __getattr__(self, name):
         return getattr(self.repository, name)
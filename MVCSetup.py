@@ -1,19 +1,77 @@
 import json
 import yaml
 import os
-import psycopg2
+import tkinter as tk
+from tkinter import ttk, messagebox
 from datetime import datetime
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from filter_index import iter_pages
+from query import field_value
+from text_index import NGramIndex
 
-# Паттерн Наблюдатель
+# Событие изменения данных: операция и id затронутых машин.
+# RELOADED - изменилось неизвестно что, наблюдатель перечитывает все
+class ChangeEvent:
+    ADDED = "added"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    REORDERED = "reordered"
+    RELOADED = "reloaded"
+
+    def __init__(self, op, ids=()):
+        self.op = op
+        self.ids = tuple(ids)
+
+    def __eq__(self, other):
+        return isinstance(other, ChangeEvent) and (self.op, self.ids) == (other.op, other.ids)
+
+    def __repr__(self):
+        return f"ChangeEvent({self.op!r}, {self.ids!r})"
+
+
+# Слияние пачки событий: по каждому id остается итоговая операция
+# (добавили и изменили -> добавлена, добавили и удалили -> ничего, удалили и добавили снова -> изменена)
+def coalesce(events):
+    if any(event.op == ChangeEvent.RELOADED for event in events):
+        return [ChangeEvent(ChangeEvent.RELOADED)]
+    added, updated, deleted = ChangeEvent.ADDED, ChangeEvent.UPDATED, ChangeEvent.DELETED
+    states = {}
+    reordered = False
+    for event in events:
+        if event.op == ChangeEvent.REORDERED:
+            reordered = True
+            continue
+        for record_id in event.ids:
+            state = states.get(record_id)
+            if state is None:
+                states[record_id] = event.op
+            elif state == added:
+                if event.op == deleted:
+                    del states[record_id]
+            elif event.op == deleted:
+                states[record_id] = deleted
+            else:
+                states[record_id] = updated
+    result = [ChangeEvent(op, [record_id for record_id, state in states.items() if state == op])
+              for op in (added, updated, deleted)]
+    result = [event for event in result if event.ids]
+    if reordered:
+        result.append(ChangeEvent(ChangeEvent.REORDERED))
+    return result
+
+
+# Паттерн Наблюдатель. update получает список событий ChangeEvent
 class Observer(ABC):
     @abstractmethod
-    def update(self):
+    def update(self, events):
         pass
 
 class Observable:
     def __init__(self):
         self._observers = []
+        self._batch_depth = 0
+        self._pending = []
 
     def add_observer(self, observer):
         self._observers.append(observer)
@@ -21,9 +79,32 @@ class Observable:
     def remove_observer(self, observer):
         self._observers.remove(observer)
 
-    def notify_observers(self):
-        for observer in self._observers:
-            observer.update()
+    # Без событий - изменилось неизвестно что (RELOADED). Внутри batch() события копятся
+    def notify_observers(self, *events):
+        events = list(events) or [ChangeEvent(ChangeEvent.RELOADED)]
+        if self._batch_depth:
+            self._pending.extend(events)
+            return
+        for observer in list(self._observers):
+            observer.update(events)
+
+    # Пакет изменений: наблюдатели получают одно уведомление со слитыми событиями при выходе из блока
+    #
+    #     with repository.batch():
+    #         for car in cars:
+    #             controller.add_car(car)
+    @contextmanager
+    def batch(self):
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._pending:
+                events, self._pending = coalesce(self._pending), []
+                if events:
+                    for observer in list(self._observers):
+                        observer.update(events)
 
 # Сущность автомобиля
 class Car:
@@ -67,35 +148,137 @@ class CarRepBase(Observable, ABC):
     def get_count(self):
         pass
 
+# Поисковый индекс по марке и модели (триграммы): поиск подстроки без прохода по всему автопарку.
+# Строится при первом поиске страницами репозитория, дальше обновляется по событиям репозитория
+class CarSearchIndex(Observer):
+    def __init__(self, repository, page_size=10000):
+        self.repository = repository
+        self.index = NGramIndex()
+        self.page_size = page_size
+        self.built = False
+
+    @staticmethod
+    def text(car):
+        return f"{field_value(car, 'brand')} {field_value(car, 'model')}"
+
+    def build(self):
+        self.index.clear()
+        for car in iter_pages(self.repository.get_k_n_short_list, self.page_size):
+            self.index.add(field_value(car, "car_id"), self.text(car))
+        self.built = True
+
+    # Пересобрать при следующем поиске
+    def invalidate(self):
+        self.built = False
+
+    # События репозитория: перечитываются только затронутые машины
+    def update(self, events):
+        if not self.built:
+            return
+        for event in events:
+            if event.op == ChangeEvent.RELOADED:
+                self.invalidate()
+                return
+            if event.op == ChangeEvent.DELETED:
+                for car_id in event.ids:
+                    self.index.remove(car_id)
+            elif event.op in (ChangeEvent.ADDED, ChangeEvent.UPDATED):
+                for car_id in event.ids:
+                    car = self.repository.get_by_id(car_id)
+                    if car is None:
+                        self.index.remove(car_id)
+                    else:
+                        self.index.add(car_id, self.text(car))
+
+    # count id, начиная с позиции start, в порядке ранга: совпадение с начала марки, с начала слова, в середине слова
+    def search(self, query, start, count):
+        if not self.built:
+            self.build()
+        return self.index.search(query, start + count)[start:]
+
+    def count(self, query):
+        if not self.built:
+            self.build()
+        return self.index.count(query)
+
+
 # Контроллер для управления логикой
+# Каждая запись через контроллер уведомляет наблюдателей событием ChangeEvent с id машины;
+# серию записей можно обернуть в controller.batch(), тогда уведомление будет одно
 class CarController:
     def __init__(self, repository):
         self.repository = repository
+        # Индекс подписывается первым, чтобы к уведомлению представления он уже был обновлен
+        self.search_index = CarSearchIndex(repository)
+        self.repository.add_observer(self.search_index)
 
     def get_all_cars(self):
         return self.repository.get_k_n_short_list(100, 0)
 
+    # Поиск по подстроке марки/модели: id машин (страница k, номер n) и сами машины
+    def search(self, query, k=100, n=0):
+        return self.search_index.search(query, n * k, k)
+
+    def search_cars(self, query, k=100, n=0):
+        return [car for car in map(self.repository.get_by_id, self.search(query, k, n)) if car is not None]
+
+    # Окно из count машин с позиции start - по всему автопарку или по результатам поиска query.
+    # Читаются только страницы, которые покрывают окно
+    def get_window(self, start, count, query=""):
+        if query:
+            ids = self.search_index.search(query, start, count)
+            return [car for car in map(self.repository.get_by_id, ids) if car is not None]
+        first, last = start // count, (start + count - 1) // count
+        cars = []
+        for n in range(first, last + 1):
+            cars.extend(self.repository.get_k_n_short_list(count, n))
+        offset = start - first * count
+        return cars[offset:offset + count]
+
+    def count_cars(self, query=""):
+        if query:
+            return self.search_index.count(query)
+        return self.repository.get_count()
+
+    def refresh_search(self):
+        self.search_index.invalidate()
+
+    def batch(self):
+        return self.repository.batch()
+
     def add_car(self, car):
-        self.repository.add_car(car)
-        self.repository.notify_observers()
+        car_id = self.repository.add_car(car)
+        if car_id is None:  # у словаря из формы car_id нет
+            car_id = car.get("car_id") if isinstance(car, dict) else getattr(car, "car_id", None)
+        if car_id is None:  # хранилище не сообщило id - наблюдатели перечитают все
+            self.repository.notify_observers()
+        else:
+            self.repository.notify_observers(ChangeEvent(ChangeEvent.ADDED, [car_id]))
 
     def update_car(self, car_id, new_car):
         self.repository.update_car(car_id, new_car)
-        self.repository.notify_observers()
+        self.repository.notify_observers(ChangeEvent(ChangeEvent.UPDATED, [car_id]))
 
     def delete_car(self, car_id):
         self.repository.delete_car(car_id)
-        self.repository.notify_observers()
+        self.repository.notify_observers(ChangeEvent(ChangeEvent.DELETED, [car_id]))
 
     def sort_cars(self, field, reverse=False):
         self.repository.sort_by_field(field, reverse)
-        self.repository.notify_observers()
+        self.repository.notify_observers(ChangeEvent(ChangeEvent.REORDERED))
 
-# View
+# View. Таблица виртуальная: в Treeview всегда только видимое окно из VISIBLE_ROWS машин,
+# прокрутка запрашивает у контроллера новое окно. При обновлении строки не пересоздаются:
+# меняются только строки, у которых изменились значения или позиция
 class CarView(Observer):
+    VISIBLE_ROWS = 25
+
     def __init__(self, controller):
         self.controller = controller
         self.controller.repository.add_observer(self)
+        self.offset = 0       # позиция первой видимой строки
+        self.total = 0        # сколько всего строк (машин или результатов поиска)
+        self.row_values = {}  # iid (car_id) -> значения показанной строки
         self.root = tk.Tk()
         self.root.title("Car Rental System")
         self.create_widgets()
@@ -103,17 +286,26 @@ class CarView(Observer):
         self.root.mainloop()
 
     def create_widgets(self):
-        self.tree = ttk.Treeview(self.root, columns=("ID", "Brand", "Model", "Year", "Price"), show="headings")
+        self.frame = tk.Frame(self.root)
+        self.frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(self.frame, columns=("ID", "Brand", "Model", "Year", "Price"), show="headings",
+                                 height=self.VISIBLE_ROWS)
         self.tree.heading("ID", text="ID")
         self.tree.heading("Brand", text="Brand")
         self.tree.heading("Model", text="Model")
         self.tree.heading("Year", text="Year")
         self.tree.heading("Price", text="Price per day")
-        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.tree.bind("<Double-1>", self.show_car_details)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_by(-1 if event.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-1))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(1))
         
         self.entry_filter = tk.Entry(self.root)
         self.entry_filter.pack()
+        self.entry_filter.bind("<KeyRelease>", lambda event: self.apply_filter())
         
         self.btn_filter = tk.Button(self.root, text="Filter", command=self.apply_filter)
         self.btn_filter.pack()
@@ -127,12 +319,71 @@ class CarView(Observer):
         self.btn_sort = tk.Button(self.root, text="Sort by Price", command=lambda: self.sort_cars("rental_price_per_day"))
         self.btn_sort.pack()
 
-    def update(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        cars = self.controller.get_all_cars()
-        for car in cars:
-            self.tree.insert("", tk.END, values=(car['car_id'], car['brand'], car['model'], car['year'], car['rental_price_per_day']))
+    # Уведомление об изменении данных. Если только изменились машины (без фильтра), перечитываются
+    # лишь видимые из них; добавление, удаление и сортировка сдвигают строки - окно читается заново
+    def update(self, events=()):
+        if events and not self.entry_filter.get().strip() and all(event.op == ChangeEvent.UPDATED for event in events):
+            for event in events:
+                for car_id in event.ids:
+                    if str(car_id) in self.row_values:
+                        car = self.controller.repository.get_by_id(car_id)
+                        if car is not None:
+                            self.patch_row(car)
+            return
+        self.render()
+
+    def render(self):
+        query = self.entry_filter.get().strip()
+        self.total = self.controller.count_cars(query)
+        self.offset = max(0, min(self.offset, self.total - self.VISIBLE_ROWS))
+        self.patch_rows(self.controller.get_window(self.offset, self.VISIBLE_ROWS, query))
+        if self.total:
+            self.scrollbar.set(self.offset / self.total, min(1.0, (self.offset + self.VISIBLE_ROWS) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # Приведение Treeview к списку машин: лишние строки удаляются, новые вставляются,
+    # у оставшихся обновляются только изменившиеся значения и позиция
+    def patch_rows(self, cars):
+        rows = [self.row(car) for car in cars]
+        visible = {iid for iid, _ in rows}
+        stale = [iid for iid in self.tree.get_children() if iid not in visible]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.row_values[iid]
+        for index, (iid, values) in enumerate(rows):
+            if iid not in self.row_values:
+                self.tree.insert("", index, iid=iid, values=values)
+            else:
+                if self.row_values[iid] != values:
+                    self.tree.item(iid, values=values)
+                if self.tree.index(iid) != index:
+                    self.tree.move(iid, "", index)
+            self.row_values[iid] = values
+
+    @staticmethod
+    def row(car):
+        return (str(field_value(car, "car_id")),
+                tuple(field_value(car, field) for field in ("car_id", "brand", "model", "year", "rental_price_per_day")))
+
+    def patch_row(self, car):
+        iid, values = self.row(car)
+        if self.row_values.get(iid) != values:
+            self.tree.item(iid, values=values)
+            self.row_values[iid] = values
+
+    # Прокрутка: команда полосы прокрутки ("moveto", доля) или ("scroll", шаг, "units"/"pages")
+    def on_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.offset = int(float(value) * self.total)
+            self.render()
+        else:
+            self.scroll_by(int(value) * (self.VISIBLE_ROWS if unit == "pages" else 1))
+
+    def scroll_by(self, rows):
+        self.offset += rows
+        self.render()
 
     def show_car_details(self, event):
         selected_item = self.tree.selection()
@@ -146,23 +397,19 @@ class CarView(Observer):
         if not selected_item:
             messagebox.showwarning("Warning", "No car selected")
             return
-        car_id = self.tree.item(selected_item, "values")[0]
+        car_id = int(self.tree.item(selected_item, "values")[0])
         self.controller.delete_car(car_id)
-        self.update()
     
     def open_add_car_form(self):
         CarFormView(self.root, self.controller)
     
+    # Живой поиск: вызывается на каждое нажатие клавиши, окно результатов берется из индекса контроллера
     def apply_filter(self):
-        filter_text = self.entry_filter.get().lower()
-        filtered_cars = self.controller.filter_cars(lambda car: filter_text in car['brand'].lower() or filter_text in car['model'].lower())
-        self.tree.delete(*self.tree.get_children())
-        for car in filtered_cars:
-            self.tree.insert("", tk.END, values=(car['car_id'], car['brand'], car['model'], car['year'], car['rental_price_per_day']))
+        self.offset = 0
+        self.render()
 
     def sort_cars(self, field):
         self.controller.sort_cars(field)
-        self.update()
 
 # Форма добавления/редактирования автомобиля
 class CarFormView(tk.Toplevel):
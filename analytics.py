@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from calendar import monthrange
+
+
+def to_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def month_key(day):
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+# Накопленные показатели одной группы (дня, месяца, машины, марки, клиента)
+class Rollup:
+    __slots__ = ("revenue", "car_days", "rentals", "rental_days")
+
+    def __init__(self):
+        self.revenue = 0.0    # выручка
+        self.car_days = 0     # сколько машино-дней занято
+        self.rentals = 0      # число аренд, отнесенных к группе (для дня/месяца - по дате выдачи)
+        self.rental_days = 0  # суммарная длительность этих аренд
+
+    def average_rental_length(self):
+        return self.rental_days / self.rentals if self.rentals else 0.0
+
+    def as_dict(self):
+        return {"revenue": self.revenue, "car_days": self.car_days, "rentals": self.rentals,
+                "average_rental_length": self.average_rental_length()}
+
+
+# Финансовые показатели пункта проката: выручка, загрузка автопарка и средняя длительность аренды
+# по дням, месяцам, машинам, маркам и клиентам.
+# Итоги поддерживаются инкрементно: создание аренды добавляет ее вклад, отмена - вычитает,
+# поэтому отчет не пересчитывает всю историю аренд.
+# Аренда [start_date, end_date) длится (end_date - start_date).days дней, выручка за каждый день - цена машины
+# на момент бронирования. Вклад аренды запоминается при создании и при отмене вычитается именно он,
+# даже если цену (или марку) машины с тех пор изменили
+class RentalAnalytics:
+    DIMENSIONS = ("day", "month", "car", "brand", "client")
+
+    def __init__(self):
+        self.rollups = {dimension: {} for dimension in self.DIMENSIONS}
+        self.car_ids = set()
+        self.bookings = {}  # rental_id -> (car_id, марка, клиент, начало, конец, цена за день) учтенной аренды
+
+    @property
+    def fleet_size(self):
+        return len(self.car_ids)
+
+    # Подключение к CarRental: учитываются уже существующие неотмененные аренды, дальше - события
+    def attach(self, car_rental):
+        self.car_ids = set(car_rental.cars)
+        for rental in list(car_rental.rentals.values()) + list(car_rental.archive.values()):
+            if rental.is_active:
+                self.rental_created(rental)
+        car_rental.add_listener(self)
+
+    # События CarRental. Повторное добавление машины с тем же id заменяет ее и размер автопарка не меняет
+    def car_added(self, car):
+        self.car_ids.add(car.car_id)
+
+    def rental_created(self, rental):
+        if rental.rental_id in self.bookings:
+            return
+        customer = rental.customer
+        client = customer.get_client_id() if hasattr(customer, "get_client_id") else customer
+        booking = (rental.car.car_id, rental.car.brand, client, to_date(rental.start_date), to_date(rental.end_date),
+                   rental.car.rental_price_per_day)
+        self.bookings[rental.rental_id] = booking
+        self._apply(booking, 1)
+
+    def rental_cancelled(self, rental):
+        booking = self.bookings.pop(rental.rental_id, None)
+        if booking is not None:
+            self._apply(booking, -1)
+
+    def _apply(self, booking, sign):
+        car_id, brand, client, start, end, price = booking
+        days = (end - start).days
+        for dimension, key in (("car", car_id), ("brand", brand), ("client", client)):
+            rollup = self._rollup(dimension, key)
+            rollup.revenue += sign * price * days
+            rollup.car_days += sign * days
+            rollup.rentals += sign
+            rollup.rental_days += sign * days
+        for dimension, key in (("day", start), ("month", month_key(start))):
+            rollup = self._rollup(dimension, key)
+            rollup.rentals += sign
+            rollup.rental_days += sign * days
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            for dimension, key in (("day", day), ("month", month_key(day))):
+                rollup = self._rollup(dimension, key)
+                rollup.revenue += sign * price
+                rollup.car_days += sign
+
+    def _rollup(self, dimension, key):
+        rollup = self.rollups[dimension].get(key)
+        if rollup is None:
+            rollup = self.rollups[dimension][key] = Rollup()
+        return rollup
+
+    # {ключ группы: {"revenue", "car_days", "rentals", "average_rental_length"}}
+    def report(self, dimension):
+        return {key: rollup.as_dict() for key, rollup in sorted(self.rollups[dimension].items(), key=lambda item: str(item[0]))
+                if rollup.rentals or rollup.car_days}
+
+    def revenue_by(self, dimension):
+        return {key: row["revenue"] for key, row in self.report(dimension).items()}
+
+    def average_rental_length_by(self, dimension):
+        return {key: row["average_rental_length"] for key, row in self.report(dimension).items() if row["rentals"]}
+
+    def total_revenue(self):
+        return sum(rollup.revenue for rollup in self.rollups["car"].values())
+
+    # Загрузка автопарка: доля занятых машино-дней
+    def utilization_by_day(self, start_date, end_date):
+        result = {}
+        day = to_date(start_date)
+        while day < to_date(end_date):
+            rollup = self.rollups["day"].get(day)
+            result[day] = (rollup.car_days if rollup else 0) / self.fleet_size if self.fleet_size else 0.0
+            day += timedelta(days=1)
+        return result
+
+    def utilization_by_month(self):
+        result = {}
+        for key, rollup in sorted(self.rollups["month"].items()):
+            year, month = map(int, key.split("-"))
+            capacity = self.fleet_size * monthrange(year, month)[1]
+            result[key] = rollup.car_days / capacity if capacity else 0.0
+        return result
+
+    # Загрузка каждой машины: занятые дни / длина учетного периода period_days
+    def utilization_by_car(self, period_days):
+        return {car_id: rollup.car_days / period_days for car_id, rollup in self.rollups["car"].items()}
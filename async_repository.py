@@ -0,0 +1,278 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from Client import Client, ClientShort
+
+
+# Асинхронные версии интерфейсов CarRepBase и ClientRepository:
+#
+#     car = await repo.get_by_id(5)
+#     async for page in repo.iter_pages(100):
+#         ...
+#
+# Файловые репозитории оборачиваются в ThreadOffload*Repository (вызовы уходят в отдельный поток),
+# для БД есть родные асинхронные репозитории на asyncpg/aiomysql.
+# Число одновременных обращений к БД ограничено max_concurrency (размер пула соединений)
+
+class AsyncCarRepBase:
+    async def get_by_id(self, car_id):
+        raise NotImplementedError
+
+    async def get_k_n_short_list(self, k, n):
+        raise NotImplementedError
+
+    async def sort_by_field(self, field):
+        raise NotImplementedError
+
+    async def add_car(self, car):
+        raise NotImplementedError
+
+    async def update_car(self, car_id, new_car):
+        raise NotImplementedError
+
+    async def delete_car(self, car_id):
+        raise NotImplementedError
+
+    async def get_count(self):
+        raise NotImplementedError
+
+    async def add_cars(self, cars):
+        return [await self.add_car(car) for car in cars]
+
+    # Асинхронный обход всех машин страницами по k
+    async def iter_pages(self, k):
+        n = 0
+        while True:
+            page = await self.get_k_n_short_list(k, n)
+            if page:
+                yield page
+            if len(page) < k:
+                return
+            n += 1
+
+
+class AsyncClientRepository:
+    async def get_by_id(self, client_id):
+        raise NotImplementedError
+
+    async def get_k_n_short_list(self, k, n):
+        raise NotImplementedError
+
+    async def sort_by_field(self, field):
+        raise NotImplementedError
+
+    async def add_client(self, client):
+        raise NotImplementedError
+
+    async def update_client(self, client_id, updated_client):
+        raise NotImplementedError
+
+    async def delete_client(self, client_id):
+        raise NotImplementedError
+
+    async def get_count(self):
+        raise NotImplementedError
+
+    async def add_clients(self, clients):
+        return [await self.add_client(client) for client in clients]
+
+    async def iter_pages(self, k):
+        n = 0
+        while True:
+            page = await self.get_k_n_short_list(k, n)
+            if page:
+                yield page
+            if len(page) < k:
+                return
+            n += 1
+
+
+# Выполнение блокирующих методов синхронного репозитория в отдельном потоке, не блокируя цикл событий.
+# У каждого репозитория один рабочий поток: вызовы выполняются по одному в порядке поступления.
+# Параллельные чтения небезопасны: снимок файла (FileSnapshot), индекс id и вторичные индексы
+# перестраиваются при чтении без блокировки, и чтение рядом с записью могло увидеть их наполовину обновленными
+class ThreadOffload:
+    def __init__(self, repository):
+        self.repository = repository
+        self.executor = ThreadPoolExecutor(1)
+
+    async def run(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, method, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class ThreadOffloadCarRepository(ThreadOffload, AsyncCarRepBase):
+    async def get_by_id(self, car_id):
+        return await self.run(self.repository.get_by_id, car_id)
+
+    async def get_k_n_short_list(self, k, n):
+        return await self.run(self.repository.get_k_n_short_list, k, n)
+
+    async def sort_by_field(self, field):
+        return await self.run(self.repository.sort_by_field, field)
+
+    async def add_car(self, car):
+        return await self.run(self.repository.add_car, car)
+
+    async def update_car(self, car_id, new_car):
+        return await self.run(self.repository.update_car, car_id, new_car)
+
+    async def delete_car(self, car_id):
+        return await self.run(self.repository.delete_car, car_id)
+
+    async def get_count(self):
+        return await self.run(self.repository.get_count)
+
+    async def add_cars(self, cars):
+        return await self.run(self.repository.add_cars, cars)
+
+
+class ThreadOffloadClientRepository(ThreadOffload, AsyncClientRepository):
+    async def get_by_id(self, client_id):
+        return await self.run(self.repository.get_by_id, client_id)
+
+    async def get_k_n_short_list(self, k, n):
+        return await self.run(self.repository.get_k_n_short_list, k, n)
+
+    async def sort_by_field(self, field):
+        return await self.run(self.repository.sort_by_field, field)
+
+    async def add_client(self, client):
+        return await self.run(self.repository.add_client, client)
+
+    async def update_client(self, client_id, updated_client):
+        return await self.run(self.repository.update_client, client_id, updated_client)
+
+    async def delete_client(self, client_id):
+        return await self.run(self.repository.delete_client, client_id)
+
+    async def get_count(self):
+        return await self.run(self.repository.get_count)
+
+    async def add_clients(self, clients):
+        return await self.run(self.repository.add_clients, clients)
+
+
+# Машины в PostgreSQL через asyncpg. Пул соединений asyncpg ограничивает число одновременных запросов:
+#     repo = await AsyncCarRepDB.create(db_config, max_concurrency=10)
+class AsyncCarRepDB(AsyncCarRepBase):
+    COLUMNS = "car_id, brand, model, year, rental_price_per_day"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    async def create(cls, db_config, max_concurrency=10):
+        import asyncpg
+        return cls(await asyncpg.create_pool(**db_config, min_size=1, max_size=max_concurrency))
+
+    async def close(self):
+        await self.pool.close()
+
+    async def get_by_id(self, car_id):
+        row = await self.pool.fetchrow(f"SELECT {self.COLUMNS} FROM cars WHERE car_id = $1", car_id)
+        return tuple(row) if row else None
+
+    async def get_k_n_short_list(self, k, n):
+        rows = await self.pool.fetch(f"SELECT {self.COLUMNS} FROM cars ORDER BY car_id LIMIT $1 OFFSET $2", k, n * k)
+        return [tuple(row) for row in rows]
+
+    async def add_car(self, car):
+        car.car_id = await self.pool.fetchval(
+            "INSERT INTO cars (brand, model, year, rental_price_per_day) VALUES ($1, $2, $3, $4) RETURNING car_id",
+            car.brand, car.model, car.year, car.rental_price_per_day)
+        return car.car_id
+
+    # Пакет одним запросом INSERT ... SELECT FROM unnest(массивы) RETURNING car_id
+    async def add_cars(self, cars):
+        cars = list(cars)
+        rows = await self.pool.fetch(
+            """INSERT INTO cars (brand, model, year, rental_price_per_day)
+               SELECT * FROM unnest($1::text[], $2::text[], $3::int[], $4::numeric[]) RETURNING car_id""",
+            [car.brand for car in cars], [car.model for car in cars],
+            [car.year for car in cars], [car.rental_price_per_day for car in cars])
+        for car, row in zip(cars, rows):
+            car.car_id = row["car_id"]
+        return [car.car_id for car in cars]
+
+    async def update_car(self, car_id, new_car):
+        status = await self.pool.execute(
+            "UPDATE cars SET brand = $1, model = $2, year = $3, rental_price_per_day = $4 WHERE car_id = $5",
+            new_car.brand, new_car.model, new_car.year, new_car.rental_price_per_day, car_id)
+        return status != "UPDATE 0"
+
+    async def delete_car(self, car_id):
+        await self.pool.execute("DELETE FROM cars WHERE car_id = $1", car_id)
+
+    async def get_count(self):
+        return await self.pool.fetchval("SELECT COUNT(*) FROM cars")
+
+
+# Клиенты в MySQL через aiomysql:
+#     repo = await AsyncClientRepDB.create(db_config, max_concurrency=10)
+# Соединения работают в режиме autocommit: чтение не оставляет открытой транзакции
+# (пул закрывает возвращенное соединение с незавершенной транзакцией вместо повторного использования),
+# запись выполняется в явной транзакции с откатом при ошибке
+class AsyncClientRepDB(AsyncClientRepository):
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    async def create(cls, db_config, max_concurrency=10):
+        import aiomysql
+        config = dict(db_config)
+        config["db"] = config.pop("database", None)
+        return cls(await aiomysql.create_pool(**config, minsize=1, maxsize=max_concurrency, autocommit=True))
+
+    async def close(self):
+        self.pool.close()
+        await self.pool.wait_closed()
+
+    async def execute(self, query, params=(), fetch=None, commit=False):
+        import aiomysql
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                if commit:
+                    await conn.begin()
+                    try:
+                        await cursor.execute(query, params)
+                        await conn.commit()
+                    except BaseException:
+                        await conn.rollback()
+                        raise
+                    return cursor.lastrowid
+                await cursor.execute(query, params)
+                if fetch == "one":
+                    return await cursor.fetchone()
+                return await cursor.fetchall()
+
+    async def get_by_id(self, client_id):
+        result = await self.execute("SELECT * FROM clients WHERE client_id = %s", (client_id,), fetch="one")
+        return Client.from_trusted(result) if result else None
+
+    async def get_k_n_short_list(self, k, n):
+        results = await self.execute("SELECT * FROM clients ORDER BY client_id LIMIT %s OFFSET %s", (k, n * k))
+        return [ClientShort.from_row(item) for item in results]
+
+    async def add_client(self, client):
+        return await self.execute(
+            "INSERT INTO clients (full_name, passport_data, contact_number, address) VALUES (%s, %s, %s, %s)",
+            (client.get_full_name(), client.get_passport_data(), client.get_contact_number(), client.get_address()),
+            commit=True)
+
+    async def update_client(self, client_id, updated_client):
+        await self.execute(
+            """UPDATE clients SET full_name = %s, passport_data = %s, contact_number = %s, address = %s
+               WHERE client_id = %s""",
+            (updated_client.get_full_name(), updated_client.get_passport_data(),
+             updated_client.get_contact_number(), updated_client.get_address(), client_id),
+            commit=True)
+
+    async def delete_client(self, client_id):
+        await self.execute("DELETE FROM clients WHERE client_id = %s", (client_id,), commit=True)
+
+    async def get_count(self):
+        result = await self.execute("SELECT COUNT(*) AS count FROM clients", fetch="one")
+        return result["count"]
@@ -1,4 +1,5 @@
 from datetime import datetime
+from bisect import bisect_left
 
 #Методы для работы с автомобилями, их бронированием
 
@@ -9,7 +10,7 @@ class Car:
         self.model = model
         self.year = year
         self.rental_price_per_day = rental_price_per_day
-        self.is_available = True
+        self.is_available = True  # машина в строю (False - например, в ремонте); занятость по датам - в BookingSchedule
 
     def __str__(self):
         return f"{self.brand} {self.model} ({self.year})"
@@ -25,37 +26,95 @@ class Rental:
 
     def cancel(self):
         self.is_active = False
-        self.car.is_available = True
         print(f"Rental {self.rental_id} canceled.")
 
+# Расписание одной машины: непересекающиеся брони [начало, конец), отсортированные по началу.
+# Раз брони не пересекаются, концы тоже отсортированы, и проверка свободного интервала -
+# один бинарный поиск: пересечься с [start, end) может только последняя бронь, начавшаяся раньше end
+class BookingSchedule:
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.rental_ids = []
+
+    def is_free(self, start_date, end_date):
+        i = bisect_left(self.starts, end_date)
+        return i == 0 or self.ends[i - 1] <= start_date
+
+    def book(self, rental_id, start_date, end_date):
+        if not self.is_free(start_date, end_date):
+            raise ValueError(f"Car is already booked between {start_date} and {end_date}")
+        i = bisect_left(self.starts, start_date)
+        self.starts.insert(i, start_date)
+        self.ends.insert(i, end_date)
+        self.rental_ids.insert(i, rental_id)
+
+    def release(self, rental_id, start_date):
+        i = bisect_left(self.starts, start_date)
+        if i < len(self.starts) and self.rental_ids[i] == rental_id:
+            del self.starts[i], self.ends[i], self.rental_ids[i]
+
+# Машины и аренды хранятся в словарях по id, поэтому бронирование и отмена - O(1) поиска.
+# В self.rentals только действующие аренды, завершенные и отмененные переносятся в архив
 class CarRental:
     def __init__(self):
-        self.cars = []
-        self.rentals = []
+        self.cars = {}       # car_id -> Car
+        self.rentals = {}    # rental_id -> действующая Rental
+        self.archive = {}    # rental_id -> завершенная или отмененная Rental
+        self.schedules = {}  # car_id -> BookingSchedule
+        self.listeners = []  # получают car_added, rental_created, rental_cancelled (например, RentalAnalytics)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
 
     def add_car(self, car):
-        self.cars.append(car)
+        self.cars[car.car_id] = car
+        self.schedules.setdefault(car.car_id, BookingSchedule())
+        for listener in self.listeners:
+            listener.car_added(car)
         print(f"Car {car} added to the fleet.")
 
+    def get_rental(self, rental_id):
+        return self.rentals.get(rental_id) or self.archive.get(rental_id)
+
+    # Бронь на [start_date, end_date): машина должна быть в строю и свободна на эти даты.
+    # Возвращает созданную аренду или None
     def create_rental(self, rental_id, car_id, customer, start_date, end_date):
-        car = next((car for car in self.cars if car.car_id == car_id), None)
-        if car and car.is_available:
+        car = self.cars.get(car_id)
+        if (car and car.is_available and start_date < end_date and self.get_rental(rental_id) is None
+                and self.schedules[car_id].is_free(start_date, end_date)):
             rental = Rental(rental_id, car, customer, start_date, end_date)
-            self.rentals.append(rental)
-            car.is_available = False
+            self.rentals[rental_id] = rental
+            self.schedules[car_id].book(rental_id, start_date, end_date)
+            for listener in self.listeners:
+                listener.rental_created(rental)
             print(f"Rental {rental_id} created for {car}.")
-        else:
-            print("Car not available for rental.")
+            return rental
+        print("Car not available for rental.")
+        return None
 
+    # Машины, свободные на весь интервал [start_date, end_date): O(log b) на машину, b - число ее броней
     def find_available_cars(self, start_date, end_date):
-        available_cars = [car for car in self.cars if car.is_available]
-        print("Available cars:")
-        for car in available_cars:
-            print(car)
+        return [car for car in self.cars.values()
+                if car.is_available and self.schedules[car.car_id].is_free(start_date, end_date)]
 
     def cancel_rental(self, rental_id):
-        rental = next((rental for rental in self.rentals if rental.rental_id == rental_id), None)
-        if rental and rental.is_active:
+        rental = self.rentals.pop(rental_id, None)
+        if rental:
             rental.cancel()
+            self.schedules[rental.car.car_id].release(rental_id, rental.start_date)
+            self.archive[rental_id] = rental
+            for listener in self.listeners:
+                listener.rental_cancelled(rental)
         else:
             print("Rental not found or already canceled.")
+
+    # Переносит в архив аренды, закончившиеся к дате today, и убирает их из расписаний машин.
+    # is_active у них не меняется: False остается признаком отмененной аренды
+    def archive_finished(self, today):
+        finished = [rental for rental in self.rentals.values() if rental.end_date <= today]
+        for rental in finished:
+            del self.rentals[rental.rental_id]
+            self.schedules[rental.car.car_id].release(rental.rental_id, rental.start_date)
+            self.archive[rental.rental_id] = rental
+        return finished
@@ -0,0 +1,422 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+from itertools import chain
+
+from car_repository import Car, CarRepJSON, CarRepYAML, CarRepJSONL, CarRepDB
+from Client import Client, ClientRepJson, ClientRepYaml, ClientRepJsonl, ClientDBAdapter
+from db_pool import ConnectionPool
+from instrumentation import InstrumentedRepository, Metrics, instrument_pool
+
+# Нагрузочный тест репозиториев машин и клиентов на синтетических данных:
+#
+#     python benchmark.py                                   # 1000 записей, все хранилища
+#     python benchmark.py --sizes 1000 100000 1000000 --backends json json-journal db
+#     python benchmark.py --save-baseline                   # запомнить результаты как эталон
+#     python benchmark.py --output bench_output.txt         # сравнение с эталоном, код возврата 1 при регрессии
+#
+# Для каждой операции (get_by_id, get_k_n_short_list, get_count, update, add, delete, sort_by_field)
+# считаются пропускная способность, перцентили задержки, пиковая память (tracemalloc) и ввод-вывод одного вызова
+# (байты для файлов, запросы и строки для БД - через instrumentation.py).
+# Хранилища БД работают с локальной SQLite вместо PostgreSQL/MySQL (см. SqliteConnection)
+
+PAGE_SIZE = 20
+DEFAULT_BASELINE = "bench_baseline.json"
+
+BRANDS = {
+    "Toyota": ("Camry", "Corolla", "RAV4", "Land Cruiser"),
+    "Kia": ("Rio", "Ceed", "Sportage", "K5"),
+    "Hyundai": ("Solaris", "Creta", "Tucson", "Elantra"),
+    "Lada": ("Vesta", "Granta", "Niva", "Largus"),
+    "Volkswagen": ("Polo", "Tiguan", "Passat", "Golf"),
+    "BMW": ("X5", "X3", "M5", "320i"),
+}
+LAST_NAMES = ("Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов", "Михайлов", "Новиков", "Федоров")
+FIRST_NAMES = ("Иван", "Петр", "Алексей", "Сергей", "Дмитрий", "Андрей", "Михаил", "Николай", "Егор", "Артем")
+PATRONYMICS = ("Иванович", "Петрович", "Алексеевич", "Сергеевич", "Дмитриевич", "Андреевич", "Михайлович")
+STREETS = ("Ленина", "Мира", "Гагарина", "Пушкина", "Садовая", "Лесная", "Школьная", "Советская")
+CITIES = ("Москва", "Казань", "Самара", "Тверь", "Омск", "Пермь")
+
+
+# Синтетические данные. Генераторы детерминированы (seed), id записей - 1..count, паспорт клиента - его номер
+def make_car(rng, car_id=None):
+    brand = rng.choice(tuple(BRANDS))
+    return Car(car_id, brand, rng.choice(BRANDS[brand]), rng.randint(2005, 2024), float(rng.randrange(1500, 15000, 50)))
+
+
+def make_client(rng, number, client_id=None):
+    return Client(client_id, f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(PATRONYMICS)}",
+                  f"{number:010d}", f"+7{rng.randrange(9000000000, 9999999999)}",
+                  f"г. {rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, д. {rng.randint(1, 150)}")
+
+
+def generate_cars(count, seed=0):
+    rng = random.Random(seed)
+    for car_id in range(1, count + 1):
+        yield make_car(rng, car_id)
+
+
+def generate_clients(count, seed=0):
+    rng = random.Random(seed)
+    for client_id in range(1, count + 1):
+        yield make_client(rng, client_id, client_id)
+
+
+def car_record(car):
+    return dict(car.__dict__)
+
+
+def client_record(client):
+    return dict(client_id=client.get_client_id(), **ClientRepJson.client_fields(client))
+
+
+# Замена драйвера БД для тестов: DB-API соединение SQLite с интерфейсом psycopg2/mysql.connector,
+# который ожидают CarRepDB и ClientRepDB: параметры %s, курсор - менеджер контекста, cursor(dictionary=True).
+# Специфичные для PostgreSQL запросы (execute_values, = ANY(...)) не поддерживаются, их пакетные операции не измеряются
+class SqliteCursor:
+    def __init__(self, cursor, dictionary=False):
+        self.cursor = cursor
+        self.dictionary = dictionary
+        self.rows = []
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace("%s", "?"), tuple(params))
+        # SQLite не дает завершить транзакцию, пока не дочитан INSERT ... RETURNING, поэтому результат читается сразу
+        self.rows = self.cursor.fetchall() if self.cursor.description else []
+        self.rows.reverse()
+
+    def executemany(self, query, params):
+        self.cursor.executemany(query.replace("%s", "?"), [tuple(p) for p in params])
+        self.rows = []
+
+    def row(self, values):
+        if self.dictionary:
+            return dict(zip((column[0] for column in self.cursor.description), values))
+        return values
+
+    def fetchone(self):
+        return self.row(self.rows.pop()) if self.rows else None
+
+    def fetchmany(self, size=1):
+        return [self.fetchone() for _ in range(min(size, len(self.rows)))]
+
+    def fetchall(self):
+        rows, self.rows = self.rows[::-1], []
+        return [self.row(values) for values in rows]
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SqliteConnection:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, dictionary=False):
+        return SqliteCursor(self.connection.cursor(), dictionary)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+
+SCHEMA = {
+    "cars": """CREATE TABLE cars (car_id INTEGER PRIMARY KEY AUTOINCREMENT, brand TEXT, model TEXT,
+                                  year INTEGER, rental_price_per_day REAL)""",
+    "clients": """CREATE TABLE clients (client_id INTEGER PRIMARY KEY AUTOINCREMENT, full_name TEXT,
+                                        passport_data TEXT UNIQUE, contact_number TEXT, address TEXT)""",
+}
+# Индексы и вспомогательные таблицы (суффиксы ФИО для ClientRepDB.search_by_name)
+INDEXES = {
+    "cars": (),
+    "clients": ("CREATE INDEX clients_contact_number ON clients (contact_number)",
+                "CREATE INDEX clients_full_name ON clients (full_name)",
+                """CREATE TABLE client_name_suffixes (client_id INTEGER NOT NULL, position INTEGER NOT NULL,
+                                                     word_start INTEGER NOT NULL, suffix TEXT NOT NULL,
+                                                     PRIMARY KEY (client_id, position))""",
+                "CREATE INDEX client_name_suffixes_suffix ON client_name_suffixes (suffix)"),
+}
+
+
+# Соединения сразу инструментированы, чтобы measure видел число запросов (вне замера обертка почти ничего не стоит)
+def sqlite_pool(path):
+    return instrument_pool(ConnectionPool(lambda: SqliteConnection(path)))
+
+
+# Заполнение таблицы напрямую через sqlite3 (быстрее, чем через репозиторий)
+def seed_sqlite(path, table, records):
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute(SCHEMA[table])
+        for statement in INDEXES[table]:
+            connection.execute(statement)
+        records = iter(records)
+        first = next(records, None)
+        if first is not None:
+            columns = list(first)
+            connection.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                ([record[column] for column in columns] for record in chain([first], records)))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+# Хранилища: имя -> функция (каталог, сущность, записи) -> репозиторий, уже заполненный записями
+def file_backend(car_class, client_class, extension, journal=False):
+    def create(directory, entity, records):
+        path = os.path.join(directory, f"{entity}.{extension}")
+        repository = car_class(path, journal) if entity == "cars" else client_class(path, journal)
+        repository.write_all(list(records))
+        return repository
+    return create
+
+
+def db_backend(directory, entity, records):
+    path = os.path.join(directory, f"{entity}.sqlite")
+    seed_sqlite(path, entity, records)
+    if entity == "cars":
+        return CarRepDB(pool=sqlite_pool(path))
+    repository = ClientDBAdapter(sqlite_pool(path))
+    repository.rebuild_name_index()
+    return repository
+
+
+BACKENDS = {
+    "json": file_backend(CarRepJSON, ClientRepJson, "json"),
+    "json-journal": file_backend(CarRepJSON, ClientRepJson, "json", journal=True),
+    "yaml": file_backend(CarRepYAML, ClientRepYaml, "yaml"),
+    "jsonl": file_backend(CarRepJSONL, ClientRepJsonl, "jsonl"),
+    "db": db_backend,
+}
+
+
+# Состояние прогона: случайные id существующих записей и id добавленных (их и удаляет delete)
+class Workload:
+    def __init__(self, size, seed):
+        self.size = size
+        self.rng = random.Random(seed)
+        self.added = []
+        self.next_number = size + 1  # номер паспорта для нового клиента
+        self.last_original = size    # удаляется, если добавленных записей не осталось
+
+    def random_id(self):
+        return self.rng.randint(1, self.last_original)
+
+    def random_page(self):
+        return self.rng.randrange(max(1, self.size // PAGE_SIZE))
+
+    def deleted_id(self):
+        if self.added:
+            return self.added.pop()
+        self.last_original -= 1
+        return self.last_original + 1
+
+    def new_car(self):
+        return make_car(self.rng)
+
+    def new_client(self, number=None):
+        if number is None:
+            number, self.next_number = self.next_number, self.next_number + 1
+        return make_client(self.rng, number)
+
+
+# Операции: (имя, вызов(репозиторий, workload)). Порядок важен: сначала чтение, затем запись, сортировка последней
+OPERATIONS = {
+    "cars": (
+        ("get_by_id", lambda repo, w: repo.get_by_id(w.random_id())),
+        ("get_k_n_short_list", lambda repo, w: repo.get_k_n_short_list(PAGE_SIZE, w.random_page())),
+        ("get_count", lambda repo, w: repo.get_count()),
+        ("update_car", lambda repo, w: repo.update_car(w.random_id(), w.new_car())),
+        ("add_car", lambda repo, w: w.added.append(repo.add_car(w.new_car()))),
+        ("delete_car", lambda repo, w: repo.delete_car(w.deleted_id())),
+        ("sort_by_field", lambda repo, w: repo.sort_by_field("rental_price_per_day")),
+    ),
+    "clients": (
+        ("get_by_id", lambda repo, w: repo.get_by_id(w.random_id())),
+        ("get_k_n_short_list", lambda repo, w: repo.get_k_n_short_list(PAGE_SIZE, w.random_page())),
+        ("get_count", lambda repo, w: repo.get_count()),
+        ("update_client", lambda repo, w: _update_client(repo, w)),
+        ("add_client", lambda repo, w: w.added.append(repo.add_client(w.new_client()))),
+        ("delete_client", lambda repo, w: repo.delete_client(w.deleted_id())),
+        ("sort_by_field", lambda repo, w: repo.sort_by_field("full_name")),
+    ),
+}
+
+
+# Паспорт уникален, поэтому обновленный клиент сохраняет паспорт (он равен client_id исходных записей)
+def _update_client(repo, workload):
+    client_id = workload.random_id()
+    repo.update_client(client_id, workload.new_client(client_id))
+
+
+GENERATORS = {"cars": (generate_cars, car_record), "clients": (generate_clients, client_record)}
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))]
+
+
+# Замер одной операции: вызовы повторяются repeat раз или пока не истечет budget секунд (но не меньше min_calls).
+# Затем один дополнительный вызов под tracemalloc и instrumentation: пиковая память и ввод-вывод на вызов
+def measure(repository, workload, call, repeat, budget, min_calls=3):
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat and (len(samples) < min_calls or time.perf_counter() - started < budget):
+        start = time.perf_counter()
+        call(repository, workload)
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    samples.sort()
+
+    metrics = Metrics()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        call(InstrumentedRepository(repository, metrics, "benchmark"), workload)
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    io = next(iter(metrics.snapshot().values()))
+    return {
+        "calls": len(samples),
+        "ops_per_sec": len(samples) / total if total else float("inf"),
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": samples[-1] * 1000,
+        "peak_kb": peak / 1024,
+        "read_kb": io["bytes_read"] / 1024,
+        "written_kb": io["bytes_written"] / 1024,
+        "statements": io["statements"],
+    }
+
+
+# Результаты: {"сущность/хранилище/размер/операция": {...}}
+def run(entities, backends, sizes, repeat=1000, budget=2.0, seed=0, directory=None, log=print):
+    results = {}
+    for entity in entities:
+        generate, record = GENERATORS[entity]
+        for size in sizes:
+            for backend in backends:
+                with tempfile.TemporaryDirectory(dir=directory) as workdir:
+                    start = time.perf_counter()
+                    repository = BACKENDS[backend](workdir, entity, (record(item) for item in generate(size, seed)))
+                    log(f"{entity}/{backend}/{size}: seeded in {time.perf_counter() - start:.2f} s")
+                    workload = Workload(size, seed)
+                    for operation, call in OPERATIONS[entity]:
+                        key = f"{entity}/{backend}/{size}/{operation}"
+                        try:
+                            results[key] = measure(repository, workload, call, repeat, budget)
+                        except NotImplementedError:
+                            log(f"{key}: not supported")
+                            continue
+                        log(format_row(key, results[key]))
+                    pool = getattr(repository, "pool", None)
+                    if pool is not None:
+                        pool.close_all()
+    return results
+
+
+HEADER = (f"{'operation':<48} {'calls':>6} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'peak KB':>9} {'read KB':>9} {'wrt KB':>9} {'sql':>4}")
+
+
+def format_row(key, r):
+    return (f"{key:<48} {r['calls']:>6} {r['ops_per_sec']:>10.0f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} "
+            f"{r['p99_ms']:>9.3f} {r['peak_kb']:>9.1f} {r['read_kb']:>9.1f} {r['written_kb']:>9.1f} {r['statements']:>4}")
+
+
+# Регрессии относительно эталона: медиана задержки или пиковая память выросли больше чем на tolerance
+# (для памяти есть запас 64 КБ, чтобы не реагировать на мелкие колебания)
+def compare(results, baseline, tolerance=0.25):
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p50 {base['p50_ms']:.3f} -> {result['p50_ms']:.3f} ms")
+        if result["peak_kb"] > base["peak_kb"] * (1 + tolerance) + 64:
+            regressions.append(f"{key}: peak memory {base['peak_kb']:.1f} -> {result['peak_kb']:.1f} KB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark car and client repositories on synthetic data")
+    parser.add_argument("--entities", nargs="+", choices=tuple(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--backends", nargs="+", choices=tuple(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000], help="records per repository (e.g. 1000 100000 1000000)")
+    parser.add_argument("--repeat", type=int, default=1000, help="max calls per operation")
+    parser.add_argument("--budget", type=float, default=2.0, help="max seconds per operation (at least 3 calls)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="directory for temporary data files (default: system temp)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    lines = [HEADER]
+
+    def log(line):
+        print(line, flush=True)
+        lines.append(line)
+
+    print(HEADER)
+    results = run(args.entities, args.backends, args.sizes, args.repeat, args.budget, args.seed, args.workdir, log)
+    status = 0
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        log(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            log(f"REGRESSION {regression}")
+        log(f"{len(regressions)} regression(s) against {args.baseline}")
+        status = 1 if regressions else 0
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+# LRU-кэш с ограничением числа записей и необязательным временем жизни записи (ttl, секунды).
+# Потокобезопасный, считает попадания, промахи, вытеснения и устаревшие записи.
+# Используется кэширующими декораторами репозиториев (CachedCarRepository, CachedClientRepository)
+class LRUCache:
+    MISSING = object()
+
+    def __init__(self, max_size=1024, ttl=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # ключ -> (значение, момент устаревания или None)
+        self.lock = threading.Lock()
+        self.generation = 0  # растет при каждом сбросе, чтобы не положить в кэш значение, прочитанное до сброса
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Значение или LRUCache.MISSING
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.clock():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return self.MISSING
+
+    def put(self, key, value, generation=None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (value, self.clock() + self.ttl if self.ttl else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # Чтение через кэш: при промахе значение загружается load() и запоминается
+    def get_or_load(self, key, load):
+        value = self.get(key)
+        if value is self.MISSING:
+            generation = self.generation
+            value = load()
+            self.put(key, value, generation)
+        return value
+
+    def invalidate(self, *keys):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self.entries.pop(key, None)
+
+    # Сброс записей, для которых predicate(ключ, значение) истинно
+    def invalidate_where(self, predicate):
+        with self.lock:
+            self.generation += 1
+            for key in [key for key, (value, _) in self.entries.items() if predicate(key, value)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "expirations": self.expirations, "size": len(self.entries), "max_size": self.max_size,
+                    "hit_rate": self.hits / requests if requests else 0.0}
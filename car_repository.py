@@ -1,7 +1,17 @@
 import json
-import yaml
 import os
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
 from datetime import datetime
+from serialization import get_codec
+from file_storage import RecordFile, JsonLinesFile, FileLock, locked
+from db_pool import ConnectionPool
+from pagination import encode_token, decode_token, keyset_clause
+from query import CompiledQuery, Sort
+from filter_index import FilteredIds, iter_pages
+from cache import LRUCache
 
 # Сущность автомобиля
 class Car:
@@ -20,6 +30,8 @@ class CarRepBase:
     def get_k_n_short_list(self, k, n):
         raise NotImplementedError
 
+    # CarRepJSON (и наследники) переупорядочивает сам файл и ничего не возвращает.
+    # CarRepBinary файл не меняет (id машины - номер ее слота) и возвращает отсортированный список
     def sort_by_field(self, field):
         raise NotImplementedError
 
@@ -35,6 +47,17 @@ class CarRepBase:
     def get_count(self):
         raise NotImplementedError
 
+    # Пакетные операции. По умолчанию - цикл по одиночным, хранилища переопределяют их одной записью/транзакцией
+    def add_cars(self, cars):
+        return [self.add_car(car) for car in cars]
+
+    def update_cars(self, cars):  # cars: {car_id: new_car}
+        return sum(1 for car_id, new_car in cars.items() if self.update_car(car_id, new_car))
+
+    def delete_cars(self, car_ids):
+        for car_id in car_ids:
+            self.delete_car(car_id)
+
 # Адаптер для репозиториев
 class CarRepositoryAdapter(CarRepBase):
     def __init__(self, repository):
@@ -61,12 +84,28 @@ class CarRepositoryAdapter(CarRepBase):
     def get_count(self):
         return self.repository.get_count()
 
-# Декоратор для фильтрации и сортировки
+    def add_cars(self, cars):
+        return self.repository.add_cars(cars)
+
+    def update_cars(self, cars):
+        return self.repository.update_cars(cars)
+
+    def delete_cars(self, car_ids):
+        return self.repository.delete_cars(car_ids)
+
+# id машины: у словаря (файловые репозитории) - поле car_id, у строки из БД - первая колонка
+def car_key(car):
+    return car["car_id"] if isinstance(car, dict) else car[0]
+
+# Декоратор для фильтрации и сортировки.
+# Количество машин, прошедших фильтр, материализовано: множество их id строится один раз
+# и обновляется при записи через декоратор. Если хранилище меняли в обход декоратора, вызовите refresh()
 class FilterSortDecorator(CarRepBase):
     def __init__(self, repository, filter_func=None, sort_key=None):
         self.repository = repository
         self.filter_func = filter_func
         self.sort_key = sort_key
+        self.matching = FilteredIds(filter_func, car_key) if filter_func else None
 
     def get_k_n_short_list(self, k, n):
         cars = self.repository.get_k_n_short_list(k, n)
@@ -76,121 +115,481 @@ class FilterSortDecorator(CarRepBase):
             cars.sort(key=lambda car: car[self.sort_key])
         return cars
 
+    def all_cars(self):
+        return iter_pages(self.repository.get_k_n_short_list)
+
     def get_count(self):
-        if self.filter_func:
-            return len(list(filter(self.filter_func, self.repository.get_k_n_short_list(1000, 0))))
-        return self.repository.get_count()
+        if self.matching is None:
+            return self.repository.get_count()
+        if not self.matching.is_built():
+            self.matching.build(self.all_cars())
+        return len(self.matching)
+
+    def refresh(self):
+        if self.matching:
+            self.matching.reset()
+
+    def get_by_id(self, car_id):
+        return self.repository.get_by_id(car_id)
+
+    def sort_by_field(self, field):
+        return self.repository.sort_by_field(field)
+
+    def add_car(self, car):
+        car_id = self.repository.add_car(car)
+        self.cars_changed([car_id])
+        return car_id
+
+    def update_car(self, car_id, new_car):
+        result = self.repository.update_car(car_id, new_car)
+        self.cars_changed([car_id])
+        return result
+
+    def delete_car(self, car_id):
+        result = self.repository.delete_car(car_id)
+        self.cars_deleted([car_id])
+        return result
+
+    def add_cars(self, cars):
+        car_ids = self.repository.add_cars(cars)
+        self.cars_changed(car_ids)
+        return car_ids
+
+    def update_cars(self, cars):
+        result = self.repository.update_cars(cars)
+        self.cars_changed(list(cars))
+        return result
+
+    def delete_cars(self, car_ids):
+        car_ids = list(car_ids)
+        result = self.repository.delete_cars(car_ids)
+        self.cars_deleted(car_ids)
+        return result
+
+    # Пересчет принадлежности фильтру только для измененных машин
+    def cars_changed(self, car_ids):
+        if not self.matching or not self.matching.is_built():
+            return
+        for car_id in car_ids:
+            if car_id is None:  # хранилище не вернуло id - пересчитаем целиком при следующем get_count
+                self.matching.reset()
+                return
+            self.matching.record_changed(car_id, self.repository.get_by_id(car_id))
+
+    def cars_deleted(self, car_ids):
+        if self.matching:
+            for car_id in car_ids:
+                self.matching.record_changed(car_id, None)
+
+# Копия машины из кэша: словари изменяемые, поэтому каждый вызывающий получает свой экземпляр
+def copy_car(car):
+    return dict(car) if isinstance(car, dict) else car
+
+# Кэширующий декоратор (read-through) для любого CarRepBase: get_by_id, страницы и количество
+# берутся из LRU-кэша (max_size записей, ttl секунд или без ограничения по времени).
+# Запись через декоратор сбрасывает только затронутое: изменение машины - ее запись и страницы с ней,
+# добавление/удаление - еще и все страницы (позиции сдвигаются) и количество.
+# Изменения в обход декоратора видны после истечения ttl или вызова refresh()
+class CachedCarRepository(CarRepositoryAdapter):
+    def __init__(self, repository, max_size=1024, ttl=None):
+        super().__init__(repository)
+        self.cache = LRUCache(max_size, ttl)
+
+    def get_by_id(self, car_id):
+        return copy_car(self.cache.get_or_load(("id", car_id), lambda: self.repository.get_by_id(car_id)))
+
+    def get_k_n_short_list(self, k, n):
+        page = self.cache.get_or_load(("page", k, n), lambda: self.repository.get_k_n_short_list(k, n))
+        return [copy_car(car) for car in page]
+
+    def get_count(self):
+        return self.cache.get_or_load(("count",), self.repository.get_count)
+
+    def sort_by_field(self, field):
+        result = self.repository.sort_by_field(field)
+        self.cache.clear()
+        return result
+
+    def add_car(self, car):
+        car_id = self.repository.add_car(car)
+        self.cars_moved([car_id])
+        return car_id
+
+    def update_car(self, car_id, new_car):
+        result = self.repository.update_car(car_id, new_car)
+        self.cars_updated([car_id])
+        return result
+
+    def delete_car(self, car_id):
+        result = self.repository.delete_car(car_id)
+        self.cars_moved([car_id])
+        return result
+
+    def add_cars(self, cars):
+        car_ids = self.repository.add_cars(cars)
+        self.cars_moved(car_ids)
+        return car_ids
+
+    def update_cars(self, cars):
+        result = self.repository.update_cars(cars)
+        self.cars_updated(list(cars))
+        return result
+
+    def delete_cars(self, car_ids):
+        car_ids = list(car_ids)
+        result = self.repository.delete_cars(car_ids)
+        self.cars_moved(car_ids)
+        return result
+
+    def cars_updated(self, car_ids):
+        car_ids = set(car_ids)
+        self.cache.invalidate_where(lambda key, value: key[0] == "id" and key[1] in car_ids
+                                    or key[0] == "page" and any(car_key(car) in car_ids for car in value))
+
+    def cars_moved(self, car_ids):
+        car_ids = set(car_ids)
+        if None in car_ids:  # хранилище не вернуло id
+            self.cache.clear()
+            return
+        self.cache.invalidate_where(lambda key, value: key[0] != "id" or key[1] in car_ids)
+
+    def refresh(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
 
 #JSON
+# Файловый репозиторий. Формат файла задает кодек (имя из serialization.CODECS или объект Codec):
+# "json" (с отступами), "json-compact", "yaml", "msgpack", ...
 class CarRepJSON(CarRepBase):
-    def __init__(self, filename="cars.json"):
+    STORAGE = RecordFile
+
+    def __init__(self, filename="cars.json", journal=False, compact_threshold=1000, codec="json"):
         self.filename = filename
-        if not os.path.exists(filename):
-            with open(filename, "w") as f:
-                json.dump([], f)
+        self.codec = get_codec(codec)
+        # Файл, журнал (filename.journal), снимок в памяти и блокировка писателя
+        self.storage = self.STORAGE(filename, self.codec, "car_id", journal, compact_threshold)
+        self.journal = self.storage.journal
+        self.snapshot = self.storage.snapshot
+        self.lock = self.storage.lock
+        with self.lock:
+            if not os.path.exists(filename):
+                self.write_all([])
 
     def read_all(self):
-        with open(self.filename, "r") as f:
-            return json.load(f)
+        return self.storage.read_all()
 
     def write_all(self, data):
-        with open(self.filename, "w") as f:
-            json.dump(data, f, indent=4)
+        self.storage.write_all(data)
+
+    def compact(self):
+        self.storage.compact()
 
     def get_by_id(self, car_id):
-        return next((car for car in self.read_all() if car["car_id"] == car_id), None)
+        car = self.snapshot.find(car_id)
+        return dict(car) if car else None
 
+    def get_k_n_short_list(self, k, n):
+        return [dict(car) for car in self.storage.page(n * k, k)]
+
+    @locked
     def sort_by_field(self, field):
         data = self.read_all()
         data.sort(key=lambda x: x[field])
         self.write_all(data)
 
     def add_car(self, car):
-        data = self.read_all()
-        car.car_id = max([c["car_id"] for c in data], default=0) + 1
-        data.append(car.__dict__)
-        self.write_all(data)
+        return self.add_cars([car])[0]
 
+    # Одиночные изменения - частный случай пакетных
     def update_car(self, car_id, new_car):
-        data = self.read_all()
-        for i, car in enumerate(data):
-            if car["car_id"] == car_id:
-                data[i] = new_car.__dict__
-                self.write_all(data)
-                return True
-        return False
+        return self.update_cars({car_id: new_car}) > 0
 
     def delete_car(self, car_id):
-        data = self.read_all()
-        data = [car for car in data if car["car_id"] != car_id]
-        self.write_all(data)
+        self.delete_cars([car_id])
+
+    # Пакетные операции: одно чтение-изменение-запись файла (или одна дозапись журнала) на весь пакет
+    @locked
+    def add_cars(self, cars):
+        next_id = self.snapshot.next_key()
+        records = []
+        for car in cars:
+            car.car_id = next_id
+            next_id += 1
+            records.append(dict(car.__dict__))
+        self.storage.put(*records)
+        return [record["car_id"] for record in records]
+
+    @locked
+    def update_cars(self, cars):
+        records = [dict(new_car.__dict__, car_id=car_id)
+                   for car_id, new_car in cars.items() if self.snapshot.find(car_id) is not None]
+        self.storage.put(*records)
+        return len(records)
+
+    @locked
+    def delete_cars(self, car_ids):
+        self.storage.delete(*{car_id for car_id in car_ids if self.snapshot.find(car_id) is not None})
 
-# YAML
-class CarRepYAML(CarRepBase):
-    def __init__(self, filename="cars.yaml"):
+    def get_count(self):
+        return self.snapshot.count()
+
+# YAML. Отличается от JSON только кодеком по умолчанию
+class CarRepYAML(CarRepJSON):
+    def __init__(self, filename="cars.yaml", journal=False, compact_threshold=1000, codec="yaml"):
+        super().__init__(filename, journal, compact_threshold, codec)
+
+# JSON Lines: по машине на строку + боковой индекс смещений (filename.idx)
+class CarRepJSONL(CarRepJSON):
+    STORAGE = JsonLinesFile
+
+    def __init__(self, filename="cars.jsonl", journal=False, compact_threshold=1000):
+        super().__init__(filename, journal, compact_threshold, "jsonl")
+
+# Бинарное хранилище: записи фиксированной длины в отображенном в память файле (mmap).
+# car_id = номер слота + 1, поэтому поиск по id - это вычисление смещения, а страница - срез отображения.
+# Марка и модель хранятся в таблице строк (filename.strings), в записи лежат только их номера.
+# Удаленная запись остается "надгробием", ее слот не занимается повторно: новый автомобиль всегда получает
+# следующий id, поэтому id удаленной машины не достанется другой (кэши, наблюдатели и аналитика хранят id).
+# Цена - файл не уменьшается после удалений.
+# Для страниц при наличии надгробий в памяти держится упорядоченный массив номеров живых слотов:
+# страница n - это срез массива и чтение k записей по смещениям, без разбора всего файла
+class CarRepBinary(CarRepBase):
+    HEADER = struct.Struct("<4sIqqq")    # сигнатура, версия, занятые слоты, живые записи, -1 (раньше - список свободных слотов)
+    RECORD = struct.Struct("<?3xqIIid")  # живая?, car_id, марка, модель, год, цена
+    MAGIC = b"CARB"
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, filename="cars.bin"):
         self.filename = filename
+        self.strings_filename = filename + ".strings"
         if not os.path.exists(filename):
-            with open(filename, "w") as f:
-                yaml.dump([], f)
+            with open(filename, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, 1, 0, 0, -1))
+                f.truncate(self.offset(self.INITIAL_CAPACITY))
+        self.file = open(filename, "r+b")
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        if self.HEADER.unpack_from(self.mm, 0)[0] != self.MAGIC:
+            raise ValueError(f"{filename} is not a car binary file")
+        # Блокировка писателя: заголовок, записи и таблицу строк меняет один процесс за раз
+        self.lock = FileLock(filename)
+        self.strings = []
+        self.string_ids = {}
+        self.strings_size = 0  # сколько байт таблицы строк уже прочитано
+        self.load_strings()
+        self.live_slots = array("q")
+        self.live_header = None  # заголовок, которому соответствует live_slots
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def offset(self, slot):
+        return self.HEADER.size + slot * self.RECORD.size
+
+    # (занятые слоты, живые записи). Если файл вырос в другом процессе, отображение обновляется
+    def header(self):
+        _, _, slots, live, _ = self.HEADER.unpack_from(self.mm, 0)
+        if self.offset(slots) > len(self.mm):
+            self.remap()
+        return slots, live
+
+    def set_header(self, slots, live):
+        self.HEADER.pack_into(self.mm, 0, self.MAGIC, 1, slots, live, -1)
+
+    def remap(self, size=None):
+        self.mm.close()
+        if size is not None:
+            self.file.truncate(size)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+    def ensure_capacity(self, slots):
+        if self.offset(slots) > len(self.mm):
+            self.remap(self.offset(max(slots, 2 * (len(self.mm) - self.HEADER.size) // self.RECORD.size)))
+
+    # Таблица строк: по строке JSON на марку/модель, номер строки - номер в записи.
+    # Дочитываются только строки, добавленные после прошлого чтения (в том числе другим процессом)
+    def load_strings(self):
+        try:
+            f = open(self.strings_filename, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self.strings_size)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            s = json.loads(line)
+            self.string_ids.setdefault(s, len(self.strings))
+            self.strings.append(s)
+        self.strings_size += end
+
+    def string(self, string_id):
+        if string_id >= len(self.strings):  # строку добавил другой процесс
+            self.load_strings()
+        return self.strings[string_id]
+
+    # Номер строки определяется под блокировкой после дочитывания таблицы, иначе два процесса
+    # присвоили бы разным строкам один номер
+    def intern(self, s):
+        string_id = self.string_ids.get(s)
+        if string_id is None:
+            with self.lock:
+                self.load_strings()
+                string_id = self.string_ids.get(s)
+                if string_id is None:
+                    data = (json.dumps(s, ensure_ascii=False) + "\n").encode("utf-8")
+                    with open(self.strings_filename, "ab") as f:
+                        f.write(data)
+                    string_id = len(self.strings)
+                    self.strings.append(s)
+                    self.string_ids[s] = string_id
+                    self.strings_size += len(data)
+        return string_id
+
+    def decode(self, values):
+        _, car_id, brand, model, year, price = values
+        return {"car_id": car_id, "brand": self.string(brand), "model": self.string(model),
+                "year": year, "rental_price_per_day": price}
+
+    def read_slot(self, car_id):
+        slots = self.header()[0]
+        if not isinstance(car_id, int) or not 0 < car_id <= slots:
+            return None
+        values = self.RECORD.unpack_from(self.mm, self.offset(car_id - 1))
+        return values if values[0] else None
 
     def read_all(self):
-        with open(self.filename, "r") as f:
-            return yaml.safe_load(f) or []
-
-    def write_all(self, data):
-        with open(self.filename, "w") as f:
-            yaml.dump(data, f)
+        slots = self.header()[0]
+        view = memoryview(self.mm)[self.offset(0):self.offset(slots)]
+        try:
+            return [self.decode(values) for values in self.RECORD.iter_unpack(view) if values[0]]
+        finally:
+            view.release()
 
     def get_by_id(self, car_id):
-        return next((car for car in self.read_all() if car["car_id"] == car_id), None)
+        values = self.read_slot(car_id)
+        return self.decode(values) if values else None
+
+    # Номера живых слотов по возрастанию. Обновляются только занятые слоты и количество живых записей,
+    # поэтому заголовок однозначно задает состояние: если он изменился в другом процессе, массив строится заново
+    # (проход по байтам-флагам записей, без разбора самих записей)
+    def live_slot_index(self):
+        header = self.header()
+        if header != self.live_header:
+            view = memoryview(self.mm)[self.offset(0):self.offset(header[0])]
+            try:
+                flags = view[::self.RECORD.size].tobytes()
+            finally:
+                view.release()
+            self.live_slots = array("q", (slot for slot, alive in enumerate(flags) if alive))
+            self.live_header = header
+        return self.live_slots
 
+    def get_k_n_short_list(self, k, n):
+        slots, live = self.header()
+        if live != slots:
+            # Есть надгробия - номера слотов не совпадают с позициями, страница берется из массива живых слотов
+            return [self.decode(self.RECORD.unpack_from(self.mm, self.offset(slot)))
+                    for slot in self.live_slot_index()[n * k:(n + 1) * k]]
+        start = min(n * k, slots)
+        end = min(start + k, slots)
+        view = memoryview(self.mm)[self.offset(start):self.offset(end)]
+        try:
+            return [self.decode(values) for values in self.RECORD.iter_unpack(view)]
+        finally:
+            view.release()
+
+    # Записи нельзя переставить (id = позиция), поэтому файл не меняется, возвращается отсортированный список
     def sort_by_field(self, field):
-        data = self.read_all()
-        data.sort(key=lambda x: x[field])
-        self.write_all(data)
+        return sorted(self.read_all(), key=lambda x: x[field])
 
+    @locked
     def add_car(self, car):
-        data = self.read_all()
-        car.car_id = max([c["car_id"] for c in data], default=0) + 1
-        data.append(car.__dict__)
-        self.write_all(data)
-
+        slots, live = self.header()
+        self.ensure_capacity(slots + 1)
+        car.car_id = slots + 1
+        self.RECORD.pack_into(self.mm, self.offset(slots), True, car.car_id, self.intern(car.brand),
+                              self.intern(car.model), car.year, car.rental_price_per_day)
+        self.set_header(slots + 1, live + 1)
+        if self.live_header == (slots, live):
+            self.live_slots.append(slots)
+            self.live_header = (slots + 1, live + 1)
+        return car.car_id
+
+    @locked
     def update_car(self, car_id, new_car):
-        data = self.read_all()
-        for i, car in enumerate(data):
-            if car["car_id"] == car_id:
-                data[i] = new_car.__dict__
-                self.write_all(data)
-                return True
-        return False
+        if self.read_slot(car_id) is None:
+            return False
+        self.RECORD.pack_into(self.mm, self.offset(car_id - 1), True, car_id, self.intern(new_car.brand),
+                              self.intern(new_car.model), new_car.year, new_car.rental_price_per_day)
+        return True
 
+    @locked
     def delete_car(self, car_id):
-        data = self.read_all()
-        data = [car for car in data if car["car_id"] != car_id]
-        self.write_all(data)
+        if self.read_slot(car_id) is None:
+            return
+        slots, live = self.header()
+        self.RECORD.pack_into(self.mm, self.offset(car_id - 1), False, car_id, 0, 0, 0, 0.0)
+        self.set_header(slots, live - 1)
+        if self.live_header == (slots, live):
+            del self.live_slots[bisect_left(self.live_slots, car_id - 1)]
+            self.live_header = (slots, live - 1)
+
+    def get_count(self):
+        return self.header()[1]
+
+# Пул соединений с PostgreSQL (вместо одного общего соединения на процесс)
+def postgres_pool(db_config, **pool_options):
+    def connect():
+        import psycopg2
+        return psycopg2.connect(**db_config)
+    return ConnectionPool(connect, **pool_options)
 
-#Работа с БД
+# Работа с БД. Каждый вызов берет соединение из пула и возвращает его обратно,
+# поэтому один репозиторий можно использовать из нескольких потоков
 class CarRepDB(CarRepBase):
-    def __init__(self, db_config):
-        self.db_config = db_config
+    COLUMNS = ("car_id", "brand", "model", "year", "rental_price_per_day")
 
-    def connect(self):
-        return psycopg2.connect(**self.db_config)
+    def __init__(self, db_config=None, pool=None):
+        self.pool = pool or postgres_pool(db_config)
 
     def get_by_id(self, car_id):
-        with self.connect() as conn:
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT * FROM cars WHERE car_id = %s", (car_id,))
                 return cur.fetchone()
 
     def get_k_n_short_list(self, k, n):
-        with self.connect() as conn:
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT * FROM cars ORDER BY car_id LIMIT %s OFFSET %s", (k, n * k))
                 return cur.fetchall()
 
+    # Страница по ключу: возвращает (строки, токен следующей страницы или None).
+    # Запрос WHERE (колонка, car_id) > (...) ORDER BY колонка, car_id LIMIT k использует индекс
+    # по (колонка, car_id), поэтому любая страница стоит как первая
+    def get_page(self, k, token=None, sort_column="car_id", descending=False):
+        if sort_column not in self.COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort_column}")
+        after = decode_token(token, sort_column, descending) if token else None
+        where, params, order_by = keyset_clause(sort_column, "car_id", descending, after)
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM cars"
+        if where:
+            query += f" WHERE {where}"
+        query += f" ORDER BY {order_by} LIMIT %s"
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params + [k])
+                rows = cur.fetchall()
+        if len(rows) < k:
+            return rows, None
+        last = rows[-1]
+        return rows, encode_token(sort_column, descending, last[self.COLUMNS.index(sort_column)], last[0])
+
     def add_car(self, car):
-        with self.connect() as conn:
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("INSERT INTO cars (brand, model, year, rental_price_per_day) VALUES (%s, %s, %s, %s) RETURNING car_id", 
                             (car.brand, car.model, car.year, car.rental_price_per_day))
@@ -198,7 +597,7 @@ class CarRepDB(CarRepBase):
                 return cur.fetchone()[0]
 
     def update_car(self, car_id, new_car):
-        with self.connect() as conn:
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("UPDATE cars SET brand = %s, model = %s, year = %s, rental_price_per_day = %s WHERE car_id = %s", 
                             (new_car.brand, new_car.model, new_car.year, new_car.rental_price_per_day, car_id))
@@ -206,103 +605,92 @@ class CarRepDB(CarRepBase):
                 return cur.rowcount > 0
 
     def delete_car(self, car_id):
-        with self.connect() as conn:
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM cars WHERE car_id = %s", (car_id,))
                 conn.commit()
 
-    def get_count(self):
-        with self.connect() as conn:
+    # Пакетная вставка одним многострочным INSERT ... VALUES в одной транзакции, возвращает новые car_id
+    def add_cars(self, cars):
+        from psycopg2.extras import execute_values
+        cars = list(cars)
+        if not cars:
+            return []
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM cars")
-                return cur.fetchone()[0]
-
-
-# Класс для управления подключением к БД
-class DatabaseConnection:
-    _instance = None
-
-    def __new__(cls, db_config):
-        if cls._instance is None:
-            cls._instance = super(DatabaseConnection, cls).__new__(cls)
-            cls._instance.db_config = db_config
-            cls._instance.connection = psycopg2.connect(**db_config)
-        return cls._instance
-
-    def get_connection(self):
-        return self.connection
-
-# Работа с БД 
-class CarRepDB(CarRepBase):
-    def __init__(self, db_config):
-        self.db_connection = DatabaseConnection(db_config)
-
-    def get_by_id(self, car_id):
-        with self.db_connection.get_connection() as conn:
+                rows = execute_values(cur, "INSERT INTO cars (brand, model, year, rental_price_per_day) VALUES %s RETURNING car_id",
+                                      [(car.brand, car.model, car.year, car.rental_price_per_day) for car in cars],
+                                      page_size=len(cars), fetch=True)
+                conn.commit()
+        for car, (car_id,) in zip(cars, rows):
+            car.car_id = car_id
+        return [car.car_id for car in cars]
+
+    # Пакетное обновление одним UPDATE ... FROM (VALUES ...), возвращает количество обновленных машин
+    def update_cars(self, cars):
+        from psycopg2.extras import execute_values
+        if not cars:
+            return 0
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT * FROM cars WHERE car_id = %s", (car_id,))
-                return cur.fetchone()
+                execute_values(cur, """UPDATE cars SET brand = v.brand, model = v.model, year = v.year, rental_price_per_day = v.price
+                                       FROM (VALUES %s) AS v (car_id, brand, model, year, price) WHERE cars.car_id = v.car_id""",
+                               [(car_id, car.brand, car.model, car.year, car.rental_price_per_day) for car_id, car in cars.items()],
+                               page_size=len(cars))
+                conn.commit()
+                return cur.rowcount
 
-    def add_car(self, car):
-        with self.db_connection.get_connection() as conn:
+    def delete_cars(self, car_ids):
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("INSERT INTO cars (brand, model, year, rental_price_per_day) VALUES (%s, %s, %s, %s) RETURNING car_id", 
-                            (car.brand, car.model, car.year, car.rental_price_per_day))
+                cur.execute("DELETE FROM cars WHERE car_id = ANY(%s)", (list(car_ids),))
                 conn.commit()
-                return cur.fetchone()[0]
 
-    def update_car(self, car_id, new_car):
-        with self.db_connection.get_connection() as conn:
+    def get_count(self):
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("UPDATE cars SET brand = %s, model = %s, year = %s, rental_price_per_day = %s WHERE car_id = %s", 
-                            (new_car.brand, new_car.model, new_car.year, new_car.rental_price_per_day, car_id))
-                conn.commit()
-                return cur.rowcount > 0
+                cur.execute("SELECT COUNT(*) FROM cars")
+                return cur.fetchone()[0]
 
-    def delete_car(self, car_id):
-        with self.db_connection.get_connection() as conn:
+    # Произвольный параметризованный запрос (используется FilterSortDBDecorator)
+    def execute_query(self, query, params=()):
+        with self.pool.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("DELETE FROM cars WHERE car_id = %s", (car_id,))
-                conn.commit()
+                cur.execute(query, params)
+                return cur.fetchall()
 
-# Декоратор для работы с БД
+# Декоратор для работы с БД. Фильтр и сортировка - выражения из query.py, они компилируются
+# в один параметризованный запрос: WHERE -> ORDER BY -> LIMIT/OFFSET.
+# Условие компилируется один раз и используется и для страниц, и для get_count
 class FilterSortDBDecorator(CarRepBase):
-    def __init__(self, repository, filter_query=None, sort_column=None):
+    def __init__(self, repository, predicate=None, sort=None):
         self.repository = repository
-        self.filter_query = filter_query
-        self.sort_column = sort_column
+        self.predicate = predicate
+        self.sort = Sort(sort) if isinstance(sort, str) else sort
+        self.query = CompiledQuery(predicate, self.sort)
 
     def get_k_n_short_list(self, k, n):
-        query = f"SELECT * FROM cars LIMIT {k} OFFSET {n * k}"
-        if self.filter_query:
-            query = f"SELECT * FROM ({query}) AS filtered WHERE {self.filter_query}"
-        if self.sort_column:
-            query += f" ORDER BY {self.sort_column}"
-        return self.repository.execute_query(query)
+        query, params = self.query.select(k, n * k)
+        return self.repository.execute_query(query, params)
 
     def get_count(self):
-        query = "SELECT COUNT(*) FROM cars"
-        if self.filter_query:
-            query = f"SELECT COUNT(*) FROM (SELECT * FROM cars WHERE {self.filter_query}) AS filtered"
-        return self.repository.execute_query(query)[0][0]
+        query, params = self.query.count()
+        return self.repository.execute_query(query, params)[0][0]
 
 # Декоратор для работы с JSON/YAML
-class FilterSortFileDecorator(CarRepBase):
-    def __init__(self, repository, filter_func=None, sort_key=None):
-        self.repository = repository
-        self.filter_func = filter_func
-        self.sort_key = sort_key
-
+# filter_func - любая функция car -> bool, в том числе выражение из query.py;
+# sort_key - имя поля или Sort. Сначала фильтрация всех машин, затем сортировка, затем страница.
+# Количество отфильтрованных машин материализовано так же, как в FilterSortDecorator
+class FilterSortFileDecorator(FilterSortDecorator):
     def get_k_n_short_list(self, k, n):
-        cars = self.repository.get_k_n_short_list(k, n)
+        cars = self.repository.read_all()
         if self.filter_func:
             cars = list(filter(self.filter_func, cars))
-        if self.sort_key:
+        if isinstance(self.sort_key, Sort):
+            cars = self.sort_key.apply(cars)
+        elif self.sort_key:
             cars.sort(key=lambda car: car[self.sort_key])
-        return cars
-
-    def get_count(self):
-        if self.filter_func:
-            return len(list(filter(self.filter_func, self.repository.get_k_n_short_list(1000, 0))))
-        return self.repository.get_count()
+        return cars[n * k:(n + 1) * k]
 
+    def all_cars(self):
+        return self.repository.read_all()
@@ -0,0 +1,164 @@
+import csv
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from Client import Client
+
+
+# Потоковый импорт клиентов из CSV (с заголовком) или JSON Lines:
+#
+#     importer = ClientImporter(ClientRepJson("clients.json", journal=True), workers=4)
+#     result = importer.import_file("partner.csv", report_path="rejected.csv")
+#
+# Файл читается пакетами по batch_size строк, пакет проверяется валидаторами Client
+# (при workers > 0 - в пуле процессов), принятые клиенты записываются одним add_clients на пакет,
+# отклоненные строки (ошибки валидации и повторные паспорта) попадают в отчет: номер строки, причина, исходные данные.
+# В памяти одновременно находятся только пакеты, которые проверяются прямо сейчас.
+# Для файловых репозиториев лучше включать журнал: иначе каждый пакет переписывает весь файл
+FIELDS = ("full_name", "passport_data", "contact_number", "address")
+
+
+# (номер первой строки записи, данные для проверки, исходный текст записи для отчета);
+# строка JSON Lines разбирается уже при проверке, в рабочем процессе
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        lines = []
+        reader = csv.DictReader(remember_lines(f, lines))
+        reader.fieldnames  # чтение заголовка
+        lines.clear()
+        for row in reader:
+            # Пустые строки перед записью DictReader пропускает; запись в кавычках может занимать несколько строк
+            while lines and not lines[0].strip():
+                lines.pop(0)
+            yield reader.line_num - len(lines) + 1, row, "".join(lines)
+            lines.clear()
+
+
+def remember_lines(f, lines):
+    for line in f:
+        lines.append(line)
+        yield line
+
+
+# Данные и исходный текст - одна и та же строка, при передаче в рабочий процесс она сериализуется один раз
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if line.strip():
+                yield line_no, line, line
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "ndjson": read_jsonl}
+
+
+# Проверка одной строки, возвращает поля клиента или бросает ValueError
+def validate_row(raw):
+    row = json.loads(raw) if isinstance(raw, str) else raw
+    if not isinstance(row, dict):
+        raise ValueError("Row is not an object")
+    fields = {}
+    for field in FIELDS:
+        value = row.get(field)
+        if value is None or value == "":
+            raise ValueError(f"Missing field: {field}")
+        fields[field] = str(value).strip()
+    Client.validate_full_name(fields["full_name"])
+    Client.validate_passport_data(fields["passport_data"])
+    Client.validate_contact_number(fields["contact_number"])
+    Client.validate_address(fields["address"])
+    return fields
+
+
+def raw_text(raw):
+    return raw.rstrip("\r\n")
+
+
+# Проверка пакета: ([(номер строки, поля принятого клиента, исходный текст)], [(номер строки, причина, исходный текст)])
+def validate_batch(batch):
+    accepted, rejected = [], []
+    for line_no, row, raw in batch:
+        try:
+            accepted.append((line_no, validate_row(row), raw))
+        except ValueError as e:
+            rejected.append((line_no, str(e), raw_text(raw)))
+    return accepted, rejected
+
+
+class ImportResult:
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+
+    def __repr__(self):
+        return f"ImportResult(accepted={self.accepted}, rejected={self.rejected})"
+
+
+class ClientImporter:
+    def __init__(self, repository, batch_size=1000, workers=0):
+        self.repository = repository  # любой ClientRepository (нужен add_clients)
+        self.batch_size = batch_size
+        self.workers = workers        # 0 - проверка в текущем процессе
+
+    def import_file(self, path, report_path=None, file_format=None):
+        file_format = file_format or path.rsplit(".", 1)[-1].lower()
+        if file_format not in READERS:
+            raise ValueError(f"Unknown import format: {file_format}")
+        result = ImportResult()
+        report = open(report_path, "w", newline="", encoding="utf-8") if report_path else None
+        try:
+            writer = csv.writer(report) if report else None
+            if writer:
+                writer.writerow(("line", "error", "row"))
+            for accepted, rejected in self.validated_batches(READERS[file_format](path)):
+                accepted, duplicates = self.split_duplicates(accepted)
+                if accepted:
+                    self.repository.add_clients([Client.from_trusted(dict(fields, client_id=None))
+                                                 for _, fields, _ in accepted])
+                rejected = sorted(rejected + duplicates)
+                result.accepted += len(accepted)
+                result.rejected += len(rejected)
+                if writer:
+                    writer.writerows(rejected)
+        finally:
+            if report:
+                report.close()
+        return result
+
+    # Паспорт уникален: строки с паспортом, который уже есть в хранилище или выше в файле, отклоняются
+    def split_duplicates(self, accepted):
+        registered = self.repository.registered_passports(fields["passport_data"] for _, fields, _ in accepted)
+        unique, duplicates = [], []
+        for line_no, fields, raw in accepted:
+            passport = fields["passport_data"]
+            if passport in registered:
+                duplicates.append((line_no, f"Passport {passport} already registered", raw_text(raw)))
+            else:
+                registered.add(passport)
+                unique.append((line_no, fields, raw))
+        return unique, duplicates
+
+    def batches(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    # Результаты проверки пакетов в исходном порядке. В пуле процессов одновременно
+    # проверяется не больше 2 * workers пакетов, поэтому файл не читается в память целиком
+    def validated_batches(self, rows):
+        if not self.workers:
+            for batch in self.batches(rows):
+                yield validate_batch(batch)
+            return
+        with ProcessPoolExecutor(self.workers) as pool:
+            pending = deque()
+            for batch in self.batches(rows):
+                pending.append(pool.submit(validate_batch, batch))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -0,0 +1,149 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+# Потокобезопасный пул соединений с БД.
+# Открывает не больше max_size соединений, выдает их по одному потоку за раз и принимает обратно.
+# Соединение, которое долго простаивало, перед выдачей проверяется запросом health_check_query,
+# а соединение старше max_lifetime секунд закрывается и открывается заново.
+# connect - функция без аргументов, возвращающая DB-API соединение (psycopg2, mysql.connector, sqlite3 ...)
+class ConnectionPool:
+    def __init__(self, connect, max_size=10, timeout=30.0, max_lifetime=3600.0,
+                 health_check_interval=30.0, health_check_query="SELECT 1"):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.health_check_query = health_check_query
+        self._lock = threading.Condition()
+        self._idle = []        # свободные соединения: (соединение, время создания, время возврата)
+        self._created_at = {}  # id(соединения) -> время создания, для выданных соединений
+        self._size = 0         # всего открыто (свободные + выданные)
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+        }
+
+    # Использование: with pool.connection() as conn: ...
+    # При возврате незавершенная транзакция откатывается, чтобы следующий поток получил чистое соединение
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._lock:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = started + timeout - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise TimeoutError(f"No free database connection after {timeout} s")
+                    waited = True
+                    self._lock.wait(remaining)
+                if self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                else:
+                    self._size += 1
+                    conn = None
+            if conn is None:
+                try:
+                    conn, created_at = self.connect(), time.monotonic()
+                except Exception:
+                    self._discard(None)
+                    raise
+                self._count("created")
+            elif time.monotonic() - created_at > self.max_lifetime:
+                self._count("recycled")
+                self._discard(conn)
+                continue
+            elif time.monotonic() - returned_at > self.health_check_interval and not self._is_alive(conn):
+                self._count("failed_health_checks")
+                self._discard(conn)
+                continue
+            self._record_checkout(time.monotonic() - started if waited else None)
+            self._created_at[id(conn)] = created_at
+            return conn
+
+    def release(self, conn):
+        created_at = self._created_at.pop(id(conn), time.monotonic())
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._lock.notify()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    # Снимок метрик: число выдач, ожиданий, суммарное/максимальное время ожидания свободного соединения и т.д.
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
+
+    def _is_alive(self, conn):
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(self.health_check_query)
+                cur.fetchall()
+            finally:
+                cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # Закрывает соединение и освобождает место в пуле
+    def _discard(self, conn):
+        if conn is not None:
+            self._close(conn)
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record_checkout(self, wait_time):
+        with self._lock:
+            self._stats["checkouts"] += 1
+            if wait_time is not None:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += wait_time
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
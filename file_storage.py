@@ -0,0 +1,439 @@
+import os
+import json
+import struct
+import tempfile
+import threading
+import functools
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from instrumentation import record_io
+
+
+# Подпись файла: inode, размер и время изменения. Если что-то из этого поменялось,
+# значит файл переписали (в том числе другой процесс) и снимок надо перечитать
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+# Атомарная запись файла: данные пишутся во временный файл в том же каталоге и подменяют
+# старый файл переименованием (os.replace). Читатель, открывший файл, видит либо старую,
+# либо новую версию целиком и никогда - наполовину записанную
+def atomic_write(path, write, mode="w"):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+            record_io(written=os.fstat(f.fileno()).st_size)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# Эксклюзивная рекомендательная блокировка писателя (файл path + ".lock").
+# Читатели ее не берут: благодаря atomic_write им достаточно открыть файл.
+# Повторный вход из того же объекта разрешен (write_all внутри add_cars и т.п.),
+# потоки одного процесса ждут друг друга на RLock
+class FileLock:
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self.file = open(self.path, "a+b")
+                if fcntl:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+                else:
+                    self.file.seek(0)
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                if self.file:
+                    self.file.close()
+                    self.file = None
+                self.thread_lock.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0:
+            try:
+                if fcntl:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+                else:
+                    self.file.seek(0)
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                self.file.close()
+                self.file = None
+        self.thread_lock.release()
+
+
+# Метод репозитория, выполняемый под блокировкой писателя self.lock: чтение-изменение-запись
+# видит последнюю версию файла и не теряет изменений другого процесса
+def locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# Разобранный снимок файла хранилища в памяти + индекс id -> запись.
+# Файл разбирается заново только когда меняется его подпись
+class FileSnapshot:
+    def __init__(self, path, load, key, extra_paths=()):
+        self.path = path
+        self.load = load  # функция без аргументов, возвращает список записей
+        self.key = key    # имя поля-идентификатора ("car_id", "client_id")
+        self.paths = (path,) + tuple(extra_paths)  # все файлы, из которых собирается состояние
+        self.signature = None
+        self.loaded = False
+        self.records = []
+        self.index = {}
+        self.max_key = 0
+        self.version = 0  # растет при каждой полной замене снимка (чтение файла, write_all), но не при put/remove
+
+    # Возвращает актуальный список записей (общий, изменять его нельзя).
+    # Если во время чтения писатель подменил файл (подпись до и после разная), чтение повторяется,
+    # поэтому основной файл и журнал всегда берутся из одной версии
+    def get(self):
+        signature = self.current_signature()
+        if not self.loaded or signature != self.signature:
+            while True:
+                records = self.load()
+                after = self.current_signature()
+                if after == signature:
+                    break
+                signature = after
+            self._set(records, signature)
+        return self.records
+
+    # Поиск записи по id за O(1)
+    def find(self, key):
+        self.get()
+        return self.index.get(key)
+
+    def count(self):
+        return len(self.get())
+
+    # Снимок в памяти совпадает с файлом на диске (проверка без чтения файла)
+    def is_fresh(self):
+        return self.loaded and self.signature == self.current_signature()
+
+    def next_key(self):
+        self.get()
+        return self.max_key + 1
+
+    # Вызывается после собственной записи в файл: данные уже есть в памяти, разбирать файл не нужно
+    def replace(self, records):
+        self._set(records, self.current_signature())
+
+    # Добавление или замена записей в памяти (после записи в журнал).
+    # Снимок должен быть прочитан до дозаписи, иначе изменившаяся подпись вызовет полное перечитывание
+    def put(self, record):
+        self.put_many([record])
+
+    def put_many(self, records):
+        if not self.loaded:
+            self.get()
+        for record in records:
+            key = record[self.key]
+            existing = self.index.get(key)
+            if existing is None:
+                self.records.append(record)
+                self.index[key] = record
+                self.max_key = max(self.max_key, key)
+            else:
+                existing.clear()
+                existing.update(record)
+        self.signature = self.current_signature()
+
+    # Удаление записей в памяти (после записи в журнал): один проход по списку на весь пакет
+    def remove(self, key):
+        self.remove_many([key])
+
+    def remove_many(self, keys):
+        if not self.loaded:
+            self.get()
+        removed = {id(record) for record in (self.index.pop(key, None) for key in keys) if record is not None}
+        if removed:
+            self.records = [r for r in self.records if id(r) not in removed]
+        self.signature = self.current_signature()
+
+    def current_signature(self):
+        return tuple(file_signature(path) for path in self.paths)
+
+    def _set(self, records, signature):
+        self.records = records
+        self.index = {record[self.key]: record for record in records}
+        self.max_key = max(self.index, default=0)
+        self.signature = signature
+        self.loaded = True
+        self.version += 1
+
+
+# Боковой индекс файла JSON Lines (path + ".idx"): смещения начала каждой записи.
+# Страница читается seek'ом сразу к нужному диапазону байт, разбираются только k записей.
+# В заголовке индекса хранятся inode, размер и время изменения файла данных: если они не совпадают с fstat
+# уже открытого файла данных, индекс перестраивается. Файл данных открывается первым, поэтому
+# после атомарной подмены старый индекс не будет применен к новому файлу
+class JsonLinesIndex:
+    HEADER = struct.Struct("<qqqq")  # inode, размер файла данных, время изменения (нс), количество записей
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+
+    # Проход по строкам файла без разбора JSON
+    def rebuild(self, f):
+        st = os.fstat(f.fileno())
+        offsets = array("q")
+        position = 0
+        f.seek(0)
+        for line in f:
+            if line.strip():
+                offsets.append(position)
+            position += len(line)
+        offsets.append(position)
+        record_io(read=position)
+
+        def write(idx):
+            idx.write(self.HEADER.pack(st.st_ino, st.st_size, st.st_mtime_ns, len(offsets) - 1))
+            offsets.tofile(idx)
+
+        # Индекс может перестраивать и читатель, поэтому он тоже подменяется атомарно
+        atomic_write(self.index_path, write, "wb")
+        return offsets
+
+    def offsets(self, f, start, count):
+        st = os.fstat(f.fileno())
+        try:
+            with open(self.index_path, "rb") as idx:
+                inode, size, mtime, total = self.HEADER.unpack(idx.read(self.HEADER.size))
+                if (inode, size, mtime) == (st.st_ino, st.st_size, st.st_mtime_ns):
+                    start = min(start, total)
+                    end = min(start + count, total)
+                    idx.seek(self.HEADER.size + start * 8)
+                    offsets = array("q")
+                    offsets.frombytes(idx.read((end - start + 1) * 8))
+                    record_io(read=self.HEADER.size + len(offsets) * 8)
+                    return offsets
+        except (FileNotFoundError, struct.error):
+            pass
+        offsets = self.rebuild(f)
+        start = min(start, len(offsets) - 1)
+        return offsets[start:min(start + count, len(offsets) - 1) + 1]
+
+    # count записей, начиная с номера start
+    def read_page(self, start, count):
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            offsets = self.offsets(f, start, count)
+            f.seek(offsets[0])
+            chunk = f.read(offsets[-1] - offsets[0])
+        record_io(read=len(chunk))
+        return [json.loads(line) for line in chunk.splitlines() if line.strip()]
+
+
+# Журнал изменений (append-only): каждая операция дописывается в конец файла одной строкой JSON,
+# поэтому запись одной машины/клиента стоит O(1) вместо перезаписи всего файла.
+# Состояние = основной файл + проигрывание журнала. Операции идемпотентны, поэтому
+# падение во время уплотнения (перезапись основного файла + очистка журнала) ничего не ломает
+class Journal:
+    def __init__(self, path, key, compact_threshold=1000):
+        self.path = path
+        self.key = key
+        self.compact_threshold = compact_threshold  # сколько записей журнала копить до уплотнения
+        self.entries = 0
+
+    # Применяет журнал к записям основного файла и возвращает итоговый список
+    def replay(self, records):
+        index = {record[self.key]: record for record in records}
+        self.entries = 0
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return records
+        with f:
+            record_io(read=os.fstat(f.fileno()).st_size)
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Оборванная последняя строка (процесс упал во время дозаписи) - пропускаем,
+                    # отрежет ее следующий писатель
+                    break
+                self.entries += 1
+                if entry["op"] == "put":
+                    index[entry["record"][self.key]] = entry["record"]
+                elif entry["op"] == "delete":
+                    index.pop(entry["key"], None)
+        return list(index.values())
+
+    # Дозапись нескольких операций за одно открытие файла (вызывается под блокировкой писателя)
+    def append(self, *entries):
+        if not entries:
+            return
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        with open(self.path, "a+b") as f:
+            self.cut_torn_tail(f)
+            f.write(data)
+        record_io(written=len(data))
+        self.entries += len(entries)
+
+    # Если последняя строка оборвана, отрезаем ее, чтобы новая запись не приклеилась к ней
+    @staticmethod
+    def cut_torn_tail(f, block=4096):
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        position = end
+        while position > 0:
+            start = max(0, position - block)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+    def put(self, *records):
+        self.append(*({"op": "put", "record": record} for record in records))
+
+    def delete(self, *keys):
+        self.append(*({"op": "delete", "key": key} for key in keys))
+
+    def needs_compaction(self):
+        return self.entries >= self.compact_threshold
+
+    # Вызывается после того, как состояние записано в основной файл
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.entries = 0
+
+
+# Файл записей хранилища: кодек, снимок в памяти, необязательный журнал и блокировка писателя.
+# Общая часть файловых репозиториев машин и клиентов; ключ записи - key ("car_id", "client_id")
+class RecordFile:
+    def __init__(self, path, codec, key, journal=False, compact_threshold=1000):
+        self.path = path
+        self.codec = codec
+        self.key = key
+        # Режим журнала: изменения дописываются в path.journal, основной файл переписывается только при уплотнении
+        self.journal = Journal(path + ".journal", key, compact_threshold) if journal else None
+        # Разобранный снимок файла, перечитывается только при изменении файла (или журнала)
+        self.snapshot = FileSnapshot(path, self.load, key, (self.journal.path,) if self.journal else ())
+        # Писатели (в том числе из других процессов) работают по одному, читатели блокировку не берут
+        self.lock = FileLock(path)
+
+    # Содержимое основного файла + журнал. Нет файла - пустой список; поврежденный файл - ошибка кодека
+    def load(self):
+        try:
+            with open(self.path, "rb" if self.codec.binary else "r") as f:
+                record_io(read=os.fstat(f.fileno()).st_size)
+                data = self.codec.load(f)
+        except FileNotFoundError:
+            data = []
+        if self.journal:
+            data = self.journal.replay(data)
+        return data
+
+    # Копии записей снимка (их можно изменять)
+    def read_all(self):
+        return [dict(record) for record in self.snapshot.get()]
+
+    # count записей, начиная с номера start (общие записи снимка, изменять их нельзя)
+    def page(self, start, count):
+        return self.snapshot.get()[start:start + count]
+
+    # Новый файл подменяет старый атомарно, снимок обновляется без повторного чтения
+    @locked
+    def write_all(self, data):
+        atomic_write(self.path, lambda f: self.codec.dump(data, f), "wb" if self.codec.binary else "w")
+        if self.journal:
+            self.journal.clear()
+        self.snapshot.replace(data)
+
+    # Уплотнение: текущее состояние записывается в основной файл, журнал очищается
+    @locked
+    def compact(self):
+        self.write_all(self.read_all())
+
+    # Добавление или замена записей: одна дозапись журнала или одна перезапись файла на весь пакет.
+    # Пустой пакет ничего не пишет: дозапись меняет подпись файла и заставила бы другие экземпляры перечитать его
+    @locked
+    def put(self, *records):
+        if not records:
+            return
+        if self.journal:
+            self.journal.put(*records)
+            self.snapshot.put_many(records)
+            if self.journal.needs_compaction():
+                self.compact()
+        else:
+            changed = {record[self.key]: record for record in records}
+            data = [changed.pop(record[self.key], record) for record in self.read_all()]
+            self.write_all(data + list(changed.values()))
+
+    @locked
+    def delete(self, *keys):
+        if not keys:
+            return
+        if self.journal:
+            self.journal.delete(*keys)
+            self.snapshot.remove_many(keys)
+            if self.journal.needs_compaction():
+                self.compact()
+        else:
+            keys = set(keys)
+            self.write_all([record for record in self.read_all() if record[self.key] not in keys])
+
+
+# Файл JSON Lines с боковым индексом смещений: если снимок в памяти устарел,
+# страница читается с диска seek'ом, без разбора всего файла
+class JsonLinesFile(RecordFile):
+    def __init__(self, path, codec, key, journal=False, compact_threshold=1000):
+        self.lines_index = JsonLinesIndex(path)
+        super().__init__(path, codec, key, journal, compact_threshold)
+
+    @locked
+    def write_all(self, data):
+        super().write_all(data)
+        with open(self.path, "rb") as f:
+            self.lines_index.rebuild(f)
+
+    def page(self, start, count):
+        if self.journal or self.snapshot.is_fresh():
+            return super().page(start, count)
+        return self.lines_index.read_page(start, count)
@@ -0,0 +1,44 @@
+# Материализованный результат фильтра: множество id записей, которые ему удовлетворяют.
+# Строится один раз полным проходом по хранилищу, дальше поддерживается по событиям
+# add/update/delete, поэтому количество отфильтрованных записей - O(1) и точное при любом объеме данных
+class FilteredIds:
+    def __init__(self, filter_func, key):
+        self.filter_func = filter_func
+        self.key = key  # функция запись -> id
+        self.ids = None
+
+    def is_built(self):
+        return self.ids is not None
+
+    def build(self, records):
+        self.ids = {self.key(record) for record in records if self.filter_func(record)}
+
+    # Сбросить: множество будет построено заново при следующем обращении
+    def reset(self):
+        self.ids = None
+
+    # record=None означает, что запись удалена
+    def record_changed(self, record_id, record):
+        if self.ids is None:
+            return
+        if record is not None and self.filter_func(record):
+            self.ids.add(record_id)
+        else:
+            self.ids.discard(record_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, record_id):
+        return record_id in self.ids
+
+
+# Проход по всем записям репозитория страницами get_k_n_short_list(page_size, n)
+def iter_pages(get_k_n_short_list, page_size=1000):
+    n = 0
+    while True:
+        page = get_k_n_short_list(page_size, n)
+        yield from page
+        if len(page) < page_size:
+            return
+        n += 1
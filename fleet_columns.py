@@ -0,0 +1,149 @@
+import numpy as np
+
+from query import Eq, Range, In, Prefix, And, Sort, check_column
+from filter_index import iter_pages
+
+
+# Колоночное представление автопарка для векторных фильтров, сортировки и агрегатов.
+# Числовые поля (car_id, year, rental_price_per_day) лежат в массивах NumPy, марка и модель -
+# в виде кодов категорий. Словари категорий отсортированы, поэтому порядок кодов совпадает
+# с лексикографическим порядком строк и сравнивать/сортировать можно прямо коды.
+# Понимает выражения из query.py:
+#
+#     fleet = FleetColumns.from_repository(repo)
+#     fleet.select(Prefix("brand", "To") & Range("year", 2015), Sort("rental_price_per_day"), k=20)
+#     fleet.group_by("brand")
+class FleetColumns:
+    CATEGORICAL = ("brand", "model")
+
+    def __init__(self, car_id, year, price, brand_codes, brands, model_codes, models):
+        self.columns = {"car_id": car_id, "year": year, "rental_price_per_day": price,
+                        "brand": brand_codes, "model": model_codes}
+        self.categories = {"brand": brands, "model": models}
+
+    # Строится из любого CarRepBase: файловые репозитории отдают read_all, остальные читаются страницами
+    @classmethod
+    def from_repository(cls, repository, page_size=10000):
+        if hasattr(repository, "read_all"):
+            return cls.from_records(repository.read_all())
+        return cls.from_records(iter_pages(repository.get_k_n_short_list, page_size))
+
+    # Записи - словари, строки БД (car_id, brand, model, year, rental_price_per_day) или объекты Car
+    @classmethod
+    def from_records(cls, records):
+        car_id, brand, model, year, price = [], [], [], [], []
+        for car in records:
+            if isinstance(car, dict):
+                values = (car["car_id"], car["brand"], car["model"], car["year"], car["rental_price_per_day"])
+            elif isinstance(car, (tuple, list)):
+                values = car[:5]
+            else:
+                values = (car.car_id, car.brand, car.model, car.year, car.rental_price_per_day)
+            car_id.append(values[0])
+            brand.append(values[1])
+            model.append(values[2])
+            year.append(values[3])
+            price.append(values[4])
+        brands, brand_codes = np.unique(np.array(brand, dtype=object).astype(str), return_inverse=True)
+        models, model_codes = np.unique(np.array(model, dtype=object).astype(str), return_inverse=True)
+        return cls(np.array(car_id, dtype=np.int64), np.array(year, dtype=np.int64),
+                   np.array(price, dtype=np.float64), brand_codes.astype(np.int32), brands,
+                   model_codes.astype(np.int32), models)
+
+    def __len__(self):
+        return len(self.columns["car_id"])
+
+    # Булева маска машин, удовлетворяющих выражению (None - все машины)
+    def mask(self, predicate=None):
+        if predicate is None:
+            return np.ones(len(self), dtype=bool)
+        if isinstance(predicate, And):
+            result = self.mask(None)
+            for part in predicate.predicates:
+                result &= self.mask(part)
+            return result
+        if not isinstance(predicate, (Eq, Range, In, Prefix)):
+            # Произвольная функция - медленный путь, по одной записи
+            return np.fromiter((predicate(car) for car in self.records(np.arange(len(self)))), dtype=bool, count=len(self))
+        column = self.columns[predicate.field]
+        if predicate.field in self.CATEGORICAL:
+            return self._category_mask(predicate, column, self.categories[predicate.field])
+        if isinstance(predicate, Eq):
+            return column == predicate.value
+        if isinstance(predicate, In):
+            return np.isin(column, predicate.values)
+        if isinstance(predicate, Range):
+            result = self.mask(None)
+            if predicate.low is not None:
+                result &= column >= predicate.low
+            if predicate.high is not None:
+                result &= column <= predicate.high
+            return result
+        return np.char.startswith(column.astype(str), predicate.prefix)
+
+    # Для марки/модели условие сначала вычисляется на маленьком словаре категорий, затем переводится в коды
+    @staticmethod
+    def _category_mask(predicate, codes, names):
+        if isinstance(predicate, Range):
+            low = 0 if predicate.low is None else np.searchsorted(names, predicate.low, side="left")
+            high = len(names) if predicate.high is None else np.searchsorted(names, predicate.high, side="right")
+            return (codes >= low) & (codes < high)
+        if isinstance(predicate, Eq):
+            matching = names == predicate.value
+        elif isinstance(predicate, In):
+            matching = np.isin(names, [str(value) for value in predicate.values])
+        else:
+            matching = np.char.startswith(names.astype(str), predicate.prefix)
+        return matching[codes]
+
+    def count(self, predicate=None):
+        return int(self.mask(predicate).sum())
+
+    # Индексы машин по выражению и сортировке (второй ключ - car_id, как в Sort.apply)
+    def order(self, predicate=None, sort=None):
+        indices = np.flatnonzero(self.mask(predicate))
+        if sort is None:
+            sort = Sort("car_id")
+        car_id = self.columns["car_id"][indices]
+        column = self.columns[sort.field][indices]
+        if sort.descending:
+            car_id, column = -car_id, -column
+        return indices[np.lexsort((car_id, column))]
+
+    # Страница k записей, начиная с n*k, после фильтра и сортировки; словари создаются только для страницы
+    def select(self, predicate=None, sort=None, k=None, n=0):
+        indices = self.order(predicate, sort)
+        if k is not None:
+            indices = indices[n * k:(n + 1) * k]
+        return self.records(indices)
+
+    def records(self, indices):
+        columns = self.columns
+        brands, models = self.categories["brand"], self.categories["model"]
+        return [{"car_id": int(columns["car_id"][i]), "brand": str(brands[columns["brand"][i]]),
+                 "model": str(models[columns["model"][i]]), "year": int(columns["year"][i]),
+                 "rental_price_per_day": float(columns["rental_price_per_day"][i])} for i in indices]
+
+    # Агрегаты по группам: {значение поля: {"count", "sum", "mean", "min", "max"}} для колонки value_field
+    def group_by(self, field, value_field="rental_price_per_day", predicate=None):
+        check_column(field)
+        check_column(value_field)
+        indices = np.flatnonzero(self.mask(predicate))
+        if not len(indices):
+            return {}
+        keys = self.columns[field][indices]
+        values = self.columns[value_field][indices].astype(np.float64)
+        order = np.argsort(keys, kind="stable")
+        keys, values = keys[order], values[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        counts = np.diff(np.append(starts, len(keys)))
+        sums = np.add.reduceat(values, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        names = self.categories.get(field)
+        result = {}
+        for key, count, total, low, high in zip(keys[starts], counts, sums, mins, maxs):
+            name = str(names[key]) if names is not None else key.item()  # int или float, без усечения
+            result[name] = {"count": int(count), "sum": float(total), "mean": float(total / count),
+                            "min": float(low), "max": float(high)}
+        return result
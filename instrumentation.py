@@ -0,0 +1,290 @@
+import time
+import threading
+from bisect import bisect_left
+
+
+# Метрики репозиториев: по каждому методу - число вызовов и ошибок, гистограмма времени выполнения,
+# байты, прочитанные/записанные файловыми хранилищами, SQL-запросы и строки для БД.
+#
+#     repo = instrument(CarRepJSON("cars.json"))   # или instrument(ClientRepDB(pool))
+#     ...
+#     METRICS.snapshot()                           # словарь
+#     METRICS.write_prometheus("metrics.prom")     # текстовый формат Prometheus (node_exporter textfile)
+#
+# Накладные расходы - два вызова perf_counter и одна короткая блокировка на вызов метода,
+# поэтому инструментирование можно не выключать
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_scope = threading.local()
+
+
+# Счетчики одного выполняющегося вызова метода (в текущем потоке)
+class CallScope:
+    __slots__ = ("parent", "bytes_read", "bytes_written", "statements", "rows")
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.statements = 0
+        self.rows = 0
+
+
+# Вызываются хранилищами; учитываются в метрике метода, который сейчас выполняется в этом потоке
+# (вне инструментированного вызова ничего не делают)
+def record_io(read=0, written=0):
+    scope = getattr(_scope, "current", None)
+    if scope is not None:
+        scope.bytes_read += read
+        scope.bytes_written += written
+
+
+def record_statement(rows=0):
+    scope = getattr(_scope, "current", None)
+    if scope is not None:
+        scope.statements += 1
+        scope.rows += rows
+
+
+def record_rows(rows):
+    scope = getattr(_scope, "current", None)
+    if scope is not None:
+        scope.rows += rows
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последний - больше всех границ (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Накопленные значения для границ (как в Prometheus): [(граница, число наблюдений <= границы)]
+    def cumulative(self):
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    # Оценка квантиля по гистограмме (верхняя граница корзины)
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+        return float("inf")
+
+
+class MethodStats:
+    def __init__(self, buckets):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram(buckets)
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.statements = 0
+        self.rows = 0
+
+    def as_dict(self):
+        return {"calls": self.calls, "errors": self.errors,
+                "latency_sum": self.latency.sum, "latency_avg": self.latency.sum / self.calls if self.calls else 0.0,
+                "latency_p50": self.latency.quantile(0.5), "latency_p99": self.latency.quantile(0.99),
+                "latency_buckets": {str(bound): count for bound, count in self.latency.cumulative()},
+                "bytes_read": self.bytes_read, "bytes_written": self.bytes_written,
+                "statements": self.statements, "rows": self.rows}
+
+
+# Реестр метрик: (имя репозитория, метод) -> MethodStats
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.methods = {}
+        self.lock = threading.Lock()
+
+    def record(self, repository, method, seconds, scope, error=False):
+        with self.lock:
+            stats = self.methods.get((repository, method))
+            if stats is None:
+                stats = self.methods[(repository, method)] = MethodStats(self.buckets)
+            stats.calls += 1
+            stats.errors += error
+            stats.latency.observe(seconds)
+            stats.bytes_read += scope.bytes_read
+            stats.bytes_written += scope.bytes_written
+            stats.statements += scope.statements
+            stats.rows += scope.rows
+
+    def reset(self):
+        with self.lock:
+            self.methods.clear()
+
+    # {"Репозиторий.метод": {...}}
+    def snapshot(self):
+        with self.lock:
+            return {f"{repository}.{method}": stats.as_dict()
+                    for (repository, method), stats in sorted(self.methods.items())}
+
+    def prometheus(self):
+        with self.lock:
+            items = sorted(self.methods.items())
+            lines = []
+
+            def metric(name, kind, help_text, value_of):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (repository, method), stats in items:
+                    lines.append(f'{name}{{repository="{repository}",method="{method}"}} {value_of(stats)}')
+
+            metric("repository_calls_total", "counter", "Repository method calls.", lambda s: s.calls)
+            metric("repository_errors_total", "counter", "Repository method calls that raised.", lambda s: s.errors)
+            lines.append("# HELP repository_call_duration_seconds Repository method latency.")
+            lines.append("# TYPE repository_call_duration_seconds histogram")
+            for (repository, method), stats in items:
+                labels = f'repository="{repository}",method="{method}"'
+                for bound, count in stats.latency.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'repository_call_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"repository_call_duration_seconds_sum{{{labels}}} {stats.latency.sum!r}")
+                lines.append(f"repository_call_duration_seconds_count{{{labels}}} {stats.latency.count}")
+            metric("repository_bytes_read_total", "counter", "Bytes read by file repositories.", lambda s: s.bytes_read)
+            metric("repository_bytes_written_total", "counter", "Bytes written by file repositories.",
+                   lambda s: s.bytes_written)
+            metric("repository_db_statements_total", "counter", "SQL statements executed.", lambda s: s.statements)
+            metric("repository_db_rows_total", "counter", "Rows fetched or affected.", lambda s: s.rows)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        from file_storage import atomic_write
+        text = self.prometheus()
+        atomic_write(path, lambda f: f.write(text))
+
+
+METRICS = Metrics()  # общий реестр по умолчанию
+
+
+# Инструментированный репозиторий: прокси, который замеряет каждый публичный метод исходного репозитория.
+# Вложенные вызовы (например, инструментированный репозиторий внутри декоратора) учитываются у обоих
+class InstrumentedRepository:
+    def __init__(self, repository, metrics=None, name=None):
+        self._repository = repository
+        self._metrics = metrics or METRICS
+        self._name = name or type(repository).__name__
+
+    def __getattr__(self, name):
+        attribute = getattr(self._repository, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+        metrics, repository_name = self._metrics, self._name
+
+        def wrapper(*args, **kwargs):
+            parent = getattr(_scope, "current", None)
+            scope = _scope.current = CallScope(parent)
+            error = False
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                _scope.current = parent
+                if parent is not None:
+                    parent.bytes_read += scope.bytes_read
+                    parent.bytes_written += scope.bytes_written
+                    parent.statements += scope.statements
+                    parent.rows += scope.rows
+                metrics.record(repository_name, name, seconds, scope, error)
+
+        wrapper.__name__ = name
+        self.__dict__[name] = wrapper  # следующие обращения не проходят через __getattr__
+        return wrapper
+
+
+# Обертки DB-API соединения и курсора: считают запросы и строки (прочитанные fetch* и измененные DML)
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        result = self._cursor.execute(query, params) if params is not None else self._cursor.execute(query)
+        self._record()
+        return result
+
+    def executemany(self, query, params):
+        result = self._cursor.executemany(query, params)
+        self._record()
+        return result
+
+    def _record(self):
+        rows = self._cursor.rowcount if self._cursor.description is None else 0
+        record_statement(max(rows or 0, 0))
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            record_rows(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        record_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            record_rows(1)
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+# Соединения пула создаются уже обернутыми (имеющиеся в пуле соединения остаются как есть)
+def instrument_pool(pool):
+    connect = pool.connect
+    if not getattr(connect, "instrumented", False):
+        def instrumented_connect():
+            return InstrumentedConnection(connect())
+        instrumented_connect.instrumented = True
+        pool.connect = instrumented_connect
+    return pool
+
+
+# Инструментирование репозитория; у репозиториев БД заодно оборачивается пул соединений
+def instrument(repository, metrics=None, name=None):
+    pool = getattr(repository, "pool", None)
+    if pool is not None and hasattr(pool, "connect"):
+        instrument_pool(pool)
+    return InstrumentedRepository(repository, metrics, name)
@@ -0,0 +1,45 @@
+import json
+import base64
+
+
+# Постраничный вывод по ключу (keyset / seek pagination).
+# Вместо OFFSET клиент получает непрозрачный токен продолжения с последним увиденным
+# значением колонки сортировки и id, а следующий запрос продолжает с WHERE (колонка, id) > (...).
+# Глубокая страница стоит столько же, сколько первая, и не "плывет" при вставках.
+
+# Кодирует токен: колонка сортировки, направление, последнее значение колонки и последний id
+def encode_token(sort_column, descending, last_key, last_id):
+    payload = json.dumps([sort_column, descending, last_key, last_id], default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+# Возвращает (последнее значение колонки, последний id). Токен от другой сортировки - ошибка
+def decode_token(token, sort_column, descending):
+    try:
+        column, token_descending, last_key, last_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid page token: {token}")
+    if (column, token_descending) != (sort_column, descending):
+        raise ValueError(f"Page token was issued for sorting by {column}, not {sort_column}")
+    return last_key, last_id
+
+
+# Условие "после последней увиденной строки" и ORDER BY для SQL.
+# row_compare=False разворачивает (a, b) > (x, y) в a > x OR (a = x AND b > y) - для MySQL,
+# который хуже использует индекс для сравнения строк-кортежей
+def keyset_clause(sort_column, id_column, descending, after, row_compare=True):
+    op = "<" if descending else ">"
+    direction = " DESC" if descending else ""
+    if sort_column == id_column:
+        order_by = f"{id_column}{direction}"
+        if after is None:
+            return "", [], order_by
+        return f"{id_column} {op} %s", [after[1]], order_by
+    order_by = f"{sort_column}{direction}, {id_column}{direction}"
+    if after is None:
+        return "", [], order_by
+    last_key, last_id = after
+    if row_compare:
+        return f"({sort_column}, {id_column}) {op} (%s, %s)", [last_key, last_id], order_by
+    return (f"({sort_column} {op} %s OR ({sort_column} = %s AND {id_column} {op} %s))",
+            [last_key, last_key, last_id], order_by)
@@ -0,0 +1,158 @@
+# Структурные фильтры и сортировка по колонкам машин.
+# Одно и то же выражение компилируется в параметризованный SQL (WHERE -> ORDER BY -> LIMIT)
+# и вычисляется в Python для файловых репозиториев:
+#
+#     predicate = Prefix("brand", "Toy") & Range("year", 2015, 2020)
+#     FilterSortDBDecorator(db_repo, predicate, Sort("rental_price_per_day"))
+#     FilterSortFileDecorator(json_repo, predicate, Sort("rental_price_per_day"))
+
+CAR_COLUMNS = ("car_id", "brand", "model", "year", "rental_price_per_day")
+
+
+def check_column(field):
+    if field not in CAR_COLUMNS:
+        raise ValueError(f"Unknown car column: {field}")
+    return field
+
+
+# Значение поля у словаря (файловые репозитории) или у объекта Car
+def field_value(car, field):
+    return car[field] if isinstance(car, dict) else getattr(car, field)
+
+
+# Базовый класс условия. Условие можно передать как filter_func: predicate(car) -> bool
+class Predicate:
+    def to_sql(self):  # -> (фрагмент SQL с %s, список параметров)
+        raise NotImplementedError
+
+    def matches(self, car):
+        raise NotImplementedError
+
+    def __call__(self, car):
+        return self.matches(car)
+
+    def __and__(self, other):
+        return And(self, other)
+
+
+# field = value
+class Eq(Predicate):
+    def __init__(self, field, value):
+        self.field = check_column(field)
+        self.value = value
+
+    def to_sql(self):
+        return f"{self.field} = %s", [self.value]
+
+    def matches(self, car):
+        return field_value(car, self.field) == self.value
+
+
+# low <= field <= high, любая граница может быть None
+class Range(Predicate):
+    def __init__(self, field, low=None, high=None):
+        self.field = check_column(field)
+        self.low = low
+        self.high = high
+
+    def to_sql(self):
+        parts, params = [], []
+        if self.low is not None:
+            parts.append(f"{self.field} >= %s")
+            params.append(self.low)
+        if self.high is not None:
+            parts.append(f"{self.field} <= %s")
+            params.append(self.high)
+        return " AND ".join(parts) or "TRUE", params
+
+    def matches(self, car):
+        value = field_value(car, self.field)
+        return (self.low is None or value >= self.low) and (self.high is None or value <= self.high)
+
+
+# field IN (values)
+class In(Predicate):
+    def __init__(self, field, values):
+        self.field = check_column(field)
+        self.values = list(values)
+        self._set = set(self.values)
+
+    def to_sql(self):
+        if not self.values:
+            return "FALSE", []
+        return f"{self.field} IN ({', '.join(['%s'] * len(self.values))})", list(self.values)
+
+    def matches(self, car):
+        return field_value(car, self.field) in self._set
+
+
+# field LIKE 'prefix%' (использует обычный B-tree индекс)
+class Prefix(Predicate):
+    def __init__(self, field, prefix):
+        self.field = check_column(field)
+        self.prefix = prefix
+
+    def to_sql(self):
+        escaped = self.prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"{self.field} LIKE %s", [escaped + "%"]
+
+    def matches(self, car):
+        return str(field_value(car, self.field)).startswith(self.prefix)
+
+
+class And(Predicate):
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def to_sql(self):
+        parts, params = [], []
+        for predicate in self.predicates:
+            sql, predicate_params = predicate.to_sql()
+            parts.append(f"({sql})")
+            params.extend(predicate_params)
+        return " AND ".join(parts) or "TRUE", params
+
+    def matches(self, car):
+        return all(predicate.matches(car) for predicate in self.predicates)
+
+
+# Сортировка по колонке; car_id добавляется вторым ключом, чтобы порядок (и страницы) был однозначным
+class Sort:
+    def __init__(self, field, descending=False):
+        self.field = check_column(field)
+        self.descending = descending
+
+    def to_sql(self):
+        direction = " DESC" if self.descending else ""
+        if self.field == "car_id":
+            return f"car_id{direction}"
+        return f"{self.field}{direction}, car_id{direction}"
+
+    def apply(self, cars):
+        return sorted(cars, key=lambda car: (field_value(car, self.field), field_value(car, "car_id")),
+                      reverse=self.descending)
+
+
+# Скомпилированный запрос: WHERE считается один раз и используется и для страниц, и для подсчета
+class CompiledQuery:
+    def __init__(self, predicate=None, sort=None, table="cars"):
+        self.table = table
+        self.where, self.params = predicate.to_sql() if predicate else ("", [])
+        self.order_by = sort.to_sql() if sort else "car_id"
+
+    def select(self, limit=None, offset=None):
+        query = f"SELECT {', '.join(CAR_COLUMNS)} FROM {self.table}"
+        params = list(self.params)
+        if self.where:
+            query += f" WHERE {self.where}"
+        query += f" ORDER BY {self.order_by}"
+        if limit is not None:
+            query += " LIMIT %s OFFSET %s"
+            params += [limit, offset or 0]
+        return query, params
+
+    def count(self):
+        query = f"SELECT COUNT(*) FROM {self.table}"
+        if self.where:
+            query += f" WHERE {self.where}"
+        return query, list(self.params)
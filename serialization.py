@@ -0,0 +1,89 @@
+import json
+
+import yaml
+
+
+# Форматы файлов хранилища (кодеки). Файловые репозитории параметризуются кодеком,
+# поэтому формат выбирается по скорости/размеру без нового класса репозитория:
+#
+#     CarRepJSON("cars.json", codec="json-compact")
+#     ClientRepJson("clients.msgpack", codec=MsgpackCodec())
+#
+# Кодек читает и пишет весь список записей (словарей) в открытый файл
+class Codec:
+    binary = False  # файл открывается в режиме "rb"/"wb"
+
+    def load(self, f):
+        raise NotImplementedError
+
+    def dump(self, records, f):
+        raise NotImplementedError
+
+
+# JSON: indent=None - компактный (без пробелов), indent=4 - читаемый
+class JsonCodec(Codec):
+    def __init__(self, indent=None):
+        self.indent = indent
+        self.separators = None if indent else (",", ":")
+
+    def load(self, f):
+        text = f.read()
+        return json.loads(text) if text.strip() else []
+
+    def dump(self, records, f):
+        f.write(json.dumps(records, indent=self.indent, separators=self.separators))
+
+
+# JSON Lines: запись на строку (с таким файлом работает боковой индекс смещений JsonLinesIndex)
+class JsonLinesCodec(Codec):
+    def load(self, f):
+        return [json.loads(line) for line in f if line.strip()]
+
+    def dump(self, records, f):
+        f.write("".join(json.dumps(record) + "\n" for record in records))
+
+
+# YAML. Если PyYAML собран с libyaml, используются C-реализации загрузчика и выгрузчика
+# (в разы быстрее чистого Python), иначе - обычные безопасные SafeLoader/SafeDumper
+class YamlCodec(Codec):
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+    def load(self, f):
+        return yaml.load(f, Loader=self.loader) or []
+
+    def dump(self, records, f):
+        yaml.dump(records, f, Dumper=self.dumper)
+
+
+# Компактный двоичный формат MessagePack (нужен пакет msgpack, импортируется при использовании)
+class MsgpackCodec(Codec):
+    binary = True
+
+    def load(self, f):
+        import msgpack
+        data = f.read()
+        return msgpack.unpackb(data, raw=False) if data else []
+
+    def dump(self, records, f):
+        import msgpack
+        f.write(msgpack.packb(records, use_bin_type=True))
+
+
+CODECS = {
+    "json": JsonCodec(indent=4),
+    "json-compact": JsonCodec(),
+    "jsonl": JsonLinesCodec(),
+    "yaml": YamlCodec(),
+    "msgpack": MsgpackCodec(),
+}
+
+
+# Кодек по имени из CODECS или сам объект кодека
+def get_codec(codec):
+    if isinstance(codec, Codec):
+        return codec
+    try:
+        return CODECS[codec]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {codec}") from None
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули репозитория лежат в корне, тесты запускаются из корня: python -m pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
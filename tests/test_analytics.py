@@ -0,0 +1,28 @@
+from datetime import date
+
+from analytics import RentalAnalytics
+from auto import Car, CarRental
+
+
+def rental_with_analytics():
+    car_rental = CarRental()
+    analytics = RentalAnalytics()
+    analytics.attach(car_rental)
+    car_rental.add_car(Car(1, "Toyota", "Camry", 2020, 100.0))
+    return car_rental, analytics
+
+
+def test_cancellation_subtracts_booked_price():
+    car_rental, analytics = rental_with_analytics()
+    car_rental.create_rental(1, 1, "client", date(2024, 1, 1), date(2024, 1, 4))
+    car_rental.cars[1].rental_price_per_day = 150.0
+    car_rental.cancel_rental(1)
+    assert analytics.total_revenue() == 0.0
+    assert analytics.revenue_by("month") == {}
+
+
+def test_re_adding_car_does_not_grow_fleet():
+    car_rental, analytics = rental_with_analytics()
+    car_rental.add_car(Car(1, "Toyota", "Camry", 2021, 120.0))
+    car_rental.add_car(Car(2, "Kia", "Rio", 2019, 80.0))
+    assert analytics.fleet_size == 2
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import threading
+
+import pytest
+
+from async_repository import AsyncClientRepDB, ThreadOffloadCarRepository
+from car_repository import Car, CarRepJSON
+from Client import Client
+
+
+def make_client():
+    return Client(None, "Ivan Petrov", "1234567890", "+79990001122", "Moscow")
+
+
+def test_thread_offload_runs_calls_one_at_a_time(tmp_path):
+    repo = CarRepJSON(str(tmp_path / "cars.json"))
+    active, overlaps = [0], []
+    guard = threading.Lock()
+
+    def tracked(method):
+        def wrapper(*args):
+            with guard:
+                active[0] += 1
+                overlaps.append(active[0])
+            try:
+                return method(*args)
+            finally:
+                with guard:
+                    active[0] -= 1
+        return wrapper
+
+    repo.add_car = tracked(repo.add_car)
+    repo.get_count = tracked(repo.get_count)
+    repo.get_by_id = tracked(repo.get_by_id)
+
+    async def main():
+        offload = ThreadOffloadCarRepository(repo)
+        try:
+            calls = []
+            for i in range(20):
+                calls.append(offload.add_car(Car(None, "Toyota", "Camry", 2020, 100.0 + i)))
+                calls.append(offload.get_by_id(1))
+                calls.append(offload.get_count())
+            await asyncio.gather(*calls)
+            return await offload.get_count()
+        finally:
+            offload.close()
+
+    assert asyncio.run(main()) == 20
+    assert max(overlaps) == 1
+
+
+# Пул по образцу aiomysql.Pool: соединение с незавершенной транзакцией при возврате закрывается
+class FakeConnection:
+    def __init__(self, autocommit):
+        self.autocommit = autocommit
+        self.in_transaction = False
+        self.closed = False
+        self.commits = 0
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    async def begin(self):
+        self.in_transaction = True
+
+    async def commit(self):
+        self.in_transaction = False
+        self.commits += 1
+
+    async def rollback(self):
+        self.in_transaction = False
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.lastrowid = None
+        self.rows = []
+
+    async def execute(self, query, params=()):
+        if not self.connection.autocommit:
+            self.connection.in_transaction = True
+        if query.startswith("SELECT COUNT"):
+            self.rows = [{"count": 3}]
+        elif query.startswith("INSERT"):
+            self.lastrowid = 7
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def fetchall(self):
+        return self.rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FakePool:
+    def __init__(self, minsize, maxsize, autocommit=False, **config):
+        self.autocommit = autocommit
+        self.free = [FakeConnection(autocommit) for _ in range(minsize)]
+        self.created = minsize
+
+    def freesize(self):
+        return len(self.free)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        if self.free:
+            connection = self.free.pop()
+        else:
+            connection = FakeConnection(self.autocommit)
+            self.created += 1
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.closed = True
+            else:
+                self.free.append(connection)
+
+
+def test_async_client_repository_returns_connections_to_pool(monkeypatch):
+    aiomysql = pytest.importorskip("aiomysql")
+
+    async def create_pool(**options):
+        return FakePool(**options)
+
+    monkeypatch.setattr(aiomysql, "create_pool", create_pool)
+
+    async def main():
+        repo = await AsyncClientRepDB.create({"host": "localhost", "database": "car_rental"})
+        assert await repo.get_count() == 3
+        assert repo.pool.freesize() == 1
+        assert await repo.add_client(make_client()) == 7
+        assert repo.pool.freesize() == 1
+        assert await repo.get_by_id(1) is None
+        connection = repo.pool.free[0]
+        return repo.pool.created, connection.commits
+
+    assert asyncio.run(main()) == (1, 1)
@@ -0,0 +1,22 @@
+from benchmark import BACKENDS, OPERATIONS, compare, run
+
+
+def test_benchmark_runs_every_backend(tmp_path):
+    results = run(list(OPERATIONS), list(BACKENDS), [30], repeat=3, budget=0.1,
+                  directory=str(tmp_path), log=lambda line: None)
+    for entity, operations in OPERATIONS.items():
+        for backend in BACKENDS:
+            for operation, _ in operations:
+                key = f"{entity}/{backend}/30/{operation}"
+                if backend == "db" and operation == "sort_by_field":
+                    assert key not in results  # в БД сортировка - ORDER BY в запросе
+                else:
+                    assert results[key]["calls"] >= 3
+    assert results["clients/db/30/get_by_id"]["statements"] == 1
+    assert compare(results, results) == []
+
+
+def test_compare_reports_slower_median():
+    baseline = {"cars/json/30/get_by_id": {"p50_ms": 1.0, "peak_kb": 10.0}}
+    results = {"cars/json/30/get_by_id": {"p50_ms": 2.0, "peak_kb": 10.0}}
+    assert len(compare(results, baseline, tolerance=0.25)) == 1
@@ -0,0 +1,64 @@
+from datetime import date
+
+import pytest
+
+from auto import BookingSchedule, Car, CarRental
+
+
+def d(day):
+    return date(2024, 5, day)
+
+
+def test_schedule_detects_overlaps():
+    schedule = BookingSchedule()
+    schedule.book(1, d(10), d(15))
+    schedule.book(2, d(20), d(25))
+    schedule.book(3, d(1), d(5))
+    assert schedule.starts == [d(1), d(10), d(20)]
+    assert schedule.rental_ids == [3, 1, 2]
+    assert schedule.is_free(d(5), d(10))  # [начало, конец): соседние брони не пересекаются
+    assert schedule.is_free(d(15), d(20))
+    assert schedule.is_free(d(26), d(30))
+    for start, end in ((d(14), d(16)), (d(9), d(11)), (d(11), d(12)), (d(8), d(22)), (d(4), d(6))):
+        assert not schedule.is_free(start, end)
+    with pytest.raises(ValueError):
+        schedule.book(4, d(12), d(21))
+
+
+def test_schedule_release_frees_interval():
+    schedule = BookingSchedule()
+    schedule.book(1, d(10), d(15))
+    schedule.book(2, d(15), d(20))
+    schedule.release(1, d(15))  # другая бронь с этим началом не трогается
+    assert schedule.rental_ids == [1, 2]
+    schedule.release(1, d(10))
+    assert schedule.rental_ids == [2]
+    assert schedule.is_free(d(10), d(15))
+    schedule.book(3, d(11), d(14))
+    assert schedule.rental_ids == [3, 2]
+
+
+def test_car_rental_books_cancels_and_rebooks():
+    rental = CarRental()
+    rental.add_car(Car(1, "Kia", "Rio", 2020, 100.0))
+    rental.add_car(Car(2, "Lada", "Vesta", 2021, 80.0))
+    assert rental.create_rental(1, 1, "Иванов", d(10), d(15)) is not None
+    assert rental.create_rental(2, 1, "Петров", d(12), d(13)) is None
+    assert rental.create_rental(1, 2, "Петров", d(12), d(13)) is None  # rental_id занят
+    assert rental.create_rental(3, 2, "Петров", d(13), d(13)) is None  # пустой интервал
+    assert [car.car_id for car in rental.find_available_cars(d(12), d(13))] == [2]
+    rental.cancel_rental(1)
+    assert not rental.get_rental(1).is_active
+    assert [car.car_id for car in rental.find_available_cars(d(12), d(13))] == [1, 2]
+    assert rental.create_rental(2, 1, "Петров", d(12), d(13)) is not None
+
+
+def test_archive_finished_releases_schedule():
+    rental = CarRental()
+    rental.add_car(Car(1, "Kia", "Rio", 2020, 100.0))
+    rental.create_rental(1, 1, "Иванов", d(1), d(5))
+    rental.create_rental(2, 1, "Петров", d(10), d(15))
+    assert [r.rental_id for r in rental.archive_finished(d(5))] == [1]
+    assert rental.get_rental(1).is_active
+    assert 1 in rental.archive and 1 not in rental.rentals
+    assert rental.schedules[1].rental_ids == [2]
@@ -0,0 +1,172 @@
+import os
+import multiprocessing
+
+import pytest
+
+from car_repository import Car, CarRepBinary, CarRepJSON
+
+
+def make_car(brand="Toyota", model="Camry"):
+    return Car(None, brand, model, 2020, 3500.0)
+
+
+def test_binary_does_not_reuse_deleted_ids(tmp_path):
+    repo = CarRepBinary(str(tmp_path / "cars.bin"))
+    try:
+        ids = [repo.add_car(make_car()) for _ in range(5)]
+        repo.delete_car(ids[-1])
+        repo.delete_car(ids[1])
+        new_id = repo.add_car(make_car("Kia", "Rio"))
+        assert new_id not in ids
+        assert new_id == max(ids) + 1
+        assert repo.get_by_id(ids[1]) is None
+        assert repo.get_by_id(ids[-1]) is None
+        assert repo.get_by_id(new_id)["brand"] == "Kia"
+        assert repo.get_count() == 4
+        assert [car["car_id"] for car in repo.get_k_n_short_list(10, 0)] == [ids[0], ids[2], ids[3], new_id]
+    finally:
+        repo.close()
+
+
+def test_binary_ids_survive_reopen(tmp_path):
+    path = str(tmp_path / "cars.bin")
+    repo = CarRepBinary(path)
+    first = repo.add_car(make_car())
+    repo.delete_car(first)
+    repo.close()
+    repo = CarRepBinary(path)
+    try:
+        assert repo.add_car(make_car()) == first + 1
+        assert repo.get_count() == 1
+    finally:
+        repo.close()
+
+
+def test_journal_replays_across_instances(tmp_path):
+    path = str(tmp_path / "cars.json")
+    writer = CarRepJSON(path, journal=True)
+    reader = CarRepJSON(path, journal=True)
+    ids = writer.add_cars([make_car(), make_car("Kia", "Rio"), make_car("Lada", "Vesta")])
+    writer.update_car(ids[0], make_car("Toyota", "Corolla"))
+    writer.delete_cars([ids[2]])
+    assert os.path.exists(path + ".journal")
+    assert [car["model"] for car in reader.read_all()] == ["Corolla", "Rio"]
+    assert reader.get_by_id(ids[2]) is None
+
+
+def test_journal_skips_and_cuts_torn_tail(tmp_path):
+    path = str(tmp_path / "cars.json")
+    repo = CarRepJSON(path, journal=True)
+    first = repo.add_car(make_car())
+    with open(path + ".journal", "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "record": {"car_id": 99, "bra')
+    assert [car["car_id"] for car in CarRepJSON(path, journal=True).read_all()] == [first]
+    second = CarRepJSON(path, journal=True).add_car(make_car("Kia", "Rio"))
+    with open(path + ".journal", encoding="utf-8") as f:
+        assert all(line.endswith("}\n") for line in f)
+    assert [car["car_id"] for car in CarRepJSON(path, journal=True).read_all()] == [first, second]
+
+
+def test_journal_compaction_is_seen_by_other_instances(tmp_path):
+    path = str(tmp_path / "cars.json")
+    writer = CarRepJSON(path, journal=True, compact_threshold=3)
+    reader = CarRepJSON(path, journal=True)
+    ids = writer.add_cars([make_car(), make_car("Kia", "Rio")])
+    assert reader.get_count() == 2
+    writer.delete_car(ids[0])  # третья запись журнала - уплотнение
+    assert not os.path.exists(path + ".journal")
+    assert [car["car_id"] for car in reader.read_all()] == [ids[1]]
+    assert writer.add_car(make_car()) == ids[1] + 1
+
+
+def test_journal_batch_without_matches_does_not_touch_files(tmp_path):
+    path = str(tmp_path / "cars.json")
+    writer = CarRepJSON(path, journal=True)
+    writer.add_car(make_car())
+    signature = writer.snapshot.current_signature()
+    assert writer.update_cars({999: make_car()}) == 0
+    writer.delete_cars([998, 999])
+    assert writer.snapshot.current_signature() == signature
+
+
+def test_journal_batch_delete_keeps_order(tmp_path):
+    repo = CarRepJSON(str(tmp_path / "cars.json"), journal=True)
+    ids = repo.add_cars([make_car() for _ in range(6)])
+    repo.delete_cars([ids[1], ids[4], 12345])
+    assert [car["car_id"] for car in repo.get_k_n_short_list(10, 0)] == [ids[0], ids[2], ids[3], ids[5]]
+    assert repo.get_count() == 4
+
+
+def test_binary_pages_after_delete_without_full_scan(tmp_path, monkeypatch):
+    repo = CarRepBinary(str(tmp_path / "cars.bin"))
+    try:
+        ids = repo.add_cars([make_car(model=f"Model {i}") for i in range(10)])
+        repo.delete_car(ids[0])
+        repo.delete_car(ids[5])
+        monkeypatch.setattr(repo, "read_all", lambda: pytest.fail("page decoded the whole file"))
+        assert [car["car_id"] for car in repo.get_k_n_short_list(3, 0)] == [ids[1], ids[2], ids[3]]
+        assert [car["car_id"] for car in repo.get_k_n_short_list(3, 1)] == [ids[4], ids[6], ids[7]]
+        new_id = repo.add_car(make_car())
+        repo.delete_car(ids[8])
+        assert [car["car_id"] for car in repo.get_k_n_short_list(3, 2)] == [ids[9], new_id]
+        assert repo.get_k_n_short_list(3, 3) == []
+    finally:
+        repo.close()
+
+
+def test_binary_live_slots_follow_other_instance(tmp_path):
+    path = str(tmp_path / "cars.bin")
+    repo, other = CarRepBinary(path), CarRepBinary(path)
+    try:
+        ids = repo.add_cars([make_car() for _ in range(4)])
+        repo.delete_car(ids[0])
+        assert [car["car_id"] for car in repo.get_k_n_short_list(10, 0)] == ids[1:]
+        other.delete_car(ids[2])
+        new_id = other.add_car(make_car())
+        assert [car["car_id"] for car in repo.get_k_n_short_list(10, 0)] == [ids[1], ids[3], new_id]
+    finally:
+        repo.close()
+        other.close()
+
+
+def add_named_cars(path, prefix, count):
+    repo = CarRepBinary(path)
+    try:
+        for i in range(count):
+            repo.add_car(make_car(f"{prefix} brand {i}", f"{prefix} model {i}"))
+    finally:
+        repo.close()
+
+
+def test_binary_concurrent_writers_keep_strings_consistent(tmp_path):
+    path = str(tmp_path / "cars.bin")
+    CarRepBinary(path).close()
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=add_named_cars, args=(path, prefix, 50)) for prefix in ("a", "b", "c")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    repo = CarRepBinary(path)
+    try:
+        cars = repo.read_all()
+        assert len(cars) == repo.get_count() == 150
+        assert sorted(car["car_id"] for car in cars) == list(range(1, 151))
+        for car in cars:
+            assert car["model"] == car["brand"].replace("brand", "model")
+    finally:
+        repo.close()
+
+
+def test_binary_instances_share_string_table(tmp_path):
+    path = str(tmp_path / "cars.bin")
+    repo, other = CarRepBinary(path), CarRepBinary(path)
+    try:
+        first = repo.add_car(make_car())
+        second = other.add_car(make_car("Kia", "Rio"))
+        assert repo.get_by_id(second)["brand"] == "Kia"
+        assert other.get_by_id(first)["model"] == "Camry"
+    finally:
+        repo.close()
+        other.close()
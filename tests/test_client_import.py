@@ -0,0 +1,56 @@
+import csv
+
+from Client import Client, ClientRepJson
+from client_import import ClientImporter
+
+CSV = (
+    "full_name,passport_data,contact_number,address\n"
+    "Иванов Иван Иванович,0000000001,+79990000001,\"г. Москва,\nул. Мира, д. 1\"\n"
+    "\n"
+    "Петров Петр Петрович,12345,+79990000002,г. Москва\n"
+    "Сидоров Олег Петрович, 0000000001 ,+79990000003,г. Тверь\n"
+    "Ёлкин Иван Петрович,0000000009,+79990000004,г. Тула\n"
+)
+
+JSONL = (
+    '{"full_name": "Иванов Иван Иванович", "passport_data": "0000000001", "contact_number": "+79990000001", '
+    '"address": "г. Москва"}\n'
+    "\n"
+    "not json\n"
+    '{"full_name": "Петров Петр Петрович", "passport_data": "0000000009", "contact_number": "+79990000002", '
+    '"address": "г. Москва"}\n'
+)
+
+
+def import_text(tmp_path, name, text, workers=0):
+    repo = ClientRepJson(str(tmp_path / "clients.json"))
+    repo.add_client(Client(None, "Ёлкин Иван Петрович", "0000000009", "+79990000004", "г. Тула"))
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    report = tmp_path / "rejected.csv"
+    result = ClientImporter(repo, batch_size=2, workers=workers).import_file(str(path), str(report))
+    with open(report, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))[1:]
+    return repo, result, rows
+
+
+def test_csv_import_reports_original_rows_and_line_numbers(tmp_path):
+    repo, result, rows = import_text(tmp_path, "clients.csv", CSV)
+    assert (result.accepted, result.rejected) == (1, 3)
+    assert repo.get_by_passport("0000000001").get_address() == "г. Москва,\nул. Мира, д. 1"
+    assert [(int(line), error) for line, error, _ in rows] == [
+        (5, "Invalid passport data: 12345"),
+        (6, "Passport 0000000001 already registered"),
+        (7, "Passport 0000000009 already registered"),
+    ]
+    assert rows[1][2] == "Сидоров Олег Петрович, 0000000001 ,+79990000003,г. Тверь"
+
+
+def test_jsonl_import_reports_errors_and_duplicates(tmp_path):
+    repo, result, rows = import_text(tmp_path, "clients.jsonl", JSONL, workers=1)
+    assert (result.accepted, result.rejected) == (1, 2)
+    assert repo.get_count() == 2
+    assert [int(line) for line, _, _ in rows] == [3, 4]
+    assert rows[0][2] == "not json"
+    assert rows[1][1] == "Passport 0000000009 already registered"
+    assert rows[1][2] == JSONL.splitlines()[3]
@@ -0,0 +1,147 @@
+import sqlite3
+
+from benchmark import SqliteConnection, SCHEMA, INDEXES
+from db_pool import ConnectionPool
+from Client import Client, ClientDBAdapter, ClientRepJson, FilterSortDecorator, CachedClientRepository
+
+
+def make_client(number, name="Иванов Иван Иванович", phone="+79990000000"):
+    return Client(None, name, f"{number:010d}", phone, "г. Москва, ул. Мира, д. 1")
+
+
+def sqlite_repository(path):
+    connection = sqlite3.connect(path)
+    connection.execute(SCHEMA["clients"])
+    for statement in INDEXES["clients"]:
+        connection.execute(statement)
+    connection.commit()
+    connection.close()
+    return ClientDBAdapter(ConnectionPool(lambda: SqliteConnection(path)))
+
+
+def test_db_add_clients_returns_real_ids(tmp_path):
+    repo = sqlite_repository(str(tmp_path / "clients.sqlite"))
+    first = repo.add_client(make_client(1))
+    repo.delete_client(first)
+    repo.add_client(make_client(2))  # AUTOINCREMENT не вернется к удаленному id: пакет начнется не с first + 2
+    ids = repo.add_clients([make_client(3), make_client(4), make_client(5)])
+    assert [repo.get_by_id(client_id).get_passport_data() for client_id in ids] == \
+        ["0000000003", "0000000004", "0000000005"]
+
+
+def indexed_repository(path, block_scans=True):
+    repo = ClientRepJson(path)
+    repo.add_clients([make_client(1, "Иванов Иван Иванович", "+79990000001"),
+                      make_client(2, "Петров Петр Петрович", "+79990000001"),
+                      make_client(3, "Иванова Анна Петровна", "+79990000003")])
+
+    def no_scan():
+        raise AssertionError("lookup fell back to a read_all scan")
+    if block_scans:
+        repo.read_all = no_scan
+    return repo
+
+
+def test_filter_decorator_lookups_use_wrapped_indexes(tmp_path):
+    repo = FilterSortDecorator(indexed_repository(str(tmp_path / "clients.json")),
+                               filter_func=lambda c: c.get_full_name().startswith("Иванов"))
+    assert repo.get_by_passport("0000000001").get_client_id() == 1
+    assert repo.get_by_passport("0000000002") is None  # есть в хранилище, но не проходит фильтр
+    assert [c.get_client_id() for c in repo.get_by_contact_number("+79990000001")] == [1]
+    assert [c.get_client_id() for c in repo.search_by_name("иванов")] == [1, 3]
+    assert [c.get_client_id() for c in repo.search_by_name("иванов", limit=1)] == [1]
+    assert repo.registered_passports(["0000000002", "0000000009"]) == {"0000000002"}
+
+
+def test_filter_decorator_lookups_on_db_adapter(tmp_path):
+    db = sqlite_repository(str(tmp_path / "clients.sqlite"))
+    db.add_clients([make_client(1), make_client(2, "Петров Петр Петрович")])
+    repo = FilterSortDecorator(db, filter_func=lambda c: c.get_full_name().startswith("Петров"))
+    assert repo.get_by_passport("0000000002").get_full_name() == "Петров Петр Петрович"
+    assert repo.get_by_passport("0000000001") is None
+    assert [c.get_client_id() for c in repo.search_by_name("Пет")] == [2]
+
+
+def test_cached_decorator_lookups_use_wrapped_indexes(tmp_path):
+    inner = indexed_repository(str(tmp_path / "clients.json"))
+    repo = CachedClientRepository(inner)
+    assert repo.get_by_passport("0000000002").get_client_id() == 2
+    assert [c.get_client_id() for c in repo.get_by_contact_number("+79990000001")] == [1, 2]
+    assert [c.get_client_id() for c in repo.search_by_name("иванов")] == [1, 3]
+    assert repo.registered_passports(["0000000003", "0000000009"]) == {"0000000003"}
+    hits = repo.stats()["hits"]
+    repo.get_by_passport("0000000002")
+    repo.search_by_name("иванов")
+    assert repo.stats()["hits"] == hits + 2
+
+
+def test_cached_decorator_lookups_see_writes(tmp_path):
+    repo = CachedClientRepository(indexed_repository(str(tmp_path / "clients.json"), block_scans=False))
+    assert repo.get_by_passport("0000000007") is None
+    assert [c.get_client_id() for c in repo.get_by_contact_number("+79990000003")] == [3]
+    repo.update_client(2, make_client(7, "Сидоров Петр Петрович", "+79990000003"))
+    assert repo.get_by_passport("0000000002") is None
+    assert repo.get_by_passport("0000000007").get_client_id() == 2
+    assert [c.get_client_id() for c in repo.get_by_contact_number("+79990000003")] == [2, 3]
+    assert [c.get_client_id() for c in repo.search_by_name("сидоров")] == [2]
+    new_id = repo.add_client(make_client(8, "Сидоров Олег Петрович"))
+    assert [c.get_client_id() for c in repo.search_by_name("сидоров")] == [2, new_id]
+    repo.delete_client(new_id)
+    assert repo.get_by_passport("0000000008") is None
+
+
+def test_cached_decorator_on_db_adapter(tmp_path):
+    db = sqlite_repository(str(tmp_path / "clients.sqlite"))
+    db.add_clients([make_client(1), make_client(2, "Петров Петр Петрович")])
+    repo = CachedClientRepository(db)
+    assert repo.get_by_passport("0000000002").get_full_name() == "Петров Петр Петрович"
+    assert [c.get_client_id() for c in repo.search_by_name("Пет")] == [2]
+    clients, token = repo.get_page(1)
+    assert [c.get_client_id() for c in clients] == [1] and token is not None
+    repo.refresh()
+    assert len(repo.cache) == 0
+
+
+def test_db_search_by_name_matches_file_index(tmp_path):
+    names = ["Иванов Иван Иванович", "Петров Петр Петрович", "Сиваков Олег Иванович",
+             "Ёлкин Иван Петрович", "Алиева Ива Олеговна"]
+    db = sqlite_repository(str(tmp_path / "clients.sqlite"))
+    files = ClientRepJson(str(tmp_path / "clients.json"))
+    for repo in (db, files):
+        repo.add_clients([make_client(number, name) for number, name in enumerate(names, 1)])
+        repo.update_client(2, make_client(2, "Петров Иван Петрович"))
+        repo.delete_client(5)
+    for query in ("иван", "ВАНО", "ив", "и", "ов ив", "елкин", "пет", "100%", ""):
+        expected = [c.get_client_id() for c in files.search_by_name(query)]
+        assert [c.get_client_id() for c in db.search_by_name(query)] == expected, query
+    assert [c.get_client_id() for c in db.search_by_name("иван")] == [1, 2, 3, 4]
+    assert [c.get_client_id() for c in db.search_by_name("ол")] == [3]
+    assert [c.get_client_id() for c in db.search_by_name("иван", limit=2)] == [1, 2]
+
+
+def test_db_rebuild_name_index(tmp_path):
+    path = str(tmp_path / "clients.sqlite")
+    db = sqlite_repository(path)
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO clients (full_name, passport_data, contact_number, address) "
+                       "VALUES ('Сидоров Олег Петрович', '0000000001', '+79990000000', 'г. Москва')")
+    connection.commit()
+    connection.close()
+    assert db.search_by_name("олег") == []
+    db.rebuild_name_index()
+    assert [c.get_full_name() for c in db.search_by_name("олег")] == ["Сидоров Олег Петрович"]
+
+
+def test_cached_decorator_returns_independent_shorts(tmp_path):
+    repo = CachedClientRepository(indexed_repository(str(tmp_path / "clients.json"), block_scans=False))
+    for load in (lambda: repo.get_k_n_short_list(10, 0), lambda: repo.search_by_name("иванов")):
+        first = load()[0]
+        first.get_client().set_full_name("Изменен Вызывающим")
+        again = load()[0]
+        assert again is not first
+        assert again.get_client().get_full_name() == "Иванов Иван Иванович"
+    short = repo.get_k_n_short_list(10, 0)[0]
+    client = short.get_client()
+    copied = short.copy()
+    client.set_address("г. Тверь")
+    assert copied.get_client().get_address() == "г. Москва, ул. Мира, д. 1"
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if not self.alive:
+            raise RuntimeError("connection lost")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query):
+        if not self.connection.alive:
+            raise RuntimeError("connection lost")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(db_pool, "time", clock)
+    return clock
+
+
+def make_pool(**options):
+    connections = []
+
+    def connect():
+        connections.append(FakeConnection(len(connections)))
+        return connections[-1]
+    return ConnectionPool(connect, **options), connections
+
+
+def test_pool_reuses_connections_and_rolls_back_on_release():
+    pool, connections = make_pool(max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert len(connections) == 1
+    assert first.rollbacks == 2
+    assert pool.stats()["checkouts"] == 2
+
+
+def test_pool_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()["timeouts"] == 1
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_pool_waiter_gets_released_connection():
+    pool, _ = make_pool(max_size=1, timeout=5.0)
+    conn = pool.acquire()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(conn)
+    waiter.join(5.0)
+    assert result == [conn]
+    assert pool.stats()["waits"] == 1
+
+
+def test_pool_health_check_replaces_dead_idle_connection(clock):
+    pool, connections = make_pool(health_check_interval=30.0)
+    with pool.connection():
+        pass
+    connections[0].alive = False
+    clock.now += 10  # недавно возвращенное соединение не проверяется
+    with pool.connection() as conn:
+        assert conn is connections[0]
+        connections[0].alive = True
+    connections[0].alive = False
+    clock.now += 31
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    assert connections[0].closed
+    stats = pool.stats()
+    assert stats["failed_health_checks"] == 1
+    assert stats["size"] == 1
+
+
+def test_pool_recycles_connections_older_than_max_lifetime(clock):
+    pool, connections = make_pool(max_lifetime=60.0, health_check_interval=1000.0)
+    with pool.connection():
+        clock.now += 50
+    with pool.connection() as conn:
+        assert conn is connections[0]
+        clock.now += 20
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    assert connections[0].closed
+    assert pool.stats()["recycled"] == 1
+
+
+def test_pool_discards_connection_that_fails_rollback():
+    pool, connections = make_pool(max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    conn.alive = False
+    pool.release(conn)
+    assert conn.closed
+    assert pool.acquire() is connections[1]
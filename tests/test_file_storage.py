@@ -0,0 +1,180 @@
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from car_repository import Car, CarRepJSON, CarRepJSONL
+from file_storage import FileLock, RecordFile, JsonLinesFile, JsonLinesIndex, atomic_write
+from serialization import get_codec
+
+
+def records(*keys):
+    return [{"id": key, "name": f"item {key}"} for key in keys]
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_record_file_put_and_delete(tmp_path, journal):
+    path = str(tmp_path / "items.json")
+    storage = RecordFile(path, get_codec("json"), "id", journal)
+    storage.put(*records(1, 2, 3))
+    storage.put({"id": 2, "name": "changed"}, *records(4))
+    storage.delete(1, 3)
+    expected = [{"id": 2, "name": "changed"}, {"id": 4, "name": "item 4"}]
+    assert storage.read_all() == expected
+    assert RecordFile(path, get_codec("json"), "id", journal).read_all() == expected
+
+
+def test_record_file_compacts_journal(tmp_path):
+    path = str(tmp_path / "items.json")
+    storage = RecordFile(path, get_codec("json"), "id", journal=True, compact_threshold=2)
+    storage.put(*records(1))
+    assert storage.journal.entries == 1
+    storage.put(*records(2))
+    assert storage.journal.entries == 0
+    assert RecordFile(path, get_codec("json"), "id").read_all() == records(1, 2)
+
+
+def test_json_lines_file_pages_from_disk_when_stale(tmp_path):
+    path = str(tmp_path / "items.jsonl")
+    storage = JsonLinesFile(path, get_codec("jsonl"), "id")
+    storage.write_all(records(*range(10)))
+    other = JsonLinesFile(path, get_codec("jsonl"), "id")
+    assert other.page(4, 3) == records(4, 5, 6)
+    assert not other.snapshot.loaded
+
+
+def write_lines(path, items):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(item) + "\n" for item in items)
+
+
+def test_json_lines_index_seeks_to_page(tmp_path):
+    path = str(tmp_path / "items.jsonl")
+    write_lines(path, records(*range(100)))
+    index = JsonLinesIndex(path)
+    assert index.read_page(40, 3) == records(40, 41, 42)
+    assert os.path.exists(path + ".idx")
+    assert index.read_page(98, 5) == records(98, 99)
+    assert index.read_page(200, 5) == []
+
+
+@pytest.mark.parametrize("replace", [False, True])
+def test_json_lines_index_rebuilds_after_external_change(tmp_path, replace):
+    path = str(tmp_path / "items.jsonl")
+    write_lines(path, records(*range(10)))
+    index = JsonLinesIndex(path)
+    assert index.read_page(2, 2) == records(2, 3)
+    changed = [{"id": key, "name": "x" * key} for key in range(20, 30)]
+    if replace:  # новый файл подменяет старый (другой inode)
+        atomic_write(path, lambda f: f.writelines(json.dumps(item) + "\n" for item in changed))
+    else:        # дозапись в тот же файл (тот же inode, другой размер)
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(item) + "\n" for item in changed)
+        changed = records(*range(10)) + changed
+    assert index.read_page(2, 2) == changed[2:4]
+    assert index.read_page(len(changed) - 1, 5) == changed[-1:]
+
+
+def test_jsonl_repository_pages_after_write_by_other_instance(tmp_path):
+    path = str(tmp_path / "cars.jsonl")
+    writer, reader = CarRepJSONL(path), CarRepJSONL(path)
+    writer.add_cars([Car(None, "Toyota", f"Model {i}", 2020, 100.0) for i in range(10)])
+    assert [car["model"] for car in reader.get_k_n_short_list(3, 1)] == ["Model 3", "Model 4", "Model 5"]
+    writer.delete_car(1)
+    writer.update_car(6, Car(None, "Kia", "Rio", 2021, 90.0))
+    assert [car["model"] for car in reader.get_k_n_short_list(3, 1)] == ["Model 4", "Rio", "Model 6"]
+    assert not reader.snapshot.loaded
+
+
+def add_cars_in_process(path, count):
+    repo = CarRepJSON(path)
+    for i in range(count):
+        repo.add_car(Car(None, "Kia", f"Rio {i}", 2020, 100.0))
+
+
+def test_concurrent_writers_do_not_lose_updates(tmp_path):
+    path = str(tmp_path / "cars.json")
+    CarRepJSON(path)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=add_cars_in_process, args=(path, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    cars = CarRepJSON(path).read_all()
+    assert sorted(car["car_id"] for car in cars) == list(range(1, 101))
+
+
+def test_file_lock_is_reentrant_and_excludes_other_threads(tmp_path):
+    lock = FileLock(str(tmp_path / "data"))
+    order = []
+
+    def take():
+        with lock:
+            order.append("other")
+    with lock:
+        with lock:
+            order.append("outer")
+            other = threading.Thread(target=take)
+            other.start()
+            other.join(0.1)
+            assert other.is_alive()
+        order.append("still held")
+    other.join(5.0)
+    assert order == ["outer", "still held", "other"]
+    assert lock.depth == 0 and lock.file is None
+
+
+def test_file_lock_excludes_other_lock_objects(tmp_path):
+    path = str(tmp_path / "data")
+    first, second = FileLock(path), FileLock(path)
+    acquired = threading.Event()
+
+    def take():
+        with second:
+            acquired.set()
+    with first:
+        thread = threading.Thread(target=take)
+        thread.start()
+        assert not acquired.wait(0.1)
+    assert acquired.wait(5.0)
+    thread.join()
+
+
+def test_atomic_write_keeps_old_file_on_error(tmp_path):
+    path = str(tmp_path / "data.txt")
+    atomic_write(path, lambda f: f.write("old"))
+
+    def fail(f):
+        f.write("partial")
+        raise RuntimeError("disk full")
+    with pytest.raises(RuntimeError):
+        atomic_write(path, fail)
+    with open(path) as f:
+        assert f.read() == "old"
+    assert os.listdir(tmp_path) == ["data.txt"]
+
+
+def test_readers_never_see_partial_file(tmp_path):
+    path = str(tmp_path / "data.json")
+    items = [list(range(20000)), list(range(20000, 40000))]
+    atomic_write(path, lambda f: json.dump(items[0], f))
+    stop = threading.Event()
+
+    def write():
+        n = 0
+        while not stop.is_set():
+            n += 1
+            atomic_write(path, lambda f: json.dump(items[n % 2], f))
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(200):
+            with open(path) as f:
+                assert json.load(f) in items
+    finally:
+        stop.set()
+        writer.join()
@@ -0,0 +1,52 @@
+from car_repository import Car, CarRepJSON, FilterSortDecorator
+from filter_index import FilteredIds, iter_pages
+
+
+def test_filtered_ids_follow_changes():
+    matching = FilteredIds(lambda record: record["year"] >= 2020, lambda record: record["id"])
+    matching.record_changed(1, {"id": 1, "year": 2021})  # до построения изменения не учитываются
+    assert not matching.is_built()
+    matching.build([{"id": 1, "year": 2019}, {"id": 2, "year": 2020}, {"id": 3, "year": 2022}])
+    assert len(matching) == 2 and 1 not in matching
+    matching.record_changed(1, {"id": 1, "year": 2021})
+    matching.record_changed(2, {"id": 2, "year": 2018})
+    matching.record_changed(3, None)
+    matching.record_changed(4, {"id": 4, "year": 2024})
+    assert sorted(matching.ids) == [1, 4]
+    matching.reset()
+    assert not matching.is_built()
+
+
+def test_iter_pages_stops_after_short_page():
+    data = list(range(25))
+    calls = []
+
+    def page(k, n):
+        calls.append(n)
+        return data[n * k:(n + 1) * k]
+    assert list(iter_pages(page, 10)) == data
+    assert calls == [0, 1, 2]
+
+
+def test_filter_decorator_counts_incrementally(tmp_path):
+    repo = CarRepJSON(str(tmp_path / "cars.json"))
+    repo.add_cars([Car(None, "Kia", "Rio", 2015 + i, 100.0) for i in range(10)])
+    pages = []
+    get_page = repo.get_k_n_short_list
+    repo.get_k_n_short_list = lambda k, n: pages.append(n) or get_page(k, n)
+    view = FilterSortDecorator(repo, filter_func=lambda car: car["year"] >= 2020)
+    assert view.get_count() == 5
+    scans = len(pages)
+    new_id = view.add_car(Car(None, "Kia", "Ceed", 2023, 120.0))
+    view.add_cars([Car(None, "Lada", "Vesta", 2010, 50.0)])
+    view.update_car(1, Car(None, "Kia", "Rio", 2022, 100.0))
+    view.update_cars({10: Car(None, "Kia", "Rio", 2000, 100.0)})
+    view.delete_car(new_id)
+    view.delete_cars([9, 999])
+    assert view.get_count() == 4
+    assert len(pages) == scans  # множество не перестраивалось
+    repo.add_car(Car(None, "Kia", "Rio", 2024, 100.0))  # в обход декоратора
+    assert view.get_count() == 4
+    view.refresh()
+    assert view.get_count() == 5
+    assert len(pages) > scans
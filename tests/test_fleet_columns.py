@@ -0,0 +1,21 @@
+from fleet_columns import FleetColumns
+
+
+def fleet():
+    return FleetColumns.from_records([
+        {"car_id": 1, "brand": "Toyota", "model": "Camry", "year": 2020, "rental_price_per_day": 49.5},
+        {"car_id": 2, "brand": "Toyota", "model": "Corolla", "year": 2020, "rental_price_per_day": 49.9},
+        {"car_id": 3, "brand": "Kia", "model": "Rio", "year": 2018, "rental_price_per_day": 49.9},
+    ])
+
+
+def test_group_by_float_column_keeps_distinct_keys():
+    groups = fleet().group_by("rental_price_per_day", value_field="year")
+    assert set(groups) == {49.5, 49.9}
+    assert groups[49.5]["count"] == 1
+    assert groups[49.9]["count"] == 2
+
+
+def test_group_by_keeps_key_types():
+    assert all(type(key) is int for key in fleet().group_by("year"))
+    assert set(fleet().group_by("brand")) == {"Toyota", "Kia"}
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from benchmark import SCHEMA, SqliteConnection
+from car_repository import Car, CarRepJSON, CarRepDB
+from db_pool import ConnectionPool
+from instrumentation import Histogram, Metrics, instrument
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_file_repository_counters(tmp_path):
+    metrics = Metrics()
+    repo = instrument(CarRepJSON(str(tmp_path / "cars.json"), journal=True), metrics)
+    car_id = repo.add_car(Car(None, "Kia", "Rio", 2020, 100.0))
+    repo.get_by_id(car_id)
+    repo.get_by_id(car_id)
+    with pytest.raises(TypeError):
+        repo.get_k_n_short_list(10, "x")  # ошибка тоже учитывается
+    snapshot = metrics.snapshot()
+    assert snapshot["CarRepJSON.get_by_id"]["calls"] == 2
+    assert snapshot["CarRepJSON.get_by_id"]["bytes_written"] == 0
+    add = snapshot["CarRepJSON.add_car"]
+    assert add["calls"] == 1 and add["errors"] == 0
+    assert add["bytes_written"] == (tmp_path / "cars.json.journal").stat().st_size
+    assert snapshot["CarRepJSON.get_k_n_short_list"]["errors"] == 1
+    other = instrument(CarRepJSON(str(tmp_path / "cars.json"), journal=True), metrics, name="Reader")
+    other.read_all()
+    assert metrics.snapshot()["Reader.read_all"]["bytes_read"] > 0
+
+
+def test_db_repository_counts_statements_and_rows(tmp_path):
+    path = str(tmp_path / "cars.sqlite")
+    connection = SqliteConnection(path)
+    connection.connection.execute(SCHEMA["cars"])
+    connection.commit()
+    connection.close()
+    metrics = Metrics()
+    repo = instrument(CarRepDB(pool=ConnectionPool(lambda: SqliteConnection(path))), metrics)
+    for year in range(2020, 2025):
+        repo.add_car(Car(None, "Kia", "Rio", year, 100.0))
+    assert len(repo.get_k_n_short_list(3, 0)) == 3
+    repo.update_car(1, Car(None, "Kia", "Ceed", 2021, 90.0))
+    snapshot = metrics.snapshot()
+    assert snapshot["CarRepDB.add_car"]["statements"] == 5
+    assert snapshot["CarRepDB.get_k_n_short_list"]["statements"] == 1
+    assert snapshot["CarRepDB.get_k_n_short_list"]["rows"] == 3
+    assert snapshot["CarRepDB.update_car"]["rows"] == 1
+
+
+def test_nested_calls_count_for_both_and_threads_are_separate(tmp_path):
+    metrics = Metrics()
+    inner = instrument(CarRepJSON(str(tmp_path / "cars.json")), metrics, name="Inner")
+
+    class Outer:
+        def add_twice(self):
+            inner.add_car(Car(None, "Kia", "Rio", 2020, 100.0))
+            inner.add_car(Car(None, "Kia", "Rio", 2021, 100.0))
+    outer = instrument(Outer(), metrics, name="Outer")
+    threads = [threading.Thread(target=outer.add_twice) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = metrics.snapshot()
+    assert snapshot["Outer.add_twice"]["calls"] == 3
+    assert snapshot["Inner.add_car"]["calls"] == 6
+    assert snapshot["Outer.add_twice"]["bytes_written"] == snapshot["Inner.add_car"]["bytes_written"] > 0
+
+
+def test_prometheus_output(tmp_path):
+    metrics = Metrics(buckets=(0.5,))
+    repo = instrument(CarRepJSON(str(tmp_path / "cars.json")), metrics)
+    repo.get_count()
+    text = metrics.prometheus()
+    assert "# TYPE repository_calls_total counter" in text
+    assert 'repository_calls_total{repository="CarRepJSON",method="get_count"} 1' in text
+    assert 'repository_errors_total{repository="CarRepJSON",method="get_count"} 0' in text
+    assert "# TYPE repository_call_duration_seconds histogram" in text
+    assert 'repository_call_duration_seconds_bucket{repository="CarRepJSON",method="get_count",le="0.5"} 1' in text
+    assert 'repository_call_duration_seconds_bucket{repository="CarRepJSON",method="get_count",le="+Inf"} 1' in text
+    assert 'repository_call_duration_seconds_count{repository="CarRepJSON",method="get_count"} 1' in text
+    assert text.endswith("\n")
+    path = tmp_path / "metrics.prom"
+    metrics.write_prometheus(str(path))
+    assert path.read_text() == text
+    metrics.reset()
+    assert metrics.snapshot() == {}
@@ -0,0 +1,192 @@
+from MVCSetup import CarController, CarRepBase, CarView, ChangeEvent, Observer, coalesce
+
+
+class MemoryCarRepository(CarRepBase):
+    def __init__(self, returns_id=True):
+        super().__init__()
+        self.cars = []
+        self.returns_id = returns_id
+
+    def get_by_id(self, car_id):
+        return next((car for car in self.cars if car["car_id"] == car_id), None)
+
+    def get_k_n_short_list(self, k, n):
+        return self.cars[n * k:(n + 1) * k]
+
+    def sort_by_field(self, field, reverse=False):
+        self.cars.sort(key=lambda car: car[field], reverse=reverse)
+
+    def add_car(self, car):
+        car = dict(car, car_id=max((car["car_id"] for car in self.cars), default=0) + 1)
+        self.cars.append(car)
+        return car["car_id"] if self.returns_id else None
+
+    def update_car(self, car_id, new_car):
+        self.get_by_id(car_id).update(new_car)
+
+    def delete_car(self, car_id):
+        self.cars = [car for car in self.cars if car["car_id"] != car_id]
+
+    def get_count(self):
+        return len(self.cars)
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.events = []
+
+    def update(self, events):
+        self.events.extend(events)
+
+
+FORM_CAR = {"brand": "Toyota", "model": "Camry", "year": 2020, "rental_price_per_day": 3500.0}
+
+
+def test_add_car_from_form_dict_without_id_reloads_observers():
+    repository = MemoryCarRepository(returns_id=False)
+    controller = CarController(repository)
+    recorder = Recorder()
+    repository.add_observer(recorder)
+    controller.add_car(dict(FORM_CAR))
+    assert [event.op for event in recorder.events] == [ChangeEvent.RELOADED]
+    assert controller.search_cars("toy") != []
+
+
+def test_add_car_with_returned_id_sends_added_event():
+    repository = MemoryCarRepository()
+    controller = CarController(repository)
+    recorder = Recorder()
+    repository.add_observer(recorder)
+    controller.add_car(dict(FORM_CAR))
+    assert [(event.op, list(event.ids)) for event in recorder.events] == [(ChangeEvent.ADDED, [1])]
+
+
+def event(op, *ids):
+    return ChangeEvent(op, ids)
+
+
+def test_coalesce_keeps_final_operation_per_id():
+    added, updated, deleted = ChangeEvent.ADDED, ChangeEvent.UPDATED, ChangeEvent.DELETED
+    assert coalesce([event(added, 1), event(updated, 1), event(updated, 2), event(updated, 2)]) == \
+        [event(added, 1), event(updated, 2)]
+    assert coalesce([event(added, 1), event(deleted, 1)]) == []
+    assert coalesce([event(deleted, 1), event(added, 1)]) == [event(updated, 1)]
+    assert coalesce([event(updated, 1), event(deleted, 1), event(added, 2, 3)]) == \
+        [event(added, 2, 3), event(deleted, 1)]
+    assert coalesce([event(ChangeEvent.REORDERED), event(updated, 4)]) == \
+        [event(updated, 4), event(ChangeEvent.REORDERED)]
+    assert coalesce([event(added, 1), event(ChangeEvent.RELOADED)]) == [event(ChangeEvent.RELOADED)]
+
+
+def test_batch_sends_one_coalesced_notification():
+    repository = MemoryCarRepository()
+    controller = CarController(repository)
+    recorder = Recorder()
+    calls = []
+    repository.add_observer(recorder)
+    recorder.update = lambda events: calls.append(list(events))
+    with controller.batch():
+        controller.add_car(dict(FORM_CAR))
+        with controller.batch():
+            controller.add_car(dict(FORM_CAR))
+            controller.update_car(1, {"year": 2021})
+        assert calls == []
+        controller.delete_car(2)
+    assert calls == [[event(ChangeEvent.ADDED, 1)]]
+    with controller.batch():
+        controller.add_car(dict(FORM_CAR))
+        controller.delete_car(repository.cars[-1]["car_id"])
+    assert len(calls) == 1  # добавили и удалили - уведомлять не о чем
+
+
+# Заменители виджетов Tk: CarView проверяется без дисплея
+class FakeTree:
+    def __init__(self):
+        self.rows = []
+        self.values = {}
+        self.inserts = self.edits = 0
+
+    def get_children(self):
+        return list(self.rows)
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.rows.remove(iid)
+            del self.values[iid]
+
+    def insert(self, parent, index, iid, values):
+        self.rows.insert(index, iid)
+        self.values[iid] = values
+        self.inserts += 1
+
+    def item(self, iid, values):
+        self.values[iid] = values
+        self.edits += 1
+
+    def index(self, iid):
+        return self.rows.index(iid)
+
+    def move(self, iid, parent, index):
+        self.rows.remove(iid)
+        self.rows.insert(index, iid)
+
+
+class FakeEntry:
+    def __init__(self, text=""):
+        self.text = text
+
+    def get(self):
+        return self.text
+
+
+class FakeScrollbar:
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+def make_view(repository):
+    controller = CarController(repository)
+    view = CarView.__new__(CarView)
+    view.controller = controller
+    view.offset = view.total = 0
+    view.row_values = {}
+    view.tree, view.entry_filter, view.scrollbar = FakeTree(), FakeEntry(), FakeScrollbar()
+    repository.add_observer(view)
+    view.render()
+    return controller, view
+
+
+def test_view_patches_updated_rows_without_rereading_window():
+    repository = MemoryCarRepository()
+    for year in range(2000, 2040):
+        repository.add_car(dict(FORM_CAR, year=year))
+    controller, view = make_view(repository)
+    assert view.tree.rows == [str(car_id) for car_id in range(1, 26)]
+    pages = []
+    get_page = repository.get_k_n_short_list
+    repository.get_k_n_short_list = lambda k, n: pages.append(n) or get_page(k, n)
+    with controller.batch():
+        controller.update_car(3, {"model": "Corolla"})
+        controller.update_car(30, {"model": "Corolla"})  # невидимая строка
+        controller.update_car(3, {"year": 1999})
+    assert pages == []
+    assert view.tree.values["3"] == (3, "Toyota", "Corolla", 1999, 3500.0)
+    assert (view.tree.inserts, view.tree.edits) == (25, 1)
+
+
+def test_view_rerenders_once_per_batch_and_keeps_unchanged_rows():
+    repository = MemoryCarRepository()
+    for year in range(2000, 2010):
+        repository.add_car(dict(FORM_CAR, year=year))
+    controller, view = make_view(repository)
+    renders = []
+    render = view.render
+    view.render = lambda: renders.append(1) or render()
+    with controller.batch():
+        controller.delete_car(1)
+        controller.add_car(dict(FORM_CAR, year=2030))
+        controller.add_car(dict(FORM_CAR, year=2031))
+    assert len(renders) == 1
+    assert view.tree.rows == [str(car_id) for car_id in range(2, 13)]
+    assert view.tree.inserts == 10 + 2
+    assert view.total == 11
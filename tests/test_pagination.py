@@ -0,0 +1,75 @@
+import base64
+import random
+
+import pytest
+
+from benchmark import car_record, client_record, generate_cars, generate_clients, make_client, seed_sqlite, sqlite_pool
+from car_repository import CarRepDB
+from Client import ClientDBAdapter
+from pagination import decode_token, encode_token, keyset_clause
+
+
+def test_token_round_trip():
+    token = encode_token("rental_price_per_day", True, 2500.0, 17)
+    assert decode_token(token, "rental_price_per_day", True) == (2500.0, 17)
+
+
+def test_token_from_other_sorting_is_rejected():
+    token = encode_token("year", False, 2020, 5)
+    with pytest.raises(ValueError):
+        decode_token(token, "year", True)
+    with pytest.raises(ValueError):
+        decode_token(token, "brand", False)
+
+
+@pytest.mark.parametrize("token", ["@@@", "ключ", base64.urlsafe_b64encode(b"not json").decode(),
+                                   base64.urlsafe_b64encode(b"[1]").decode(), base64.urlsafe_b64encode(b"5").decode()])
+def test_bad_token_raises_value_error(token):
+    with pytest.raises(ValueError):
+        decode_token(token, "car_id", False)
+
+
+def test_keyset_clause():
+    assert keyset_clause("car_id", "car_id", False, None) == ("", [], "car_id")
+    assert keyset_clause("car_id", "car_id", True, (9, 9)) == ("car_id < %s", [9], "car_id DESC")
+    assert keyset_clause("year", "car_id", False, (2020, 5)) == \
+        ("(year, car_id) > (%s, %s)", [2020, 5], "year, car_id")
+    assert keyset_clause("year", "car_id", True, (2020, 5), row_compare=False) == \
+        ("(year < %s OR (year = %s AND car_id < %s))", [2020, 2020, 5], "year DESC, car_id DESC")
+
+
+def all_pages(repo, k, sort_column, descending):
+    rows, token, pages = [], None, 0
+    while True:
+        page, token = repo.get_page(k, token, sort_column, descending)
+        rows.extend(page)
+        pages += 1
+        if token is None:
+            return rows, pages
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_car_keyset_pages_cover_all_rows_in_order(tmp_path, descending):
+    path = str(tmp_path / "cars.sqlite")
+    seed_sqlite(path, "cars", (car_record(car) for car in generate_cars(53)))
+    repo = CarRepDB(pool=sqlite_pool(path))
+    rows, pages = all_pages(repo, 10, "year", descending)
+    assert pages == 6
+    assert [row[0] for row in rows] == [row[0] for row in sorted(
+        rows, key=lambda row: (row[3], row[0]), reverse=descending)]
+    assert sorted(row[0] for row in rows) == list(range(1, 54))
+
+
+def test_client_keyset_pages_are_stable_under_inserts(tmp_path):
+    path = str(tmp_path / "clients.sqlite")
+    seed_sqlite(path, "clients", (client_record(client) for client in generate_clients(30)))
+    repo = ClientDBAdapter(sqlite_pool(path))
+    first, token = repo.get_page(10, sort_column="full_name")
+    repo.add_client(make_client(random.Random(5), 1000))  # попадает в начало или середину сортировки
+    second, _ = repo.get_page(10, token, sort_column="full_name")
+    last = (first[-1].get_full_name(), first[-1].get_client_id())
+    assert all((c.get_full_name(), c.get_client_id()) > last for c in second)
+    with pytest.raises(ValueError):
+        repo.get_page(10, token, sort_column="contact_number")
+    with pytest.raises(ValueError):
+        repo.get_page(10, "garbage", sort_column="full_name")
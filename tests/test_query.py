@@ -0,0 +1,60 @@
+import pytest
+
+from benchmark import car_record, generate_cars, seed_sqlite, sqlite_pool
+from car_repository import CarRepDB, CarRepJSON, FilterSortDBDecorator, FilterSortFileDecorator
+from query import And, CompiledQuery, Eq, In, Prefix, Range, Sort
+
+
+def test_predicates_compile_to_parameterized_sql():
+    assert Eq("brand", "Kia").to_sql() == ("brand = %s", ["Kia"])
+    assert Range("year", 2015, 2020).to_sql() == ("year >= %s AND year <= %s", [2015, 2020])
+    assert Range("year", high=2020).to_sql() == ("year <= %s", [2020])
+    assert Range("year").to_sql() == ("TRUE", [])
+    assert In("model", ["Rio", "Ceed"]).to_sql() == ("model IN (%s, %s)", ["Rio", "Ceed"])
+    assert In("model", []).to_sql() == ("FALSE", [])
+    assert Prefix("brand", "50%_").to_sql() == ("brand LIKE %s", ["50\\%\\_%"])
+    assert (Prefix("brand", "Toy") & Range("year", 2015)).to_sql() == \
+        ("(brand LIKE %s) AND (year >= %s)", ["Toy%", 2015])
+
+
+def test_sort_adds_car_id_tie_breaker():
+    assert Sort("year").to_sql() == "year, car_id"
+    assert Sort("rental_price_per_day", descending=True).to_sql() == "rental_price_per_day DESC, car_id DESC"
+    assert Sort("car_id", descending=True).to_sql() == "car_id DESC"
+
+
+def test_compiled_query_select_and_count():
+    query = CompiledQuery(Eq("brand", "Kia") & Range("year", 2018), Sort("year", descending=True))
+    assert query.select(10, 20) == (
+        "SELECT car_id, brand, model, year, rental_price_per_day FROM cars "
+        "WHERE (brand = %s) AND (year >= %s) ORDER BY year DESC, car_id DESC LIMIT %s OFFSET %s",
+        ["Kia", 2018, 10, 20])
+    assert query.count() == ("SELECT COUNT(*) FROM cars WHERE (brand = %s) AND (year >= %s)", ["Kia", 2018])
+    assert CompiledQuery().select() == (
+        "SELECT car_id, brand, model, year, rental_price_per_day FROM cars ORDER BY car_id", [])
+
+
+def test_unknown_column_is_rejected():
+    with pytest.raises(ValueError):
+        Eq("brand; DROP TABLE cars", 1)
+    with pytest.raises(ValueError):
+        Sort("price")
+
+
+@pytest.mark.parametrize("predicate, sort", [
+    (Prefix("brand", "K") & Range("year", 2010, 2020), Sort("rental_price_per_day")),
+    (In("brand", ["Toyota", "Lada"]), Sort("year", descending=True)),
+    (And(), None),
+])
+def test_sql_and_python_evaluation_agree(tmp_path, predicate, sort):
+    cars = [car_record(car) for car in generate_cars(120)]
+    path = str(tmp_path / "cars.sqlite")
+    seed_sqlite(path, "cars", cars)
+    db = FilterSortDBDecorator(CarRepDB(pool=sqlite_pool(path)), predicate, sort)
+    files = CarRepJSON(str(tmp_path / "cars.json"))
+    files.write_all(cars)
+    file_view = FilterSortFileDecorator(files, predicate, sort)
+    assert db.get_count() == file_view.get_count() == sum(map(predicate, cars))
+    for n in range(3):
+        assert [row[0] for row in db.get_k_n_short_list(7, n)] == \
+            [car["car_id"] for car in file_view.get_k_n_short_list(7, n)]
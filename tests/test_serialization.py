@@ -0,0 +1,75 @@
+import pytest
+
+from car_repository import Car, CarRepJSON
+from Client import Client, ClientRepJson
+from serialization import CODECS, JsonCodec, get_codec
+
+RECORDS = [
+    {"client_id": 1, "full_name": "Ёлкин Иван Петрович", "passport_data": "0000000001",
+     "contact_number": "+79990000001", "address": "г. Москва, ул. \"Мира\", д. 1\nкв. 2"},
+    {"client_id": 2, "full_name": "Smith", "passport_data": "2024-05-01", "contact_number": "yes",
+     "address": None, "price": 1500.25, "tags": ["a", "b"]},
+]
+
+
+def round_trip(tmp_path, codec, records):
+    path = tmp_path / "data"
+    with open(path, "wb" if codec.binary else "w", **({} if codec.binary else {"encoding": "utf-8"})) as f:
+        codec.dump(records, f)
+    with open(path, "rb" if codec.binary else "r", **({} if codec.binary else {"encoding": "utf-8"})) as f:
+        return codec.load(f)
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codec_round_trip(tmp_path, name):
+    if name == "msgpack":
+        pytest.importorskip("msgpack")
+    codec = get_codec(name)
+    assert round_trip(tmp_path, codec, RECORDS) == RECORDS
+    assert round_trip(tmp_path, codec, []) == []
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codec_reads_empty_file_as_empty_list(tmp_path, name):
+    if name == "msgpack":
+        pytest.importorskip("msgpack")
+    codec = get_codec(name)
+    path = tmp_path / "empty"
+    path.write_bytes(b"")
+    with open(path, "rb" if codec.binary else "r") as f:
+        assert codec.load(f) == []
+
+
+def test_json_compact_is_smaller():
+    class Buffer(list):
+        write = list.append
+    pretty, compact = Buffer(), Buffer()
+    CODECS["json"].dump(RECORDS, pretty)
+    CODECS["json-compact"].dump(RECORDS, compact)
+    assert len("".join(compact)) < len("".join(pretty))
+
+
+def test_corrupted_file_raises_instead_of_reading_empty(tmp_path):
+    path = tmp_path / "clients.json"
+    path.write_text('[{"client_id": 1,', encoding="utf-8")
+    with pytest.raises(ValueError):
+        ClientRepJson(str(path)).read_all()
+
+
+def test_get_codec():
+    codec = JsonCodec()
+    assert get_codec(codec) is codec
+    assert get_codec("yaml") is CODECS["yaml"]
+    with pytest.raises(ValueError):
+        get_codec("xml")
+
+
+@pytest.mark.parametrize("codec", ["json", "json-compact", "jsonl", "yaml"])
+def test_repositories_reopen_with_codec(tmp_path, codec):
+    cars = CarRepJSON(str(tmp_path / "cars.data"), codec=codec)
+    car_id = cars.add_car(Car(None, "Лада", "Веста", 2021, 1999.5))
+    assert CarRepJSON(str(tmp_path / "cars.data"), codec=codec).get_by_id(car_id)["brand"] == "Лада"
+    clients = ClientRepJson(str(tmp_path / "clients.data"), codec=codec)
+    client_id = clients.add_client(Client(None, "Ёлкин Иван", "0000000001", "+79990000001", "г. Тула"))
+    reopened = ClientRepJson(str(tmp_path / "clients.data"), codec=codec).get_by_id(client_id)
+    assert reopened.get_passport_data() == "0000000001"
@@ -0,0 +1,109 @@
+import heapq
+from itertools import chain
+
+
+# Приведение текста к виду для поиска: нижний регистр, одиночные пробелы, ё = е
+def normalize(text):
+    return " ".join(str(text).lower().replace("ё", "е").split())
+
+
+# Поисковый индекс по n-граммам (по умолчанию триграммам) для подстрочного поиска без полного прохода:
+#
+#     index = NGramIndex()
+#     index.add(1, "Иванов Иван Иванович")
+#     index.search("ванов")  # -> [1]
+#
+# Запрос длиной >= n ищется как подстрока: кандидаты - пересечение множеств текстов всех n-грамм запроса,
+# затем проверка вхождения. Более короткий запрос ищется как начало слова (по префиксам слов длиной < n).
+# Результаты ранжируются: совпадение с начала текста, затем с начала слова, затем в середине слова; дальше по id.
+# N-граммы хранятся для различных текстов, а не для записей: у тысяч машин "Toyota Camry" текст один,
+# поэтому и построение, и поиск работают с небольшим словарем текстов
+class NGramIndex:
+    PREFIX = "\0"  # метка ключей-префиксов слов, чтобы они не совпали с n-граммами
+
+    def __init__(self, n=3):
+        self.n = n
+        self.postings = {}  # n-грамма или префикс слова -> множество текстов
+        self.ids = {}       # текст -> множество id записей с этим текстом
+        self.texts = {}     # id -> нормализованный текст
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __contains__(self, record_id):
+        return record_id in self.texts
+
+    def keys(self, text):
+        n = self.n
+        keys = {text[i:i + n] for i in range(len(text) - n + 1)}
+        for word in text.split():
+            for length in range(1, min(n, len(word) + 1)):
+                keys.add(self.PREFIX + word[:length])
+        return keys
+
+    # Добавление или замена текста записи
+    def add(self, record_id, text):
+        text = normalize(text)
+        old = self.texts.get(record_id)
+        if old == text:
+            return
+        if old is not None:
+            self.remove(record_id)
+        self.texts[record_id] = text
+        ids = self.ids.get(text)
+        if ids is None:
+            ids = self.ids[text] = set()
+            for key in self.keys(text):
+                texts = self.postings.get(key)
+                if texts is None:
+                    texts = self.postings[key] = set()
+                texts.add(text)
+        ids.add(record_id)
+
+    def remove(self, record_id):
+        text = self.texts.pop(record_id, None)
+        if text is None:
+            return
+        ids = self.ids[text]
+        ids.discard(record_id)
+        if ids:
+            return
+        del self.ids[text]
+        for key in self.keys(text):
+            texts = self.postings[key]
+            texts.discard(text)
+            if not texts:
+                del self.postings[key]
+
+    def clear(self):
+        self.postings.clear()
+        self.ids.clear()
+        self.texts.clear()
+
+    # Различные тексты, содержащие нормализованный запрос
+    def matching_texts(self, query):
+        if not query:
+            return ()
+        if len(query) < self.n:
+            return self.postings.get(self.PREFIX + query, ())
+        postings = sorted((self.postings.get(key, set()) for key in self.keys(query) if key[0] != self.PREFIX), key=len)
+        return [text for text in postings[0].intersection(*postings[1:]) if query in text]
+
+    # Сколько записей содержат запрос (без сортировки результатов)
+    def count(self, query):
+        return sum(len(self.ids[text]) for text in self.matching_texts(normalize(query)))
+
+    # id записей, содержащих запрос, в порядке ранга; limit - сколько вернуть
+    def search(self, query, limit=None):
+        query = normalize(query)
+        ranks = ([], [], [])
+        for text in self.matching_texts(query):
+            ranks[0 if text.startswith(query) else 1 if " " + query in text else 2].append(self.ids[text])
+        result = []
+        for groups in ranks:
+            ids = chain.from_iterable(groups)
+            if limit is None:
+                result.extend(sorted(ids))
+            elif len(result) < limit:
+                result.extend(heapq.nsmallest(limit - len(result), ids))
+        return result